@@ -1,6 +1,32 @@
+import logging
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class MultimoduleappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'MultiModuleApp'
+
+    def ready(self):
+        from MultiModuleApp.services.persona_registry import get_persona_registry
+
+        # Render the persona prompts once per process instead of reading the template per request
+        registry = get_persona_registry()
+        try:
+            registry.load()
+        except FileNotFoundError:
+            logger.warning(f"Persona prompt template not found: {registry.template_path}")
+            return
+
+        if getattr(settings, 'PERSONA_PREWARM', False):
+            threading.Thread(target=self._prewarm, args=(registry,), name='persona-prewarm', daemon=True).start()
+
+    @staticmethod
+    def _prewarm(registry):
+        from MultiModuleApp.services.llm_service import llm_service
+
+        llm_service.prewarm(registry.prompts().values())
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from MultiModuleApp.services.admission import AdmissionController
+from MultiModuleApp.services.batching import MicroBatcher
+from MultiModuleApp.services.llm_service import OllamaProvider, llm_service
+
+
+class StubParallelServer(ThreadingHTTPServer):
+    """
+    Ollama /api/chat with ``parallel`` decoding slots. A decode loop runs one step for all
+    active sequences at a time; a step costs ``step_ms`` for one sequence and ``step_growth``
+    of that more per extra sequence (decoding on a CPU is bound by memory bandwidth, so a
+    batch costs little more than one sequence). Requests join at the next step if a slot is
+    free, and are answered after ``tokens`` steps
+    """
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, parallel=8, tokens=20, step_ms=20.0, step_growth=0.1):
+        super().__init__(('127.0.0.1', 0), StubParallelHandler)
+        self.parallel = parallel
+        self.tokens = tokens
+        self.step_seconds = step_ms / 1000
+        self.step_growth = step_growth
+        self.step_sizes = Counter()  # sequences decoded per step
+        self.queue = []
+        self.condition = threading.Condition()
+        self.running = True
+        threading.Thread(target=self.decode_loop, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def generate(self):
+        done = threading.Event()
+        with self.condition:
+            self.queue.append(done)
+            self.condition.notify()
+        done.wait()
+
+    def decode_loop(self):
+        active = []  # [remaining steps, event]
+        while self.running:
+            with self.condition:
+                while not active and not self.queue and self.running:
+                    self.condition.wait(0.1)
+                while self.queue and len(active) < self.parallel:
+                    active.append([self.tokens, self.queue.pop(0)])
+            if not active:
+                continue
+            time.sleep(self.step_seconds * (1 + self.step_growth * (len(active) - 1)))
+            self.step_sizes[len(active)] += 1
+            for sequence in active:
+                sequence[0] -= 1
+                if sequence[0] == 0:
+                    sequence[1].set()
+            active = [sequence for sequence in active if sequence[0] > 0]
+
+    def shutdown(self):
+        self.running = False
+        super().shutdown()
+
+
+class StubParallelHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.generate()
+        body = json.dumps({'model': payload['model'], 'done': True,
+                           'message': {'role': 'assistant', 'content': 'stub reply'}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = ('Send concurrent short chats through LLMService to a stub Ollama server with parallel '
+            'decoding slots, one request per generation and micro-batched, and compare throughput, '
+            'latency and batch sizes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32, help='Chats in flight at once')
+        parser.add_argument('--max-inflight', type=int, default=getattr(settings, 'LLM_ADMISSION_MAX_INFLIGHT', 2),
+                            help='Admission slots')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'LLM_BATCH_MAX_SIZE', 4))
+        parser.add_argument('--batch-wait-ms', type=float, default=getattr(settings, 'LLM_BATCH_MAX_WAIT_MS', 5))
+        parser.add_argument('--parallel', type=int, default=None,
+                            help='Decoding slots of the stub (default: max-inflight)')
+        parser.add_argument('--tokens', type=int, default=20, help='Decode steps per reply')
+        parser.add_argument('--step-ms', type=float, default=20.0, help='Time of a decode step for one sequence')
+
+    def handle(self, *args, **options):
+        parallel = options['parallel'] or options['max_inflight']
+        results = []
+        saved = llm_service.admission.get('ollama'), llm_service.batchers.get('ollama')
+        try:
+            for label, batched in (('unbatched', False), ('batched', True)):
+                server = StubParallelServer(parallel=parallel, tokens=options['tokens'], step_ms=options['step_ms'])
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                provider = OllamaProvider(base_url=server.base_url, model='stub', pool_size=options['concurrency'])
+                # Per-process slots with room for every chat to wait: this measures throughput, not rejections
+                llm_service.admission['ollama'] = AdmissionController(
+                    'ollama', max_inflight=options['max_inflight'], max_waiting=options['concurrency'],
+                    max_wait=600, reserved_slots=0
+                )
+                batcher = llm_service.batchers['ollama'] = MicroBatcher(
+                    'ollama', max_size=options['batch_size'], max_wait=options['batch_wait_ms'] / 1000,
+                    enabled=batched
+                )
+                try:
+                    elapsed, latencies = asyncio.run(self.load(provider, options['requests'], options['concurrency']))
+                finally:
+                    server.shutdown()
+                    server.server_close()
+                    provider.close()
+                results.append((label, elapsed, latencies, batcher.stats(), server.step_sizes))
+        finally:
+            llm_service.admission['ollama'], llm_service.batchers['ollama'] = saved
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['requests']} chats, {options['concurrency']} concurrent, {options['max_inflight']} admission "
+            f"slots, stub with {parallel} decoding slots, {options['tokens']} x {options['step_ms']:g} ms steps"
+        ))
+        for label, elapsed, latencies, stats, step_sizes in results:
+            self.stdout.write(
+                f'  {label:10} {len(latencies) / elapsed:7.1f} chats/s, latency p50 {1000 * np.percentile(latencies, 50):.0f} ms '
+                f'p95 {1000 * np.percentile(latencies, 95):.0f} ms'
+            )
+            if stats['batches']:
+                self.stdout.write(f"  {'':10} batch sizes {stats['sizes']} (mean {stats['mean_size']}, "
+                                  f"waited {stats['mean_wait_ms']} ms to fill)")
+            steps = sum(step_sizes.values())
+            mean = sum(size * count for size, count in step_sizes.items()) / steps if steps else 0
+            self.stdout.write(f"  {'':10} sequences per decode step {dict(sorted(step_sizes.items()))} (mean {mean:.2f})")
+        speedup = (len(results[1][2]) / results[1][1]) / (len(results[0][2]) / results[0][1])
+        self.stdout.write(f'  throughput x{speedup:.2f} with micro-batching')
+
+    async def load(self, provider, total, concurrency):
+        """Run total chats, concurrency at a time; returns the elapsed time and per-chat latencies"""
+        remaining = iter(range(total))
+        latencies = []
+
+        async def client():
+            for turn in remaining:
+                prompt = f'Question {turn}'
+                messages = [{'role': 'user', 'content': prompt}]
+                start = time.perf_counter()
+                await llm_service._agenerate('ollama', provider, prompt, messages, None, {}, 120)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies
@@ -0,0 +1,78 @@
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from MultiModuleApp.models import Conversation, Message
+from MultiModuleApp.services.session_store import ModelSessionStore
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+class Command(BaseCommand):
+    help = ('Measure write and read latency per chat turn of the database session store on the '
+            'configured database (run with --settings=MultiModuleProject.settings_production for PostgreSQL)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=20)
+        parser.add_argument('--turns', type=int, default=50, help='Turns per session')
+        parser.add_argument('--window', type=int, default=3, help='Exchanges loaded as context per turn')
+        parser.add_argument('--reply-size', type=int, default=800, help='Characters per reply')
+
+    def handle(self, *args, **options):
+        store = ModelSessionStore(max_exchanges=options['window'])
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        session_ids = [f'{prefix}-{i}' for i in range(options['sessions'])]
+        reply = 'x' * options['reply_size']
+        writes, reads, full_reads = [], [], []
+
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                for session_id in session_ids:
+                    store.start(session_id, 'Isaac Newton')
+                start_queries = len(queries)
+
+            for turn in range(options['turns']):
+                for session_id in session_ids:
+                    # A chat turn: load the context window, then store the user message and reply
+                    elapsed, _ = timed(store.history, session_id, options['window'])
+                    reads.append(elapsed)
+                    elapsed, _ = timed(store.append, session_id,
+                                       {'message': f'Question number {turn}?', 'response': reply, 'provider': 'bench'})
+                    writes.append(elapsed)
+
+            connection.queries_log.clear()  # with DEBUG on it is full by now, and counts would read 0
+            with CaptureQueriesContext(connection) as read_queries:
+                store.history(session_ids[0], options['window'])
+            with CaptureQueriesContext(connection) as write_queries:
+                store.append(session_ids[0], {'message': 'One more?', 'response': reply, 'provider': 'bench'})
+
+            # For comparison: loading the whole history of a session, as an unbounded store would
+            for session_id in session_ids:
+                elapsed, _ = timed(lambda: list(Message.objects.filter(conversation_id=session_id)
+                                                .order_by('created_at', 'id').values_list('role', 'content')))
+                full_reads.append(elapsed)
+        finally:
+            Conversation.objects.filter(session_id__startswith=prefix).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{connection.vendor} ({connection.settings_dict['NAME']}): {options['sessions']} sessions x "
+            f"{options['turns']} turns, context window {options['window']} exchanges"
+        ))
+        for label, times, query_count in (
+            ('write turn', writes, len(write_queries)),
+            ('read window', reads, len(read_queries)),
+            ('read all', full_reads, 1),
+        ):
+            self.stdout.write(
+                f'  {label:12} {1000 * np.mean(times):7.2f} ms mean, p95 {1000 * np.percentile(times, 95):7.2f} ms'
+                f', {query_count} queries'
+            )
+        self.stdout.write(f'  starting {len(session_ids)} sessions took {start_queries} queries')
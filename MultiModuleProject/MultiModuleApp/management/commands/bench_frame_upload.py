@@ -0,0 +1,80 @@
+import base64
+import json
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from MultiModuleApp.modules import frame_decoder
+
+
+def synthetic_frame(width=640, height=480):
+    """A webcam-like test frame: smooth gradients plus sensor noise, so JPEG sizes are realistic."""
+    rng = np.random.default_rng(0)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), np.float32)
+    frame[..., 0] = xs
+    frame[..., 1] = ys
+    frame[..., 2] = (xs + ys) / 2
+    frame += rng.normal(0, 6, frame.shape)
+    cv2.circle(frame, (width // 2, height // 2), height // 4, (40, 80, 160), -1)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+class Command(BaseCommand):
+    help = 'Compare wire size and server decode CPU time of the JSON/base64 and binary frame uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--image', type=str, help='Frame to use (defaults to a synthetic 640x480 frame)')
+        parser.add_argument('--quality', type=int, default=92, help='JPEG quality (browser default is 92)')
+        parser.add_argument('--iterations', type=int, default=300, help='Frames decoded per path')
+
+    def handle(self, *args, **options):
+        if options['image']:
+            frame = cv2.imread(options['image'], cv2.IMREAD_COLOR)
+            if frame is None:
+                raise CommandError(f"Could not read image {options['image']}")
+        else:
+            frame = synthetic_frame()
+
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, options['quality']])
+        if not ok:
+            raise CommandError('JPEG encoding failed')
+        jpeg_bytes = encoded.tobytes()
+
+        # What static/main.js used to send, and what it sends now
+        json_body = json.dumps({
+            'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg_bytes).decode('ascii')
+        }).encode('utf-8')
+        binary_body = jpeg_bytes
+
+        def decode_json(body):
+            data = json.loads(body)
+            return frame_decoder.decode_data_url(data['image'])
+
+        def decode_binary(body):
+            return frame_decoder.decode_frame_bytes(body)
+
+        iterations = options['iterations']
+        self.stdout.write(self.style.SUCCESS(
+            f'Frame {frame.shape[1]}x{frame.shape[0]}, JPEG quality {options["quality"]}, {iterations} iterations'
+        ))
+
+        results = {}
+        for name, body, decode in (('json/base64', json_body, decode_json), ('binary', binary_body, decode_binary)):
+            decode(body)  # warm-up
+            start = time.process_time()
+            for _ in range(iterations):
+                decode(body)
+            cpu_ms = (time.process_time() - start) * 1000 / iterations
+            results[name] = (len(body), cpu_ms)
+            self.stdout.write(f'  {name:<12} {len(body):>8} bytes/frame   {cpu_ms:.3f} ms CPU/frame')
+
+        json_bytes, json_ms = results['json/base64']
+        bin_bytes, bin_ms = results['binary']
+        self.stdout.write(
+            f'\nBinary upload: {100 * (1 - bin_bytes / json_bytes):.1f}% fewer bytes on the wire, '
+            f'{json_ms - bin_ms:.3f} ms ({100 * (1 - bin_ms / json_ms):.1f}%) less server CPU per frame'
+        )
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from MultiModuleApp.modules import landmarks as landmark_indices
+from MultiModuleApp.modules.gaze_tracker import GazeTracker
+from MultiModuleApp.modules.wink_detector import WinkDetector
+
+
+def legacy_gaze_and_ears(landmarks, frame_width, frame_height):
+    """The per-point Python loops GazeTracker and WinkDetector used before the array rewrite"""
+    def eye_region(indices):
+        return [(int(landmarks[i].x * frame_width), int(landmarks[i].y * frame_height)) for i in indices]
+
+    def iris_center(indices):
+        x_vals = [int(landmarks[i].x * frame_width) for i in indices]
+        y_vals = [int(landmarks[i].y * frame_height) for i in indices]
+        return int(np.mean(x_vals)), int(np.mean(y_vals))
+
+    def ear(indices):
+        eye = [landmarks[i] for i in indices]
+        vertical_1 = abs(eye[1].y * frame_height - eye[5].y * frame_height)
+        vertical_2 = abs(eye[2].y * frame_height - eye[4].y * frame_height)
+        horizontal = abs(eye[0].x * frame_width - eye[3].x * frame_width)
+        return (vertical_1 + vertical_2) / (2.0 * horizontal) if horizontal else 0
+
+    left_eye = eye_region(landmark_indices.LEFT_EYE)
+    right_eye = eye_region(landmark_indices.RIGHT_EYE)
+    left_iris = iris_center(landmark_indices.LEFT_IRIS)
+    right_iris = iris_center(landmark_indices.RIGHT_IRIS)
+    left_ratio = (left_iris[0] - left_eye[0][0]) / (left_eye[1][0] - left_eye[0][0] + 1e-6)
+    right_ratio = (right_iris[0] - right_eye[1][0]) / (right_eye[0][0] - right_eye[1][0] + 1e-6)
+    return (left_ratio, right_ratio), (ear(landmark_indices.LEFT_EYE_EAR), ear(landmark_indices.RIGHT_EYE_EAR))
+
+
+def synthetic_landmarks(seed=0):
+    """A FaceMesh-shaped (478 point) protobuf landmark list with random coordinates"""
+    from mediapipe.framework.formats import landmark_pb2
+    rng = np.random.default_rng(seed)
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in rng.random((478, 3)):
+        point = landmark_list.landmark.add()
+        point.x, point.y, point.z = float(x), float(y), float(z)
+    return landmark_list.landmark
+
+
+class Command(BaseCommand):
+    help = 'Compare per-frame cost of the legacy per-landmark loops with the NumPy landmark pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000, help='Frames to simulate')
+
+    def time_per_frame(self, fn, iterations):
+        fn()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - start) * 1e6 / iterations
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        width, height = 640, 480
+        landmarks = synthetic_landmarks()
+        gaze = GazeTracker()
+        wink = WinkDetector()
+
+        def legacy():
+            legacy_gaze_and_ears(landmarks, width, height)
+
+        def vectorized():
+            points = landmark_indices.landmarks_to_points(landmarks, width, height)
+            gaze.estimate_gaze(points, width, height)
+            wink.eye_aspect_ratios(points)
+
+        def full_array():
+            # Converting every landmark to a (478, 3) array, shown for comparison
+            np.array([(p.x, p.y, p.z) for p in landmarks], dtype=np.float32)
+
+        legacy_us = self.time_per_frame(legacy, iterations)
+        vectorized_us = self.time_per_frame(vectorized, iterations)
+        full_us = self.time_per_frame(full_array, iterations)
+
+        self.stdout.write(self.style.SUCCESS(f'{iterations} frames, {width}x{height}'))
+        self.stdout.write(f'  legacy per-landmark loops         {legacy_us:8.2f} µs/frame')
+        self.stdout.write(f'  tracked-points array + NumPy      {vectorized_us:8.2f} µs/frame')
+        self.stdout.write(f'  (full 478x3 conversion alone)     {full_us:8.2f} µs/frame')
+
+        # Sanity check: both pipelines agree on the gaze ratios and EARs
+        (old_ratios, old_ears) = legacy_gaze_and_ears(landmarks, width, height)
+        points = landmark_indices.landmarks_to_points(landmarks, width, height)
+        new_ears = wink.eye_aspect_ratios(points)
+        ear_error = max(abs(a - b) for a, b in zip(old_ears, new_ears))
+        self.stdout.write(f'\nMax EAR difference between pipelines: {ear_error:.2e}')
+        self.stdout.write(f'Legacy gaze ratios: ({old_ratios[0]:.3f}, {old_ratios[1]:.3f})')
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from MultiModuleApp.management.commands.bench_preprocessing import load_recording
+from MultiModuleApp.modules.detector import FaceLandmarkDetector
+from MultiModuleApp.modules.motion_gate import MotionGate
+from MultiModuleApp.modules.preprocess import FramePreprocessor
+from MultiModuleApp.modules.wink_detector import WinkDetector
+
+
+def run_gated(frames, gate=None):
+    """
+    Track a recording the way TrackerSession does, optionally behind a motion gate.
+    Returns per-frame normalized points (or None), per-frame timings (excluding the first,
+    warm-up frame) and the number of skipped inferences.
+    """
+    detector = FaceLandmarkDetector()
+    preprocessor = FramePreprocessor(roi_crop=False)
+    results, timings = [], []
+    skipped = 0
+    last_points = None
+    try:
+        for payload in frames:
+            frame = preprocessor.decode(payload)
+            frame_height, frame_width = frame.shape[:2]
+            start = time.perf_counter()
+            if gate is not None and gate.can_skip(frame):
+                skipped += 1
+                points = last_points
+            else:
+                rgb_frame, offset = preprocessor.prepare(frame)
+                points = detector.detect_landmark_points_rgb(rgb_frame, offset)
+                if gate is not None:
+                    gate.update(frame, points)
+                last_points = points
+            timings.append(time.perf_counter() - start)
+            results.append(None if points is None else points / (frame_width, frame_height))
+    finally:
+        detector.close()
+    return results, timings[1:] or timings, skipped
+
+
+class Command(BaseCommand):
+    help = ('Measure how many FaceMesh inferences the motion gate skips on a recorded session, '
+            'the time saved, and the landmark and eye-state error against running every frame')
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--frames-dir', type=str, help='Directory of recorded frames (sorted by name)')
+        source.add_argument('--video', type=str, help='Recorded video file')
+        parser.add_argument('--threshold', type=float, default=3.0,
+                            help='Mean grey-level difference counted as movement')
+        parser.add_argument('--max-skip', type=int, default=5,
+                            help='Consecutive frames that may reuse the previous landmarks')
+
+    def handle(self, *args, **options):
+        frames = load_recording(options['frames_dir'], options['video'])
+        if not frames:
+            raise CommandError('No frames found in the recording')
+
+        baseline, baseline_times, _ = run_gated(frames)
+        gated, gated_times, skipped = run_gated(
+            frames, MotionGate(threshold=options['threshold'], max_skip=options['max_skip'])
+        )
+
+        # Eye open/closed decisions drive wink clicks, so disagreements matter more than pixels
+        wink_detector = WinkDetector()
+        errors = []
+        eye_state_mismatches = 0
+        for expected, actual in zip(baseline, gated):
+            if expected is None or actual is None:
+                if (expected is None) != (actual is None):
+                    eye_state_mismatches += 1
+                continue
+            errors.append(float(np.linalg.norm(expected - actual, axis=1).mean()))
+            expected_closed = np.array(wink_detector.eye_aspect_ratios(expected)) < wink_detector.blink_threshold
+            actual_closed = np.array(wink_detector.eye_aspect_ratios(actual)) < wink_detector.blink_threshold
+            eye_state_mismatches += int((expected_closed != actual_closed).any())
+
+        baseline_ms = 1000 * float(np.mean(baseline_times))
+        gated_ms = 1000 * float(np.mean(gated_times))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(frames)} frames, threshold {options['threshold']}, max skip {options['max_skip']}"
+        ))
+        self.stdout.write(f'  every frame      {baseline_ms:7.2f} ms/frame')
+        self.stdout.write(f'  motion gated     {gated_ms:7.2f} ms/frame')
+        self.stdout.write(f'  skipped          {skipped}/{len(frames)} inferences ({100 * skipped / len(frames):.1f}%)')
+        self.stdout.write(f'  time saved       {baseline_ms - gated_ms:7.2f} ms/frame '
+                          f'({100 * (1 - gated_ms / baseline_ms):.1f}%)')
+        if errors:
+            self.stdout.write(f'  landmark error   mean {100 * np.mean(errors):.2f}% / max {100 * max(errors):.2f}% '
+                              f'of frame width')
+        self.stdout.write(f'  eye state        {eye_state_mismatches} frames disagree with full inference')
@@ -0,0 +1,161 @@
+import json
+import time
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from MultiModuleApp.services.context_builder import ContextBuilder, estimate_tokens
+from MultiModuleApp.services.llm_service import OllamaProvider
+from MultiModuleApp.services.persona_registry import get_persona_registry
+
+QUESTIONS = [
+    'Hello! Who are you?',
+    'What made you curious about the world when you were young?',
+    'Can you explain gravity in a way a ten year old would understand?',
+    'Why does the moon not fall down to the earth then?',
+    'What is your favourite experiment?',
+    'How did you feel when other scientists disagreed with you?',
+    'What would you say about the telescopes we have today?',
+    'Can you tell me something surprising about light?',
+    'What advice do you have for a student who finds maths hard?',
+    'Thank you! What should I read next?',
+]
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """
+    Ollama API (/api/chat, /api/generate) that imitates its prompt cache: only the tokens
+    after the prefix shared with the previous prompt are evaluated, at 1 ms per token
+    """
+
+    daemon_threads = True
+
+    def __init__(self, reply_words=60):
+        super().__init__(('127.0.0.1', 0), StubOllamaHandler)
+        self.reply_words = reply_words
+        self.cached = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if 'messages' in payload:
+            # Roughly what a chat template renders
+            prompt = ''.join(f"<|{m['role']}|>{m['content']}<|end|>" for m in payload['messages'])
+        else:
+            prompt = payload['prompt']
+        tokens = prompt.split()
+        with self.server.lock:
+            shared = 0
+            for cached, token in zip(self.server.cached, tokens):
+                if cached != token:
+                    break
+                shared += 1
+            self.server.cached = tokens
+        evaluated = len(tokens) - shared
+        reply = ' '.join(['word'] * self.server.reply_words)
+        data = {'model': payload['model'], 'done': True,
+                'prompt_eval_count': evaluated, 'prompt_eval_duration': evaluated * 1_000_000}
+        if 'messages' in payload:
+            data['message'] = {'role': 'assistant', 'content': reply}
+        else:
+            data['response'] = reply
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = ('Run a 10-turn conversation against Ollama twice, as one /api/generate prompt with a '
+            'sliding history window and as /api/chat messages with a stable prefix, and compare '
+            'prompt_eval_count and prompt_eval_duration per turn')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434'))
+        parser.add_argument('--model', default=getattr(settings, 'OLLAMA_MODEL', 'llama3:latest'))
+        parser.add_argument('--turns', type=int, default=len(QUESTIONS))
+        parser.add_argument('--max-tokens', type=int, default=getattr(settings, 'LLM_CONTEXT_MAX_TOKENS', 512),
+                            help='Context budget for the history')
+        parser.add_argument('--prefix-step', type=int, default=getattr(settings, 'LLM_CONTEXT_PREFIX_STEP', 4))
+        parser.add_argument('--keep-alive', default=getattr(settings, 'OLLAMA_KEEP_ALIVE', None) or '30m')
+        parser.add_argument('--stub', action='store_true',
+                            help='Use an in-process server that imitates the prompt cache instead of Ollama')
+
+    def handle(self, *args, **options):
+        stub = None
+        if options['stub']:
+            stub = StubOllamaServer()
+            threading.Thread(target=stub.serve_forever, daemon=True).start()
+            options['url'] = stub.base_url
+
+        try:
+            persona = get_persona_registry().prompt('Isaac Newton')
+
+            runs = [
+                ('generate, sliding window', OllamaProvider(base_url=options['url'], model=options['model'],
+                                                            use_chat=False),
+                 ContextBuilder(max_tokens=options['max_tokens'], prefix_step=1)),
+                ('chat, stable prefix', OllamaProvider(base_url=options['url'], model=options['model'],
+                                                       keep_alive=options['keep_alive']),
+                 ContextBuilder(max_tokens=options['max_tokens'], prefix_step=options['prefix_step'])),
+            ]
+            results = []
+            for label, provider, builder in runs:
+                # A unique first line, so neither run starts from a prompt the other left cached
+                run_persona = f'[{uuid.uuid4().hex[:8]}] {persona}'
+                results.append((label, self.converse(provider, builder, run_persona, options['turns'])))
+                provider.close()
+        finally:
+            if stub is not None:
+                stub.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['model']} at {options['url']}, {options['turns']} turns, "
+            f"context budget {options['max_tokens']} tokens"
+        ))
+        header = f"  {'turn':>4}" + ''.join(f"  {label:>32}" for label, _ in results)
+        self.stdout.write(header)
+        for turn in range(options['turns']):
+            row = f'  {turn + 1:>4}'
+            for _, turns in results:
+                count, duration = turns[turn]
+                row += f'  {count:>12} tokens {duration:>9.1f} ms'
+            self.stdout.write(row)
+        row = f"  {'all':>4}"
+        for _, turns in results:
+            row += f'  {sum(t[0] for t in turns):>12} tokens {sum(t[1] for t in turns):>9.1f} ms'
+        self.stdout.write(row)
+
+    def converse(self, provider, builder, persona, turns):
+        history, measured = [], []
+        for turn in range(turns):
+            question = QUESTIONS[turn % len(QUESTIONS)]
+            messages = builder.build_messages(question, history, persona) if provider.use_chat else None
+            prompt = builder.build(question, history, persona)
+            payload = provider._build_payload(prompt, messages=messages, temperature=0)
+            start = time.perf_counter()
+            response = provider.session.post(f'{provider.base_url}{provider._endpoint(payload)}',
+                                             json=payload, timeout=(provider.connect_timeout, provider.timeout))
+            response.raise_for_status()
+            data = response.json()
+            elapsed = time.perf_counter() - start
+            reply = provider._chunk_text(data) or ''
+            measured.append((data.get('prompt_eval_count', 0), data.get('prompt_eval_duration', 0) / 1e6))
+            self.stderr.write(f'  turn {turn + 1}: {estimate_tokens(prompt)} prompt tokens (estimated), '
+                              f'{elapsed * 1000:.0f} ms total')
+            history.append({'message': question, 'response': reply.strip(), 'provider': 'ollama'})
+        return measured
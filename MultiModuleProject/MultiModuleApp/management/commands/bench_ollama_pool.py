@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand
+
+from MultiModuleApp.services.llm_service import OllamaProvider
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """Minimal Ollama API (/api/version, /api/generate) that counts accepted TCP connections"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), StubOllamaHandler)
+        self.delay = delay
+        self.connections = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def get_request(self):
+        with self._count_lock:
+            self.connections += 1
+        return super().get_request()
+
+    def reset_connections(self):
+        with self._count_lock:
+            self.connections = 0
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections open between requests
+    # Headers and body go out as separate writes; like Ollama's Go server, disable Nagle so
+    # they are not held back by delayed ACKs on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json({'version': 'stub'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self._send_json({'model': payload.get('model'), 'response': 'stub reply', 'done': True})
+
+
+def run_load(send, requests_total, concurrency):
+    """Call send() requests_total times from concurrency threads; returns per-request latencies"""
+    def timed(_):
+        start = time.perf_counter()
+        send()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, range(requests_total)))
+
+
+class Command(BaseCommand):
+    help = ('Load-test OllamaProvider against a local stub Ollama server and compare connection '
+            'reuse and per-request latency of the pooled session with one connection per request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--delay', type=float, default=0.0,
+                            help='Simulated generation time of the stub server, in seconds')
+
+    def handle(self, *args, **options):
+        server = StubOllamaServer(delay=options['delay'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        total, concurrency = options['requests'], options['concurrency']
+        payload = {'model': 'stub', 'prompt': 'Hello', 'stream': False}
+
+        try:
+            # Before: module-level requests.post, a new TCP connection for every call
+            def unpooled():
+                requests.post(f'{server.base_url}/api/generate', json=payload, timeout=(5, 120)).json()
+
+            run_load(unpooled, concurrency, concurrency)  # warm-up
+            server.reset_connections()
+            unpooled_times = run_load(unpooled, total, concurrency)
+            unpooled_connections = server.connections
+
+            # After: the provider's keep-alive pool, sized to the concurrency
+            provider = OllamaProvider(base_url=server.base_url, model='stub', pool_size=concurrency)
+            run_load(lambda: provider.generate_response('Hello'), concurrency, concurrency)
+            server.reset_connections()
+            pooled_times = run_load(lambda: provider.generate_response('Hello'), total, concurrency)
+            pooled_connections = server.connections
+            provider.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} requests, {concurrency} concurrent, stub delay {1000 * options['delay']:.0f} ms"
+        ))
+        for label, times, connections in (
+            ('requests.post', unpooled_times, unpooled_connections),
+            ('pooled session', pooled_times, pooled_connections),
+        ):
+            self.stdout.write(
+                f'  {label:15} {1000 * np.mean(times):7.2f} ms/request (p95 {1000 * np.percentile(times, 95):.2f} ms), '
+                f'{connections} connections opened'
+            )
+        saved = 1000 * (np.mean(unpooled_times) - np.mean(pooled_times))
+        self.stdout.write(f'  saved           {saved:7.2f} ms/request')
@@ -0,0 +1,112 @@
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from MultiModuleApp.modules.detector import FaceLandmarkDetector
+from MultiModuleApp.modules.preprocess import DECODE_FLAGS, FramePreprocessor
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+def load_recording(frames_dir=None, video=None, jpeg_quality=92):
+    """Encoded frames of a recorded session, as the browser would upload them"""
+    if frames_dir:
+        paths = sorted(p for p in Path(frames_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        return [p.read_bytes() for p in paths]
+
+    capture = cv2.VideoCapture(video)
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        frames.append(encoded.tobytes())
+    capture.release()
+    return frames
+
+
+def run_pipeline(frames, preprocessor):
+    """
+    Track a recording; returns per-frame normalized landmark points (or None) and the
+    per-frame timings, excluding the first frame (which pays for graph warm-up).
+    """
+    detector = FaceLandmarkDetector()
+    results, timings = [], []
+    try:
+        for payload in frames:
+            start = time.perf_counter()
+            frame = preprocessor.decode(payload)
+            frame_height, frame_width = frame.shape[:2]
+            rgb_frame, offset = preprocessor.prepare(frame)
+            points = detector.detect_landmark_points_rgb(rgb_frame, offset)
+            if preprocessor.update_roi(points, frame_width, frame_height):
+                detector.reset_tracking()
+            timings.append(time.perf_counter() - start)
+            results.append(None if points is None else points / (frame_width, frame_height))
+    finally:
+        detector.close()
+    return results, timings[1:] or timings
+
+
+class Command(BaseCommand):
+    help = ('Measure latency and landmark accuracy of frame preprocessing (reduced-resolution '
+            'decoding, face ROI cropping) against full-frame tracking on a recorded session')
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--frames-dir', type=str, help='Directory of recorded frames (sorted by name)')
+        source.add_argument('--video', type=str, help='Recorded video file')
+        parser.add_argument('--decode-scale', type=int, default=2, choices=sorted(DECODE_FLAGS))
+        parser.add_argument('--no-roi', action='store_true', help='Disable face ROI cropping')
+        parser.add_argument('--tolerance', type=float, default=0.01,
+                            help='Maximum mean landmark error, as a fraction of the frame width')
+
+    def handle(self, *args, **options):
+        frames = load_recording(options['frames_dir'], options['video'])
+        if not frames:
+            raise CommandError('No frames found in the recording')
+
+        baseline, baseline_times = run_pipeline(frames, FramePreprocessor(decode_scale=1, roi_crop=False))
+        candidate, candidate_times = run_pipeline(frames, FramePreprocessor(
+            decode_scale=options['decode_scale'], roi_crop=not options['no_roi']
+        ))
+
+        errors = []
+        lost = 0
+        for expected, actual in zip(baseline, candidate):
+            if expected is None:
+                continue
+            if actual is None:
+                lost += 1
+                continue
+            errors.append(float(np.linalg.norm(expected - actual, axis=1).mean()))
+        tracked = sum(points is not None for points in baseline)
+
+        baseline_ms = 1000 * float(np.mean(baseline_times))
+        candidate_ms = 1000 * float(np.mean(candidate_times))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(frames)} frames, decode scale 1/{options['decode_scale']}, "
+            f"ROI crop {'off' if options['no_roi'] else 'on'}"
+        ))
+        self.stdout.write(f'  full frame       {baseline_ms:7.2f} ms/frame (p95 {1000 * np.percentile(baseline_times, 95):.2f} ms)')
+        self.stdout.write(f'  preprocessed     {candidate_ms:7.2f} ms/frame (p95 {1000 * np.percentile(candidate_times, 95):.2f} ms)')
+        self.stdout.write(f'  speed-up         {baseline_ms / candidate_ms:7.2f}x')
+
+        if not tracked:
+            raise CommandError('The full-frame pipeline found no face in the recording; accuracy not measured')
+
+        mean_error = float(np.mean(errors)) if errors else float('inf')
+        self.stdout.write(
+            f'  landmark error   mean {100 * mean_error:.2f}% / max {100 * max(errors, default=float("inf")):.2f}% '
+            f'of frame width over {len(errors)} frames; lost face in {lost}/{tracked} tracked frames'
+        )
+        if mean_error > options['tolerance'] or lost > 0.02 * tracked:
+            raise CommandError(
+                f"Accuracy outside tolerance (mean error must be <= {100 * options['tolerance']:.2f}% "
+                f"of frame width, face lost in at most 2% of frames)"
+            )
+        self.stdout.write(self.style.SUCCESS('Accuracy within tolerance'))
@@ -0,0 +1,103 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from MultiModuleApp.services.llm_service import llm_service, LLMServiceError
+from MultiModuleApp.services.persona_registry import get_persona_registry
+
+
+def load_prompt_log(path, limit=None):
+    """Entries of a prompt log written with settings.LLM_PROMPT_LOG (one JSON object per line)"""
+    entries = []
+    with open(path, encoding='utf-8') as log_file:
+        for line in log_file:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+            if limit and len(entries) >= limit:
+                break
+    return entries
+
+
+class Command(BaseCommand):
+    help = ('Replay a recorded prompt log through the LLM service and report the completion and '
+            'semantic cache hit rates and the latency they saved')
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', type=str, help='JSONL prompt log (see LLM_PROMPT_LOG)')
+        parser.add_argument('--limit', type=int, default=None, help='Replay at most this many messages')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='Override LLM_SEMANTIC_CACHE_THRESHOLD for this replay')
+        parser.add_argument('--semantic', action='store_true',
+                            help='Enable the semantic cache for this replay even if disabled in settings')
+        parser.add_argument('--cold', action='store_true',
+                            help='Start from empty caches instead of the current ones')
+
+    def handle(self, *args, **options):
+        personas = get_persona_registry()
+        entries = load_prompt_log(options['log'], options['limit'])
+        if not entries:
+            raise CommandError('The prompt log is empty')
+
+        completion_cache, semantic_cache = llm_service.completion_cache, llm_service.semantic_cache
+        if options['semantic']:
+            semantic_cache.enabled = True
+        if options['threshold'] is not None:
+            semantic_cache.threshold = options['threshold']
+        if options['cold']:
+            completion_cache.cache.clear()
+            semantic_cache.clear()
+
+        timings = {'exact': [], 'semantic': [], 'miss': []}
+        errors = 0
+        for entry in entries:
+            persona = entry['persona']
+            if persona not in personas:
+                self.stderr.write(f"Skipping unknown persona {persona!r}")
+                continue
+            persona_prompt = personas.prompt(persona)
+
+            exact_hits, semantic_hits = completion_cache.hits, semantic_cache.hits
+            start = time.perf_counter()
+            try:
+                llm_service.generate_response(
+                    prompt=entry['message'],
+                    persona_prompt=persona_prompt,
+                    session_id=f"replay-{entry.get('session_id', '')}",
+                    temperature=0.7,
+                    max_tokens=2000
+                )
+            except LLMServiceError as e:
+                errors += 1
+                self.stderr.write(f"Error replaying {entry['message']!r}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+
+            if semantic_cache.hits > semantic_hits:
+                timings['semantic'].append(elapsed)
+            elif completion_cache.hits > exact_hits:
+                timings['exact'].append(elapsed)
+            else:
+                timings['miss'].append(elapsed)
+
+        replayed = sum(len(times) for times in timings.values())
+        if not replayed:
+            raise CommandError('No message could be replayed')
+        hits = len(timings['exact']) + len(timings['semantic'])
+        miss_ms = 1000 * float(np.mean(timings['miss'])) if timings['miss'] else 0.0
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{replayed} messages replayed ({errors} errors), semantic cache "
+            f"{'on' if semantic_cache.enabled else 'off'} (threshold {semantic_cache.threshold})"
+        ))
+        for label, times in (('exact hits', timings['exact']), ('semantic hits', timings['semantic']),
+                             ('misses', timings['miss'])):
+            mean = f"{1000 * np.mean(times):9.2f} ms" if times else '        -   '
+            self.stdout.write(f'  {label:14} {len(times):5d}  mean {mean}')
+        self.stdout.write(f'  hit rate       {100 * hits / replayed:.1f}%')
+        if timings['miss']:
+            saved = hits * miss_ms - 1000 * sum(timings['exact'] + timings['semantic'])
+            self.stdout.write(f'  time saved     {saved / 1000:.2f} s ({saved / replayed:.1f} ms per message)')
+        semantic_cache.save()
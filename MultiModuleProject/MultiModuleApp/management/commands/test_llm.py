@@ -22,7 +22,7 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('Testing LLM Service...'))
         
         # Check provider status
-        status = llm_service.get_provider_status()
+        status = llm_service.get_provider_status(refresh=True)
         self.stdout.write('\nProvider Status:')
         for provider, info in status.items():
             status_color = self.style.SUCCESS if info['available'] else self.style.ERROR
@@ -33,7 +33,7 @@ class Command(BaseCommand):
             prompt = options['prompt']
             self.stdout.write(f'\nTesting with prompt: "{prompt}"')
             
-            response = llm_service.generate_response(prompt, session_id="test_session")
+            response = llm_service.generate_response(prompt, session_id="test_session", priority="diagnostic")
             
             self.stdout.write(self.style.SUCCESS('\n✅ Response received:'))
             self.stdout.write(f'"{response}"')
@@ -61,7 +61,8 @@ User: {prompt}"""
             
             persona_response = llm_service.generate_response(
                 persona_prompt, 
-                session_id="test_persona_session"
+                session_id="test_persona_session",
+                priority="diagnostic"  # never takes the Ollama slots kept for chat
             )
             
             self.stdout.write(self.style.SUCCESS('\n✅ Persona response received:'))
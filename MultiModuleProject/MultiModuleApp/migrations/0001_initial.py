@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('session_id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('persona', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('user', 'User'), ('assistant', 'Assistant')], max_length=10)),
+                ('content', models.TextField()),
+                ('provider', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('conversation', models.ForeignKey(db_column='session_id', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='MultiModuleApp.conversation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversation', 'created_at'], name='message_session_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def start_windows_at_creation(apps, schema_editor):
+    # Existing conversations keep their whole history in context
+    Conversation = apps.get_model('MultiModuleApp', 'Conversation')
+    Conversation.objects.update(context_started_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MultiModuleApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='context_started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(start_windows_at_creation, migrations.RunPython.noop),
+    ]
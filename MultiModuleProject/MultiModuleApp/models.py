@@ -1,3 +1,42 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Conversation(models.Model):
+    """A chat session: keyed by the session_id the chat page generates"""
+    session_id = models.CharField(max_length=64, primary_key=True)
+    persona = models.CharField(max_length=100)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Start of the context window: a session that expired or changed persona starts a new
+    # window here, while its earlier messages stay in the table
+    context_started_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.session_id} ({self.persona})"
+
+
+class Message(models.Model):
+    """One turn of a conversation; a user message and its reply are written together"""
+    ROLE_USER = 'user'
+    ROLE_ASSISTANT = 'assistant'
+    ROLE_CHOICES = [(ROLE_USER, 'User'), (ROLE_ASSISTANT, 'Assistant')]
+
+    # The foreign key column is the session_id itself, so recent turns of a session are
+    # read from the (session_id, created_at) index without a join
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name='messages', db_column='session_id',
+        db_index=False  # covered by the composite index below
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField()
+    provider = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='message_session_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.role}: {self.content[:50]}"
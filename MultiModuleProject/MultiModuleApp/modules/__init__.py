@@ -1,4 +1,5 @@
 # MultiModuleApp modules package
 # This file makes the modules directory a Python package
 
-__all__ = ['detector', 'controller', 'gaze_tracker', 'wink_detector']
\ No newline at end of file
+__all__ = ['detector', 'controller', 'gaze_tracker', 'wink_detector', 'frame_decoder', 'tracker_session',
+           'tracker_pool', 'landmarks', 'preprocess', 'motion_gate']
\ No newline at end of file
@@ -2,6 +2,8 @@ import cv2
 import mediapipe as mp
 import logging
 
+from .landmarks import landmarks_to_points
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,6 +29,14 @@ class FaceLandmarkDetector:
     def detect_landmarks(self, frame):
         try:
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            return self.detect_landmarks_rgb(rgb_frame)
+        except Exception as e:
+            logger.error(f"Error detecting landmarks: {e}")
+            return []
+
+    def detect_landmarks_rgb(self, rgb_frame):
+        """Run FaceMesh on an image that is already RGB (e.g. from FramePreprocessor)"""
+        try:
             results = self.face_mesh.process(rgb_frame)
 
             landmarks = []
@@ -38,3 +48,36 @@ class FaceLandmarkDetector:
         except Exception as e:
             logger.error(f"Error detecting landmarks: {e}")
             return []
+
+    def detect_landmark_points(self, frame):
+        """
+        Detect the first face and return its tracked landmarks as a float32 array of pixel
+        coordinates (see landmarks.TRACKED_LANDMARKS), converted once per frame, or None.
+        """
+        landmarks = self.detect_landmarks(frame)
+        if not landmarks:
+            return None
+        frame_height, frame_width = frame.shape[:2]
+        return landmarks_to_points(landmarks, frame_width, frame_height)
+
+    def detect_landmark_points_rgb(self, rgb_frame, offset=(0, 0)):
+        """
+        Like detect_landmark_points for a prepared RGB image, e.g. a crop of a larger frame;
+        ``offset`` is the crop's top-left corner and is added to the returned coordinates.
+        """
+        landmarks = self.detect_landmarks_rgb(rgb_frame)
+        if not landmarks:
+            return None
+        frame_height, frame_width = rgb_frame.shape[:2]
+        points = landmarks_to_points(landmarks, frame_width, frame_height)
+        if points is not None and offset != (0, 0):
+            points += offset
+        return points
+
+    def reset_tracking(self):
+        """Forget the face position tracked from previous frames (e.g. after the input crop moved)"""
+        self.face_mesh.reset()
+
+    def close(self):
+        """Release the MediaPipe graph"""
+        self.face_mesh.close()
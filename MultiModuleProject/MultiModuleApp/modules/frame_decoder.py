@@ -0,0 +1,42 @@
+import base64
+import cv2
+import numpy as np
+
+# Content types that process_frame accepts as a raw encoded image in the request body
+BINARY_FRAME_TYPES = ('application/octet-stream', 'image/jpeg', 'image/webp')
+
+
+def decode_frame_bytes(buffer, flags=cv2.IMREAD_COLOR):
+    """
+    Decode raw JPEG/WebP bytes into a BGR frame.
+    np.frombuffer wraps the buffer (bytes, bytearray or memoryview) without copying it,
+    so the only allocation is the decoded image itself. Returns None if decoding fails.
+    """
+    np_arr = np.frombuffer(buffer, np.uint8)
+    if np_arr.size == 0:
+        return None
+    return cv2.imdecode(np_arr, flags)
+
+
+def data_url_bytes(data_url):
+    """Extract the encoded image from a base64 'data:image/...;base64,...' URL (the legacy JSON upload format)."""
+    image_data = data_url.split(',', 1)[1]
+    return base64.b64decode(image_data)
+
+
+def decode_data_url(data_url, flags=cv2.IMREAD_COLOR):
+    """Decode a base64 data URL into a BGR frame."""
+    return decode_frame_bytes(data_url_bytes(data_url), flags)
+
+
+def read_upload_buffer(upload):
+    """
+    Return the contents of a Django UploadedFile as a buffer.
+    Small uploads are held in a BytesIO, whose buffer can be viewed without a copy;
+    uploads spooled to disk have to be read.
+    """
+    file_obj = getattr(upload, 'file', None)
+    if hasattr(file_obj, 'getbuffer'):
+        return file_obj.getbuffer()
+    upload.seek(0)
+    return upload.read()
@@ -2,11 +2,12 @@ import numpy as np
 import cv2
 
 # These indices help locate the iris (approximate based on FaceMesh)
-LEFT_IRIS = [468, 469, 470, 471]  # Inner part of left eye
-RIGHT_IRIS = [473, 474, 475, 476]
+from .landmarks import LEFT_IRIS, RIGHT_IRIS, LEFT_EYE, RIGHT_EYE, landmark_rows, as_points
 
-LEFT_EYE = [33, 133]   # Corners of left eye
-RIGHT_EYE = [362, 263] # Corners of right eye
+# Rows of the tracked-points array: both irises (4 points each), then the four eye corners
+IRIS_ROWS = np.concatenate([landmark_rows(LEFT_IRIS), landmark_rows(RIGHT_IRIS)])
+# Ordered as (x_min, x_max) per eye; the right eye's corners are listed outer-first
+CORNER_ROWS = landmark_rows([LEFT_EYE[0], LEFT_EYE[1], RIGHT_EYE[1], RIGHT_EYE[0]])
 
 class GazeTracker:
     def __init__(self):
@@ -15,59 +16,45 @@ class GazeTracker:
     def midpoint(self, p1, p2):
         return int((p1[0] + p2[0]) / 2), int((p1[1] + p2[1]) / 2)
 
-    def get_eye_region(self, landmarks, eye_indices, frame_width, frame_height):
-        points = []
-        for idx in eye_indices:
-            if idx < len(landmarks):
-                x = int(landmarks[idx].x * frame_width)
-                y = int(landmarks[idx].y * frame_height)
-                points.append((x, y))
-        return points
+    def get_eye_region(self, points, eye_indices):
+        return [tuple(p) for p in points[landmark_rows(eye_indices)].astype(int).tolist()]
 
-    def get_iris_center(self, landmarks, iris_indices, frame_width, frame_height):
-        x_vals = []
-        y_vals = []
-        for idx in iris_indices:
-            if idx < len(landmarks):
-                x = int(landmarks[idx].x * frame_width)
-                y = int(landmarks[idx].y * frame_height)
-                x_vals.append(x)
-                y_vals.append(y)
-        if x_vals and y_vals:
-            return int(np.mean(x_vals)), int(np.mean(y_vals))
-        return None
+    def get_iris_center(self, points, iris_indices):
+        center = points[landmark_rows(iris_indices)].mean(axis=0)
+        return int(center[0]), int(center[1])
 
     def estimate_gaze(self, landmarks, frame_width, frame_height):
-        left_eye = self.get_eye_region(landmarks, LEFT_EYE, frame_width, frame_height)
-        right_eye = self.get_eye_region(landmarks, RIGHT_EYE, frame_width, frame_height)
-
-        left_iris = self.get_iris_center(landmarks, LEFT_IRIS, frame_width, frame_height)
-        right_iris = self.get_iris_center(landmarks, RIGHT_IRIS, frame_width, frame_height)
-
+        """
+        Accepts the tracked-points array from FaceLandmarkDetector.detect_landmark_points
+        (or raw MediaPipe landmarks, which are converted first). Both eyes are computed at once.
+        """
         gaze_direction = {"left": "Unknown", "right": "Unknown"}
 
-        if left_eye and left_iris:
-            x_min = left_eye[0][0]
-            x_max = left_eye[1][0]
-            gaze_ratio = (left_iris[0] - x_min) / (x_max - x_min + 1e-6)
-
-            if gaze_ratio < 0.4:
-                gaze_direction["left"] = "Left"
-            elif gaze_ratio > 0.6:
-                gaze_direction["left"] = "Right"
-            else:
-                gaze_direction["left"] = "Center"
-
-        if right_eye and right_iris:
-            x_min = right_eye[1][0]
-            x_max = right_eye[0][0]
-            gaze_ratio = (right_iris[0] - x_min) / (x_max - x_min + 1e-6)
-
-            if gaze_ratio < 0.4:
-                gaze_direction["right"] = "Right"
-            elif gaze_ratio > 0.6:
-                gaze_direction["right"] = "Left"
-            else:
-                gaze_direction["right"] = "Center"
-
-        return gaze_direction, left_iris, right_iris
\ No newline at end of file
+        points = as_points(landmarks, frame_width, frame_height)
+        if points is None:
+            return gaze_direction, None, None
+
+        iris_centers = points[IRIS_ROWS].reshape(2, 4, 2).sum(axis=1)
+        iris_centers *= 0.25
+        corners_x = points[CORNER_ROWS, 0].reshape(2, 2)
+        x_min = corners_x[:, 0]
+        gaze_ratios = (iris_centers[:, 0] - x_min) / (corners_x[:, 1] - x_min + 1e-6)
+
+        (left_x, left_y), (right_x, right_y) = iris_centers.tolist()
+        left_ratio, right_ratio = gaze_ratios.tolist()
+
+        if left_ratio < 0.4:
+            gaze_direction["left"] = "Left"
+        elif left_ratio > 0.6:
+            gaze_direction["left"] = "Right"
+        else:
+            gaze_direction["left"] = "Center"
+
+        if right_ratio < 0.4:
+            gaze_direction["right"] = "Right"
+        elif right_ratio > 0.6:
+            gaze_direction["right"] = "Left"
+        else:
+            gaze_direction["right"] = "Center"
+
+        return gaze_direction, (int(left_x), int(left_y)), (int(right_x), int(right_y))
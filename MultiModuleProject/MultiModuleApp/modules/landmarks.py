@@ -0,0 +1,53 @@
+import numpy as np
+
+# FaceMesh landmark indices used by the tracker (refine_landmarks=True gives 478 points)
+LEFT_IRIS = [468, 469, 470, 471]
+RIGHT_IRIS = [473, 474, 475, 476]
+
+LEFT_EYE = [33, 133]   # Corners of left eye
+RIGHT_EYE = [362, 263] # Corners of right eye
+
+# Eye Aspect Ratio points: corner, top eyelid, top eyelid, corner, bottom eyelid, bottom eyelid
+LEFT_EYE_EAR = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE_EAR = [362, 385, 387, 263, 373, 380]
+
+# Only the landmarks above are pulled out of the MediaPipe result. Reading all 478 protobuf
+# messages costs far more than the gaze and wink maths, so the per-frame conversion is
+# limited to the points those computations actually use.
+TRACKED_LANDMARKS = np.array(
+    sorted(set(LEFT_IRIS + RIGHT_IRIS + LEFT_EYE + RIGHT_EYE + LEFT_EYE_EAR + RIGHT_EYE_EAR)),
+    dtype=np.intp
+)
+_TRACKED_LIST = TRACKED_LANDMARKS.tolist()
+_ROW_OF_LANDMARK = {index: row for row, index in enumerate(_TRACKED_LIST)}
+
+
+def landmark_rows(indices):
+    """Row positions of FaceMesh landmark indices within a tracked-points array"""
+    return np.array([_ROW_OF_LANDMARK[index] for index in indices], dtype=np.intp)
+
+
+def landmarks_to_points(landmarks, frame_width, frame_height):
+    """
+    Convert MediaPipe landmarks into a (len(TRACKED_LANDMARKS), 2) float32 array of pixel
+    coordinates, ordered like TRACKED_LANDMARKS. Returns None when the iris landmarks are
+    missing (FaceMesh without refine_landmarks).
+    """
+    if len(landmarks) <= _TRACKED_LIST[-1]:
+        return None
+    tracked = [landmarks[i] for i in _TRACKED_LIST]
+    points = np.empty((len(tracked), 2), dtype=np.float32)
+    points[:, 0] = [landmark.x for landmark in tracked]
+    points[:, 1] = [landmark.y for landmark in tracked]
+    points[:, 0] *= frame_width
+    points[:, 1] *= frame_height
+    return points
+
+
+def as_points(landmarks, frame_width, frame_height):
+    """Accept either a tracked-points array or raw MediaPipe landmarks"""
+    if isinstance(landmarks, np.ndarray):
+        return landmarks
+    if not landmarks:
+        return None
+    return landmarks_to_points(landmarks, frame_width, frame_height)
@@ -0,0 +1,72 @@
+import cv2
+
+
+class MotionGate:
+    """
+    Cheap change detector run before FaceMesh. Consecutive webcam frames mostly differ by
+    sensor noise, so a session can reuse the landmarks of the last inference until the image
+    actually changes.
+
+    The comparison uses a small grayscale thumbnail of the eye region (the bounding box of
+    the tracked points plus a margin): gaze shifts, blinks and winks all show up there, and so
+    does any head movement large enough to move the eyes. The reference thumbnail is taken
+    from the last frame FaceMesh ran on, not the previous frame, so slow drift still adds up
+    to a change. A full inference is forced after ``max_skip`` consecutive skipped frames.
+
+    Points are in mirrored frame coordinates (as reported by FaceLandmarkDetector), frames
+    are the decoded, unmirrored BGR frames.
+    """
+
+    def __init__(self, threshold=3.0, max_skip=5, margin=0.5, thumbnail_size=(32, 16)):
+        self.threshold = threshold  # mean absolute grey-level difference (0-255) counted as a change
+        self.max_skip = max_skip
+        self.margin = margin  # region padding, as a fraction of its width
+        self.thumbnail_size = thumbnail_size
+        self._region = None  # (x0, y0, x1, y1) in unmirrored frame coordinates
+        self._reference = None
+        self._skipped = 0
+
+    def reset(self):
+        self._region = None
+        self._reference = None
+        self._skipped = 0
+
+    def can_skip(self, frame):
+        """True if the frame is close enough to the last inferred one to reuse its landmarks."""
+        if self._reference is None or self._skipped >= self.max_skip:
+            return False
+        thumbnail = self._thumbnail(frame)
+        if thumbnail is None or float(cv2.absdiff(thumbnail, self._reference).mean()) > self.threshold:
+            return False
+        self._skipped += 1
+        return True
+
+    def update(self, frame, points):
+        """Take the reference after an inference; points is None when no face was found."""
+        self._skipped = 0
+        if points is None:
+            self._region = None
+            self._reference = None
+            return
+
+        frame_height, frame_width = frame.shape[:2]
+        (x_min, y_min), (x_max, y_max) = points.min(axis=0), points.max(axis=0)
+        pad = self.margin * (x_max - x_min)
+        # Mirrored columns [x0, x1) are columns [width - x1, width - x0) of the decoded frame
+        x0 = int(max(0, frame_width - x_max - pad))
+        x1 = int(min(frame_width, frame_width - x_min + pad))
+        y0 = int(max(0, y_min - pad))
+        y1 = int(min(frame_height, y_max + pad))
+        self._region = (x0, y0, x1, y1) if x1 - x0 > 1 and y1 - y0 > 1 else None
+        self._reference = self._thumbnail(frame) if self._region is not None else None
+
+    def _thumbnail(self, frame):
+        if self._region is None:
+            return None
+        x0, y0, x1, y1 = self._region
+        crop = frame[y0:y1, x0:x1]
+        if crop.shape[0] < 2 or crop.shape[1] < 2:
+            return None
+        # INTER_AREA averages whole pixel blocks, which also smooths out sensor noise
+        small = cv2.resize(crop, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
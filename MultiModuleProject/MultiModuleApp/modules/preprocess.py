@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+
+from .frame_decoder import decode_frame_bytes
+from .landmarks import LEFT_EYE, RIGHT_EYE, landmark_rows
+
+# cv2.imdecode flags for decoding at 1/1, 1/2, 1/4 or 1/8 of the encoded resolution
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Outer eye corners, used to size the face region
+OUTER_CORNER_ROWS = landmark_rows([LEFT_EYE[0], RIGHT_EYE[1]])
+
+
+class FramePreprocessor:
+    """
+    Turns an encoded webcam frame into the RGB image FaceMesh runs on.
+
+    - Decodes at a reduced resolution straight from the JPEG/WebP (``decode_scale``).
+    - Crops to the face region predicted from the previous frame's landmarks. The crop is
+      only moved when the eyes drift close to its edge. FaceMesh tracks in the coordinates of
+      the image it is given, so its tracking state must be reset whenever the crop moves
+      (update_roi reports this). When the face is lost, the next frame uses the whole image.
+    - Mirrors and converts the crop to RGB into a buffer reused across frames, so the
+      full-size frame is never flipped or colour-converted.
+
+    Landmark coordinates are reported in the mirrored, decoded frame: add the offset
+    returned by prepare() to landmarks found in the crop.
+    """
+
+    def __init__(self, decode_scale=1, roi_crop=True, roi_scale=3.0, roi_keep_margin=0.15,
+                 max_roi_fraction=0.8):
+        if decode_scale not in DECODE_FLAGS:
+            raise ValueError(f"decode_scale must be one of {sorted(DECODE_FLAGS)}")
+        self.decode_scale = decode_scale
+        self.roi_crop = roi_crop
+        self.roi_scale = roi_scale  # ROI side, in multiples of the outer eye-corner distance
+        self.roi_keep_margin = roi_keep_margin  # keep the ROI while the eyes stay this far inside it
+        self.max_roi_fraction = max_roi_fraction  # larger ROIs are not worth cropping
+        self.roi = None  # (x0, y0, x1, y1) in mirrored frame coordinates, None = full frame
+        self._buffer = None
+
+    def decode(self, buffer):
+        return decode_frame_bytes(buffer, DECODE_FLAGS[self.decode_scale])
+
+    def prepare(self, frame):
+        """Return (rgb_image, (x_offset, y_offset)) for a decoded BGR frame."""
+        frame_height, frame_width = frame.shape[:2]
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+        else:
+            x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+
+        # Columns [x0, x1) of the mirrored frame are columns [width - x1, width - x0) of the original
+        crop = frame[y0:y1, frame_width - x1:frame_width - x0]
+        if self._buffer is None or self._buffer.shape != crop.shape:
+            self._buffer = np.empty_like(crop)
+        cv2.flip(crop, 1, dst=self._buffer)
+        cv2.cvtColor(self._buffer, cv2.COLOR_BGR2RGB, dst=self._buffer)
+        return self._buffer, (x0, y0)
+
+    def update_roi(self, points, frame_width, frame_height):
+        """
+        Predict the next frame's face region from this frame's tracked points (None if lost).
+        Returns True if the region changed.
+        """
+        previous_roi = self.roi
+        self.roi = self._predict_roi(points, frame_width, frame_height)
+        return self.roi != previous_roi
+
+    def _predict_roi(self, points, frame_width, frame_height):
+        if points is None or not self.roi_crop:
+            return None
+
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            margin = self.roi_keep_margin * (x1 - x0)
+            (px_min, py_min), (px_max, py_max) = points.min(axis=0), points.max(axis=0)
+            if (px_min >= x0 + margin and px_max <= x1 - margin and
+                    py_min >= y0 + margin and py_max <= y1 - margin):
+                return self.roi
+
+        (lx, ly), (rx, ry) = points[OUTER_CORNER_ROWS].tolist()
+        eye_distance = ((lx - rx) ** 2 + (ly - ry) ** 2) ** 0.5
+        side = self.roi_scale * eye_distance
+        if side * side >= self.max_roi_fraction * frame_width * frame_height:
+            return None
+
+        # The eyes sit in the upper third of the face, so centre the box below them
+        center_x = (lx + rx) / 2
+        center_y = (ly + ry) / 2 + side / 6
+        x0 = int(max(0, center_x - side / 2))
+        y0 = int(max(0, center_y - side / 2))
+        x1 = int(min(frame_width, center_x + side / 2))
+        y1 = int(min(frame_height, center_y + side / 2))
+        return (x0, y0, x1, y1) if x1 - x0 > 1 and y1 - y0 > 1 else None
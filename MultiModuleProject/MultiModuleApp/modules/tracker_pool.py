@@ -0,0 +1,159 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .tracker_session import TrackerSession
+
+logger = logging.getLogger(__name__)
+
+
+class TrackerPoolFull(Exception):
+    """Raised when every pooled session is busy and no new one may be created"""
+    pass
+
+
+class _PoolEntry:
+    def __init__(self):
+        self.session = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.evicted = False
+
+
+class TrackerSessionPool:
+    """
+    Bounded pool of TrackerSessions keyed by tracker session id.
+
+    Each key gets its own session, so users never share a FaceMesh graph or wink timers.
+    Frames for the same key are serialized by a per-entry lock while different keys run
+    in parallel. At most ``max_sessions`` sessions (and therefore MediaPipe graphs) exist
+    at once: sessions idle for longer than ``idle_timeout`` seconds are dropped, and when
+    the pool is full the least recently used idle session is evicted to make room.
+    """
+
+    def __init__(self, max_sessions=8, idle_timeout=120, session_factory=TrackerSession):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.session_factory = session_factory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.rejections = 0
+
+    @contextmanager
+    def acquire(self, key):
+        """Check out the session for ``key``, creating it if needed, for exclusive use."""
+        while True:
+            entry = self._checkout(key)
+            with entry.lock:
+                if entry.evicted:
+                    # Evicted between checkout and locking; look it up again
+                    continue
+                if entry.session is None:
+                    entry.session = self.session_factory()
+                try:
+                    yield entry.session
+                finally:
+                    entry.last_used = time.monotonic()
+                return
+
+    def discard(self, key):
+        """Drop the session for ``key`` (e.g. when its websocket closes)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.lock.acquire(blocking=False):
+                return
+            del self._entries[key]
+            entry.evicted = True
+        self._close(entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            # Read without the entry locks so a busy session never blocks health checks;
+            # session ids are left out as they double as client credentials
+            session_stats = [
+                entry.session.stats() for entry in self._entries.values()
+                if entry.session is not None and hasattr(entry.session, 'stats')
+            ]
+            return {
+                'sessions': len(self._entries),
+                'max_sessions': self.max_sessions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'idle_evictions': self.idle_evictions,
+                'rejections': self.rejections,
+                'session_stats': session_stats,
+            }
+
+    def _checkout(self, key):
+        to_close = []
+        try:
+            with self._lock:
+                to_close.extend(self._evict_idle())
+
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry
+
+                self.misses += 1
+                while len(self._entries) >= self.max_sessions:
+                    victim = self._evict_lru()
+                    if victim is None:
+                        self.rejections += 1
+                        raise TrackerPoolFull(
+                            f"All {self.max_sessions} tracker sessions are busy"
+                        )
+                    to_close.append(victim)
+
+                entry = _PoolEntry()
+                self._entries[key] = entry
+                return entry
+        finally:
+            for victim in to_close:
+                self._close(victim)
+
+    def _evict_idle(self):
+        """Remove sessions unused for idle_timeout. Caller holds the pool lock."""
+        if self.idle_timeout is None:
+            return []
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        for key, entry in list(self._entries.items()):
+            if entry.last_used < cutoff and entry.lock.acquire(blocking=False):
+                del self._entries[key]
+                entry.evicted = True
+                evicted.append(entry)
+        self.idle_evictions += len(evicted)
+        return evicted
+
+    def _evict_lru(self):
+        """Remove the least recently used session that is not busy. Caller holds the pool lock."""
+        for key, entry in self._entries.items():
+            if entry.lock.acquire(blocking=False):
+                del self._entries[key]
+                entry.evicted = True
+                self.evictions += 1
+                return entry
+        return None
+
+    def _close(self, entry):
+        # The evicting thread holds entry.lock, so nobody is using the session
+        try:
+            if entry.session is not None:
+                entry.session.close()
+        except Exception as e:
+            logger.warning(f"Error closing tracker session: {e}")
+        finally:
+            entry.session = None
+            entry.lock.release()
@@ -0,0 +1,150 @@
+import pyautogui
+import logging
+import time
+
+from .detector import FaceLandmarkDetector
+from .wink_detector import WinkDetector
+from .gaze_tracker import GazeTracker
+from .controller import CursorController
+from .preprocess import FramePreprocessor
+
+logger = logging.getLogger(__name__)
+
+
+class TrackerSession:
+    """
+    Eye-tracking state for one client: its own MediaPipe FaceMesh graph (which runs in
+    tracking mode and therefore depends on the previous frame), its own wink timers, and the
+    gaze tracker and cursor controller, which are built once with the screen geometry looked
+    up at creation time. Keeping the controller alive is what makes its click cooldown work.
+    Frames go through the session's FramePreprocessor (reduced-resolution decoding and
+    face-region cropping), whose region prediction also depends on the previous frame.
+    Clients that keep several frames in flight number them; frames that arrive after a newer
+    one was already processed are rejected (accept_sequence) rather than moving the cursor back.
+    With a MotionGate, frames that barely differ from the last inferred one reuse its
+    landmarks instead of running FaceMesh; stats() reports how many inferences were skipped
+    and the time that saved.
+    A session is not thread-safe; callers must feed it one frame at a time.
+    """
+
+    def __init__(self, face_detector=None, wink_detector_instance=None, preprocessor=None,
+                 motion_gate=None):
+        self.face_detector = face_detector or FaceLandmarkDetector()
+        self.preprocessor = preprocessor or FramePreprocessor()
+        self.motion_gate = motion_gate  # None = run FaceMesh on every frame
+        # More sensitive settings for better wink detection
+        self.wink_detector = wink_detector_instance or WinkDetector(
+            blink_threshold=0.25,
+            min_wink_duration=0.3
+        )
+        self.gaze_tracker = GazeTracker()
+        # pyautogui.size() is an OS/X11 round trip; look it up once per session
+        self.screen_width, self.screen_height = pyautogui.size()
+        self.cursor_controller = CursorController(self.screen_width, self.screen_height)
+        self.frames_processed = 0
+        self.frames_stale = 0
+        self.last_sequence = None
+        self.last_epoch = None
+        self.last_points = None
+        self.inferences_skipped = 0
+        self.inference_seconds = 0.0
+        self.gate_seconds = 0.0
+
+    def close(self):
+        stats = self.stats()
+        logger.info(
+            f"Tracker session closed: {stats['frames_processed']} frames, "
+            f"{100 * stats['skip_fraction']:.1f}% of inferences skipped, "
+            f"~{stats['cpu_saved_ms']:.0f} ms saved"
+        )
+        self.face_detector.close()
+
+    def stats(self):
+        """
+        Frame counts and motion-gate savings. The saving is estimated as the skipped frames
+        times the average FaceMesh time, minus what the gate itself cost on every frame.
+        """
+        inferences = self.frames_processed - self.inferences_skipped
+        inference_ms = 1000 * self.inference_seconds / inferences if inferences else 0.0
+        gate_ms = 1000 * self.gate_seconds / self.frames_processed if self.frames_processed else 0.0
+        return {
+            'frames_processed': self.frames_processed,
+            'frames_stale': self.frames_stale,
+            'inferences_skipped': self.inferences_skipped,
+            'skip_fraction': round(self.inferences_skipped / self.frames_processed, 3) if self.frames_processed else 0.0,
+            'inference_ms_avg': round(inference_ms, 2),
+            'gate_ms_avg': round(gate_ms, 3),
+            'cpu_saved_ms': round(self.inferences_skipped * inference_ms - 1000 * self.gate_seconds, 1),
+        }
+
+    def decode_frame(self, buffer):
+        """Decode JPEG/WebP bytes at the preprocessor's resolution; None if decoding fails."""
+        return self.preprocessor.decode(buffer)
+
+    def accept_sequence(self, sequence, epoch=None):
+        """
+        Record a client frame sequence number; False if a newer frame was already processed.
+        A client that restarts its numbering (stop and start) sends a higher epoch, which
+        starts the numbering over here too; frames from an older epoch are stale.
+        """
+        if sequence is None:
+            return True
+        if epoch is not None and epoch != self.last_epoch:
+            if self.last_epoch is not None and epoch < self.last_epoch:
+                self.frames_stale += 1
+                return False
+            self.last_epoch = epoch
+            self.last_sequence = None
+        if self.last_sequence is not None and sequence <= self.last_sequence:
+            self.frames_stale += 1
+            return False
+        self.last_sequence = sequence
+        return True
+
+    def process_frame(self, frame):
+        """Run gaze and wink detection on a decoded BGR webcam frame and drive the cursor."""
+        frame_height, frame_width = frame.shape[:2]
+        self.frames_processed += 1
+
+        skipped = False
+        if self.motion_gate is not None:
+            started = time.perf_counter()
+            skipped = self.motion_gate.can_skip(frame)
+            self.gate_seconds += time.perf_counter() - started
+
+        if skipped:
+            self.inferences_skipped += 1
+            points = self.last_points
+        else:
+            started = time.perf_counter()
+            rgb_frame, offset = self.preprocessor.prepare(frame)
+            points = self.face_detector.detect_landmark_points_rgb(rgb_frame, offset)
+            if self.preprocessor.update_roi(points, frame_width, frame_height):
+                self.face_detector.reset_tracking()
+            self.inference_seconds += time.perf_counter() - started
+            if self.motion_gate is not None:
+                self.motion_gate.update(frame, points)
+            self.last_points = points
+
+        response = {
+            'gaze': None,
+            'wink': None,
+            'skipped': skipped
+        }
+        if points is None:
+            return response
+
+        gaze, left_iris, right_iris = self.gaze_tracker.estimate_gaze(points, frame_width, frame_height)
+        if gaze and left_iris and right_iris:
+            iris_x_norm = (left_iris[0] + right_iris[0]) / 2 / frame_width
+            iris_y_norm = (left_iris[1] + right_iris[1]) / 2 / frame_height
+            self.cursor_controller.move_cursor_to_iris(iris_x_norm, iris_y_norm)
+            response['gaze'] = gaze
+
+        wink = self.wink_detector.detect_wink(points, frame_width, frame_height)
+        if wink:
+            logger.info(f"Wink detected: {wink}")
+            self.cursor_controller.click_if_wink(wink)
+            response['wink'] = wink
+
+        return response
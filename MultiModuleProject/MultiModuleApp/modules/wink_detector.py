@@ -1,8 +1,14 @@
 import time
 import logging
+import numpy as np
+
+from .landmarks import LEFT_EYE_EAR, RIGHT_EYE_EAR, landmark_rows, as_points
 
 logger = logging.getLogger(__name__)
 
+# Key points for the left and right eye EAR calculation, as rows of the tracked-points array
+EAR_ROWS = np.concatenate([landmark_rows(LEFT_EYE_EAR), landmark_rows(RIGHT_EYE_EAR)])
+
 class WinkDetector:
     def __init__(self, blink_threshold=0.25, min_wink_duration=0.3):
         self.blink_threshold = blink_threshold # Threshold for EAR below which the eye is considered closed
@@ -12,56 +18,37 @@ class WinkDetector:
         self.last_detected_wink = None
         self.last_wink_time = 0
         
-    def eye_aspect_ratio(self, eye_landmarks, frame_width, frame_height):
-        """Calculate Eye Aspect Ratio (EAR) for wink detection"""
-        try:
-            # Get vertical distances (top and bottom of eye)
-            y1 = eye_landmarks[1].y * frame_height  # Top eyelid
-            y2 = eye_landmarks[5].y * frame_height  # Bottom eyelid
-            y3 = eye_landmarks[2].y * frame_height  # Top eyelid (middle)
-            y4 = eye_landmarks[4].y * frame_height  # Bottom eyelid (middle)
-            
-            # Get horizontal distance (left and right corners)
-            x1 = eye_landmarks[0].x * frame_width   # Left corner
-            x2 = eye_landmarks[3].x * frame_width   # Right corner
-            
-            # Calculate vertical distances
-            vertical_1 = abs(y1 - y2)
-            vertical_2 = abs(y3 - y4)
-            
-            # Calculate horizontal distance  
-            horizontal = abs(x1 - x2)
-            
-            if horizontal == 0:
-                return 0
-                
-            # EAR = (|p2-p6| + |p3-p5|) / (2 * |p1-p4|)
-            ear = (vertical_1 + vertical_2) / (2.0 * horizontal)
-            return ear
-            
-        except (IndexError, AttributeError) as e:
-            logger.warning(f"Error calculating EAR: {e}")
-            return 0
+    def eye_aspect_ratios(self, points):
+        """
+        Calculate the Eye Aspect Ratio (EAR) of both eyes at once from the tracked-points array.
+        EAR = (|p2-p6| + |p3-p5|) / (2 * |p1-p4|), using vertical distances for the eyelids
+        and the horizontal distance between the corners. Returns (left_ear, right_ear).
+        """
+        eyes = points[EAR_ROWS].reshape(2, 6, 2)
+        vertical_1 = np.abs(eyes[:, 1, 1] - eyes[:, 5, 1])
+        vertical_2 = np.abs(eyes[:, 2, 1] - eyes[:, 4, 1])
+        horizontal = np.abs(eyes[:, 0, 0] - eyes[:, 3, 0])
+        ears = np.divide(vertical_1 + vertical_2, 2.0 * horizontal,
+                         out=np.zeros(2, dtype=np.float32), where=horizontal != 0)
+        left_ear, right_ear = ears.tolist()
+        return left_ear, right_ear
 
     def detect_wink(self, landmarks, frame_width, frame_height):
         """
         Detect winks using Eye Aspect Ratio (EAR)
+        Accepts the tracked-points array from FaceLandmarkDetector.detect_landmark_points
+        (or raw MediaPipe landmarks, which are converted first).
         MediaPipe face mesh landmark indices for eyes:
         Left eye: [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
         Right eye: [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
         """
-        # More accurate eye landmark indices for MediaPipe face mesh
-        LEFT_EYE = [33, 160, 158, 133, 153, 144]    # Key points for left eye EAR calculation
-        RIGHT_EYE = [362, 385, 387, 263, 373, 380]  # Key points for right eye EAR calculation
-
         try:
-            # Extract eye landmarks
-            left_eye_points = [landmarks[i] for i in LEFT_EYE]
-            right_eye_points = [landmarks[i] for i in RIGHT_EYE]
-            
+            points = as_points(landmarks, frame_width, frame_height)
+            if points is None:
+                return None
+
             # Calculate Eye Aspect Ratios
-            left_ear = self.eye_aspect_ratio(left_eye_points, frame_width, frame_height)
-            right_ear = self.eye_aspect_ratio(right_eye_points, frame_width, frame_height)
+            left_ear, right_ear = self.eye_aspect_ratios(points)
             
             # Debug logging
             logger.debug(f"Left EAR: {left_ear:.3f}, Right EAR: {right_ear:.3f}, Threshold: {self.blink_threshold}")
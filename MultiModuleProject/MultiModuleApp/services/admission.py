@@ -0,0 +1,234 @@
+"""
+Admission control for a local LLM backend.
+
+A single Ollama instance runs only a few generations at a time; more concurrent requests
+just make every one of them slower. The controller lets at most ``max_inflight``
+generations run at once, counted across all worker processes of the host, and makes the
+rest wait in a bounded queue:
+
+- Slots are ``max_inflight`` lock files in ``lock_dir``, taken with a non-blocking
+  ``fcntl.flock``. The kernel releases the lock of a worker that dies, so a crash never
+  leaks a slot. Without fcntl (Windows) or without ``lock_dir`` the slots are counted per
+  process only.
+- Priority classes: ``interactive`` requests (chat) may take any slot; lower classes
+  (``diagnostic``, e.g. manage.py test_llm) leave ``reserved_slots`` free for chat. Within a
+  process, a waiter never takes a slot while one of a higher class is waiting, waiters of a
+  class are admitted in arrival order, and a new request only takes a free slot at once when
+  nobody of its class or a higher one is waiting.
+- At most ``max_waiting`` requests wait per process; one more is rejected at once (429).
+  A request whose expected wait is longer than the time it may wait, or that is still
+  waiting when that time is up, is rejected too (503). Both carry a retry_after estimate.
+
+Waiting is done by polling the slots (every ``poll_interval`` seconds) since there is no
+cross-process queue to be woken from.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"interactive": 0, "diagnostic": 1}
+
+
+class AdmissionRejected(Exception):
+    """The backend is saturated; status is the HTTP status to answer with (429 or 503)"""
+
+    def __init__(self, message: str, status: int = 503, retry_after: float = 1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """At most ``max_inflight`` concurrent generations, across processes when fcntl is available"""
+
+    def __init__(self, name: str, max_inflight: int = 2, max_waiting: int = 16, max_wait: float = 30,
+                 reserved_slots: int = 1, lock_dir: Optional[str] = None, poll_interval: float = 0.05,
+                 enabled: bool = True):
+        self.name = name
+        self.max_inflight = max(1, max_inflight)
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.reserved_slots = min(reserved_slots, self.max_inflight - 1)
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+
+        self._files = None
+        if lock_dir and fcntl is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+            self._files = [open(os.path.join(lock_dir, f"{name}-slot-{slot}.lock"), "a+")
+                           for slot in range(self.max_inflight)]
+        self._held = set()  # slots taken by this process
+        self._waiting = {priority: deque() for priority in PRIORITIES.values()}  # tickets in arrival order
+        self._lock = threading.Lock()
+
+        self._hold_seconds = None  # moving average of how long a generation keeps its slot
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_wait = 0
+
+    @property
+    def cross_process(self) -> bool:
+        return self._files is not None
+
+    def _priority(self, priority: str) -> int:
+        try:
+            return PRIORITIES[priority]
+        except KeyError:
+            raise ValueError(f"Unknown priority class {priority!r}; expected one of {list(PRIORITIES)}")
+
+    def _try_take(self, level: int, ticket: Optional[object] = None) -> Optional[int]:
+        """A free slot for the priority level, or None; ``ticket`` is a waiter's place in the queue"""
+        with self._lock:
+            if any(self._waiting[higher] for higher in range(level)):
+                return None  # a more important request of this process goes first
+            queue = self._waiting[level]
+            if queue and queue[0] is not ticket:
+                return None  # an earlier request of the same class goes first
+            usable = self.max_inflight - (self.reserved_slots if level > 0 else 0)
+            for slot in range(usable):
+                if slot in self._held:
+                    continue
+                if self._files is not None:
+                    try:
+                        fcntl.flock(self._files[slot], fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # held by another worker
+                self._held.add(slot)
+                return slot
+            return None
+
+    def _release(self, slot: int, started: float):
+        held = time.monotonic() - started
+        with self._lock:
+            if self._files is not None:
+                fcntl.flock(self._files[slot], fcntl.LOCK_UN)
+            self._held.discard(slot)
+            self._hold_seconds = held if self._hold_seconds is None else 0.8 * self._hold_seconds + 0.2 * held
+
+    def _expected_wait(self, ahead: int) -> float:
+        # Every max_inflight generations ahead of this one take about one hold time
+        return (ahead // self.max_inflight + 1) * (self._hold_seconds or 1.0)
+
+    def _enqueue(self, level: int, timeout: float):
+        with self._lock:
+            waiting = self._waiting_count()
+            if waiting >= self.max_waiting:
+                self.rejected_full += 1
+                raise AdmissionRejected(
+                    f"Too many requests waiting for {self.name} ({waiting})", status=429,
+                    retry_after=self._expected_wait(waiting)
+                )
+            ahead = sum(len(self._waiting[higher]) for higher in range(level + 1))
+            expected = self._expected_wait(ahead)
+            if self._hold_seconds is not None and expected > timeout:
+                self.rejected_wait += 1
+                raise AdmissionRejected(
+                    f"{self.name} is busy: a slot is expected in {expected:.1f}s, "
+                    f"longer than this request can wait ({timeout:.1f}s)", retry_after=expected
+                )
+            ticket = object()
+            self._waiting[level].append(ticket)
+            self.queued += 1
+            return ticket
+
+    def _dequeue(self, level: int, ticket: object):
+        with self._lock:
+            self._waiting[level].remove(ticket)
+
+    def _waiting_count(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def _timed_out(self, timeout: float):
+        with self._lock:
+            self.rejected_wait += 1
+            waiting = self._waiting_count()
+        raise AdmissionRejected(f"{self.name} is busy: no free slot within {timeout:.1f}s",
+                                retry_after=self._expected_wait(waiting))
+
+    def _admitted(self) -> float:
+        with self._lock:
+            self.admitted += 1
+        return time.monotonic()
+
+    def _poll(self, level: int, ticket: object, give_up_at: float, timeout: float) -> Optional[int]:
+        slot = self._try_take(level, ticket)
+        if slot is None and time.monotonic() >= give_up_at:
+            self._timed_out(timeout)
+        return slot
+
+    @contextmanager
+    def acquire(self, priority: str = "interactive", timeout: Optional[float] = None):
+        """Hold a slot for the block; waits up to min(timeout, max_wait) seconds for one"""
+        if not self.enabled:
+            yield
+            return
+        level = self._priority(priority)
+        timeout = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        slot = self._try_take(level)
+        if slot is None:
+            ticket = self._enqueue(level, timeout)
+            try:
+                give_up_at = time.monotonic() + timeout
+                while slot is None:
+                    time.sleep(self.poll_interval)
+                    slot = self._poll(level, ticket, give_up_at, timeout)
+            finally:
+                self._dequeue(level, ticket)
+        started = self._admitted()
+        try:
+            yield
+        finally:
+            self._release(slot, started)
+
+    @asynccontextmanager
+    async def aacquire(self, priority: str = "interactive", timeout: Optional[float] = None):
+        """Async variant of acquire: waits without blocking the event loop"""
+        if not self.enabled:
+            yield
+            return
+        level = self._priority(priority)
+        timeout = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        slot = self._try_take(level)
+        if slot is None:
+            ticket = self._enqueue(level, timeout)
+            try:
+                give_up_at = time.monotonic() + timeout
+                while slot is None:
+                    await asyncio.sleep(self.poll_interval)
+                    slot = self._poll(level, ticket, give_up_at, timeout)
+            finally:
+                self._dequeue(level, ticket)
+        started = self._admitted()
+        try:
+            yield
+        finally:
+            self._release(slot, started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "cross_process": self.cross_process,
+                "max_inflight": self.max_inflight,
+                "inflight_here": len(self._held),
+                "waiting_here": self._waiting_count(),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected_queue_full": self.rejected_full,
+                "rejected_wait": self.rejected_wait,
+                "hold_seconds": round(self._hold_seconds, 2) if self._hold_seconds is not None else None,
+            }
@@ -0,0 +1,123 @@
+"""
+Micro-batching of concurrent generations for a local backend.
+
+A server with parallel decoding slots (Ollama with OLLAMA_NUM_PARALLEL, llama.cpp server with
+--parallel) decodes several sequences in one forward pass, which on a CPU costs little more
+than decoding one. Short persona chats arriving together reach the server at slightly
+different moments, though, and join the decoding steps one by one. The batcher collects
+the requests that arrive within ``max_wait`` seconds of each other (at most ``max_size``) and
+dispatches them as one batch:
+
+- Every request is generated by the ``run`` coroutine function given to ``submit``, in a
+  task of its own started when the batch is dispatched, so the requests of a batch reach
+  the server together while each keeps its own admission slot, timeout and outcome.
+- A batch is dispatched once it is full or ``max_wait`` after its first request, so a lone
+  request waits at most that long.
+- A caller that gives up (timeout, cancelled hedge) cancels its own generation, before or
+  after dispatch; the task is cancelled too, which releases its admission slot. Once every
+  caller of a batch has given up before it is dispatched, the batch is dropped.
+
+Batches are collected per event loop; with the ASGI server every worker has one.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+Run = Callable[[], Awaitable[Any]]
+
+
+class _Batch:
+    def __init__(self):
+        self.entries: List[tuple] = []  # (run, future)
+        self.opened_at = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches of up to ``max_size`` within ``max_wait`` seconds"""
+
+    def __init__(self, name: str, max_size: int = 4, max_wait: float = 0.005, enabled: bool = False):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self._open: Dict[asyncio.AbstractEventLoop, _Batch] = {}
+        self._tasks = set()  # dispatched generations, referenced until they finish
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self.sizes = Counter()
+        self._wait_total = 0.0
+
+    async def submit(self, run: Run) -> Any:
+        """The result of ``run()``, started together with the rest of its batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._open.get(loop)
+        if batch is None:
+            batch = self._open[loop] = _Batch()
+            batch.timer = loop.call_later(self.max_wait, self._dispatch, loop, batch)
+        batch.entries.append((run, future))
+        if len(batch.entries) >= self.max_size:
+            batch.timer.cancel()
+            self._dispatch(loop, batch)
+        # Cancelling the caller cancels the future, and with it the generation's task
+        return await future
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop, batch: _Batch):
+        if self._open.get(loop) is batch:
+            del self._open[loop]
+        entries = [(run, future) for run, future in batch.entries if not future.done()]
+        with self._lock:
+            if not entries:
+                self.dropped += 1
+                return
+            self.batches += 1
+            self.requests += len(entries)
+            self.sizes[len(entries)] += 1
+            self._wait_total += time.monotonic() - batch.opened_at
+        for run, future in entries:
+            task = loop.create_task(run())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda task, future=future: self._settle(future, task))
+            future.add_done_callback(lambda future, task=task: self._abandon(future, task))
+
+    def _abandon(self, future: asyncio.Future, task: asyncio.Task):
+        if future.cancelled() and not task.done():
+            with self._lock:
+                self.cancelled += 1
+            task.cancel()
+
+    @staticmethod
+    def _settle(future: asyncio.Future, task: asyncio.Task):
+        # Retrieve the outcome first, so asyncio does not log errors of abandoned generations
+        error = None if task.cancelled() else task.exception()
+        if future.done():
+            return
+        if task.cancelled():
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_size": self.max_size,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "batches": self.batches,
+                "requests": self.requests,
+                "dropped": self.dropped,
+                "cancelled": self.cancelled,
+                "mean_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "sizes": dict(sorted(self.sizes.items())),
+                "mean_wait_ms": round(self._wait_total / self.batches * 1000, 2) if self.batches else 0.0,
+            }
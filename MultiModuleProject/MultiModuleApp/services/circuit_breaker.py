@@ -0,0 +1,134 @@
+"""
+Per-provider circuit breaker for LLM generations.
+
+The health registry knows whether a provider answers its availability probe; it cannot tell
+that Ollama answers /api/version in a millisecond but takes two minutes, or fails, on every
+generation. The breaker watches the outcome of the real calls instead:
+
+- closed: calls go through. Each outcome goes into a window of the last ``window`` calls.
+  Once at least ``min_calls`` are in it, the breaker opens when the share of failed calls
+  reaches ``failure_rate``, or the share of calls slower than ``slow_call_seconds`` reaches
+  ``slow_call_rate``.
+- open: calls are refused (the service falls back to the next provider) for ``open_seconds``.
+- half-open: one trial call is let through at a time. ``half_open_calls`` successes in a row
+  close the breaker with an empty window; a failure or slow call opens it again.
+
+A trial whose outcome is never recorded (e.g. it was answered from the cache) does not keep
+the breaker half-open forever: after ``open_seconds`` another trial is let through.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed, open and half-open states for one provider, from the outcome of its calls"""
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 30, slow_call_rate: float = 0.5, open_seconds: float = 30,
+                 half_open_calls: int = 2):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now; in half-open state this starts the trial"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._trial_started_at = None
+                self._trial_successes = 0
+                logger.info(f"Circuit for LLM provider {self.name} is half-open, letting a trial call through")
+            if self.state == HALF_OPEN:
+                if self._trial_started_at is not None and now - self._trial_started_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._trial_started_at = now
+            return True
+
+    def record_success(self, seconds: float):
+        if seconds >= self.slow_call_seconds:
+            self._record(failed=False, slow=True, error=f"slow call ({seconds:.1f}s)")
+        else:
+            self._record(failed=False, slow=False)
+
+    def record_failure(self, error: Optional[str] = None):
+        self._record(failed=True, slow=False, error=error)
+
+    def _record(self, failed: bool, slow: bool, error: Optional[str] = None):
+        with self._lock:
+            if error:
+                self.last_error = error
+            if self.state == HALF_OPEN:
+                self._trial_started_at = None
+                if failed or slow:
+                    self._open()
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit for LLM provider {self.name} closed again")
+                return
+            if self.state == OPEN:
+                return  # a call started before the breaker opened
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._trial_started_at = None
+        self.times_opened += 1
+        logger.warning(f"Circuit for LLM provider {self.name} opened for {self.open_seconds:g}s: {self.last_error}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            state = self.state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN  # the next call will be the trial
+            return {
+                "state": state,
+                "calls": calls,
+                "failure_rate": round(sum(1 for failed, _ in self._outcomes if failed) / calls, 2) if calls else 0.0,
+                "slow_call_rate": round(sum(1 for _, slow in self._outcomes if slow) / calls, 2) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_in": round(max(0.0, self._opened_at + self.open_seconds - time.monotonic()), 1)
+                if state == OPEN else 0.0,
+                "last_error": self.last_error,
+            }
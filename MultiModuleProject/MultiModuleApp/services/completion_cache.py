@@ -0,0 +1,114 @@
+"""
+Completion cache for the LLM service, stored in a Django cache alias.
+
+Many chat messages are the same short openers ("hello", "who are you?") sent to the same
+personas. A completion is reused when everything that shapes the generation matches:
+provider, model, persona prompt, normalized message, generation parameters and the
+conversation context sent with it. Entry lifetime and the number of entries are bounded by
+the cache alias (TIMEOUT and OPTIONS.MAX_ENTRIES in settings.CACHES). Requests with a
+temperature above ``max_temperature`` are meant to vary and bypass the cache.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional, Sequence
+
+from django.core.cache import InvalidCacheBackendError, caches
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change the generated text; anything else passed to a provider is ignored
+GENERATION_PARAMS = ("temperature", "top_p", "max_tokens")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?…]+$")
+
+
+def normalize_message(message: str) -> str:
+    """Case, spacing, Unicode form and trailing punctuation do not change the answer"""
+    message = unicodedata.normalize("NFKC", message).casefold()
+    message = _WHITESPACE.sub(" ", message).strip()
+    return _TRAILING_PUNCTUATION.sub("", message)
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Completion cache with hit/miss counters (per worker process)"""
+
+    def __init__(self, alias: str = "llm", max_temperature: float = 0.7, enabled: bool = True):
+        self.alias = alias
+        self.max_temperature = max_temperature
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            return caches["default"]
+
+    def make_scope(self, provider: str, model: str, persona_prompt: Optional[str],
+                   context: Sequence[Any], params: Dict[str, Any]) -> str:
+        """Everything except the message that determines a completion"""
+        return _digest({
+            "provider": provider,
+            "model": model,
+            "persona": _digest(persona_prompt or ""),
+            "params": {name: params.get(name) for name in GENERATION_PARAMS},
+            "context": _digest(list(context)),
+        })
+
+    def make_key(self, scope: str, message: str) -> str:
+        return f"llm:completion:{_digest([scope, normalize_message(message)])}"
+
+    def is_cacheable(self, params: Dict[str, Any]) -> bool:
+        """Whether a completion with these parameters may be shared (the key is also used
+        to coalesce identical requests in flight, so this holds even when disabled)"""
+        if params.get("temperature", 0.7) > self.max_temperature:
+            with self._lock:
+                self.bypassed += 1
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        response = self.cache.get(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if response is not None:
+            logger.info("Completion cache hit")
+        return response
+
+    def set(self, key: str, response: str):
+        if not self.enabled or not response:
+            return
+        self.cache.set(key, response)
+        with self._lock:
+            self.stores += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "bypassed": self.bypassed,
+            }
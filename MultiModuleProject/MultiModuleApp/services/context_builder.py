@@ -0,0 +1,140 @@
+"""
+Conversation context for LLM prompts, bounded by a token budget.
+
+The prompt is the persona instruction (once, first, so consecutive prompts of a session
+share the longest possible prefix), then as many of the most recent exchanges as fit in
+``max_tokens``, then the new message. Exchanges that no longer fit can be condensed into
+a one-line summary of what the user asked earlier (``summarize``); this is extractive, so
+it costs no extra generation and gives the same prompt for the same history.
+
+Once the history outgrows the budget, the window does not slide by one exchange per turn:
+that would change the prompt right after the persona instruction every turn, and the model
+server would have to evaluate the whole history again. The window only starts at anchor
+exchanges, about one in ``prefix_step`` picked by a hash of the user message, so the start
+stays put for several turns and the new prompt extends the last one. Anchors depend on the
+content only, not on how much of the session was loaded, so they hold for long sessions too.
+
+build() gives the context as one prompt string, build_messages() as chat messages (system,
+user and assistant turns) in the same order.
+
+Token counts come from tiktoken when it is installed, otherwise from a character and word
+count heuristic. Neither is the model's own tokenizer, but both are close enough for a budget.
+"""
+import logging
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or the encoding cannot be loaded (offline)
+    _encoding = None
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens in text"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Words and punctuation are at least a token each; long words split into several
+    return max(len(_WORD.findall(text)), round(len(text) / 4))
+
+
+def _shorten(text: str, words: int) -> str:
+    parts = text.split()
+    return " ".join(parts[:words]) + (" ..." if len(parts) > words else "")
+
+
+class ContextBuilder:
+    """Builds the prompt for a message from the persona instruction and session history"""
+
+    def __init__(self, max_tokens: int = 512, summarize: bool = False, summary_tokens: int = 128,
+                 prefix_step: int = 4):
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+        self.prefix_step = max(1, prefix_step)
+
+    def select(self, history: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Split history (oldest first) into the older exchanges left out of the context and
+        the most recent ones that fit the budget"""
+        budget = self.max_tokens
+        kept = 0
+        for exchange in reversed(history):
+            cost = estimate_tokens(exchange["message"]) + estimate_tokens(exchange["response"]) + 8
+            if cost > budget:
+                break
+            budget -= cost
+            kept += 1
+        split = len(history) - kept
+        if split:
+            # Move the start on to the next anchor, if one is within the window that fits
+            for index in range(split, len(history)):
+                if self._is_anchor(history[index]):
+                    split = index
+                    break
+        return list(history[:split]), list(history[split:])
+
+    def _is_anchor(self, exchange: Dict[str, Any]) -> bool:
+        return zlib.crc32(exchange["message"].encode("utf-8")) % self.prefix_step == 0
+
+    def summary(self, dropped: Sequence[Dict[str, Any]]) -> Optional[str]:
+        """One line listing what the user asked in exchanges left out of the context"""
+        if not dropped:
+            return None
+        questions = []
+        budget = self.summary_tokens
+        # Most recent first, so the budget goes to the questions closest to the current one
+        for exchange in reversed(dropped):
+            question = _shorten(exchange["message"], 15)
+            cost = estimate_tokens(question) + 2
+            if cost > budget:
+                break
+            budget -= cost
+            questions.append(question)
+        if not questions:
+            return None
+        return "Earlier in this conversation the user asked: " + "; ".join(reversed(questions))
+
+    def _window(self, history: Sequence[Dict[str, Any]]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        dropped, recent = self.select(history)
+        if dropped:
+            logger.info(f"Context: {len(recent)} recent exchanges within {self.max_tokens} tokens, "
+                        f"{len(dropped)} older left out")
+        return (self.summary(dropped) if self.summarize else None), recent
+
+    def build(self, message: str, history: Sequence[Dict[str, Any]], persona_prompt: Optional[str] = None) -> str:
+        summary, recent = self._window(history)
+        parts = []
+        if persona_prompt:
+            parts.append(persona_prompt)
+        if summary:
+            parts.append(summary)
+        if recent:
+            turns = []
+            for exchange in recent:
+                turns.append(f"User: {exchange['message']}")
+                turns.append(f"Assistant: {exchange['response']}")
+            parts.append("Previous conversation:\n" + "\n".join(turns))
+        parts.append(f"User: {message}" if persona_prompt or recent or summary else message)
+        return "\n\n".join(parts)
+
+    def build_messages(self, message: str, history: Sequence[Dict[str, Any]],
+                       persona_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        summary, recent = self._window(history)
+        messages = []
+        if persona_prompt:
+            messages.append({"role": "system", "content": persona_prompt})
+        if summary:
+            messages.append({"role": "system", "content": summary})
+        for exchange in recent:
+            messages.append({"role": "user", "content": exchange["message"]})
+            messages.append({"role": "assistant", "content": exchange["response"]})
+        messages.append({"role": "user", "content": message})
+        return messages
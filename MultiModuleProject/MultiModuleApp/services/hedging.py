@@ -0,0 +1,126 @@
+"""
+Hedged requests: when the primary provider is slower than usual, ask the next one as well.
+
+A local model on CPU answers most requests in seconds, but its slowest few percent take far
+longer. Instead of waiting out that tail, a request that has not been answered (or, when
+streaming, has not received its first chunk) after the primary's ``percentile`` latency is
+sent to the next provider too. The first answer wins and the other request is cancelled.
+
+- Latencies are kept per provider and per kind ("response" for whole replies, "first_chunk"
+  for streams) over the last ``window`` calls. Until ``min_samples`` calls are in, the hedge
+  delay is ``default_delay``; it is never below ``min_delay``.
+- Hedges are rationed so a slow provider cannot double the load: every request earns
+  ``max_rate`` of a hedge, up to ``burst`` saved, and a hedge spends one. In the long run at
+  most ``max_rate`` of the requests are hedged.
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+KINDS = ("response", "first_chunk")
+
+
+class LatencyHistogram:
+    """Latencies of the last ``window`` calls, in seconds"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        # Nearest rank
+        rank = max(1, math.ceil(percent / 100 * len(samples)))
+        return samples[rank - 1]
+
+
+class HedgePolicy:
+    """When to send a hedge request, from each provider's recent latency"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 95, min_samples: int = 20,
+                 default_delay: float = 10, min_delay: float = 0.5, max_rate: float = 0.1, burst: float = 5,
+                 window: int = 200):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.burst = burst
+        self.window = window
+        self._latency: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.throttled = 0
+
+    def _histogram(self, name: str, kind: str) -> LatencyHistogram:
+        with self._lock:
+            histograms = self._latency.setdefault(name, {k: LatencyHistogram(self.window) for k in KINDS})
+        return histograms[kind]
+
+    def record(self, name: str, kind: str, seconds: float):
+        self._histogram(name, kind).record(seconds)
+
+    def delay(self, name: str, kind: str) -> float:
+        """Seconds to wait for the provider before hedging"""
+        histogram = self._histogram(name, kind)
+        if len(histogram) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+    def start_request(self):
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.max_rate)
+
+    def try_hedge(self) -> bool:
+        """Spend a hedge if the budget allows it"""
+        with self._lock:
+            if self._tokens < 1:
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def hedge_won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for name in list(self._latency):
+            latency[name] = {}
+            for kind in KINDS:
+                histogram = self._histogram(name, kind)
+                if len(histogram):
+                    latency[name][kind] = {
+                        "samples": len(histogram),
+                        "p50": round(histogram.percentile(50), 3),
+                        "p95": round(histogram.percentile(95), 3),
+                        "p99": round(histogram.percentile(99), 3),
+                        "hedge_delay": round(self.delay(name, kind), 3),
+                    }
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "throttled": self.throttled,
+            "latency": latency,
+        }
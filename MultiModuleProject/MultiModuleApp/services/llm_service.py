@@ -1,12 +1,40 @@
 """
 LLM Service Layer for handling different AI model providers
-Supports Ollama (local) and Gemini (cloud) with automatic fallback
+Supports Ollama and OpenAI-compatible servers (local) and Gemini (cloud) with automatic fallback;
+the providers and their priorities come from settings.LLM_PROVIDERS (see provider_registry)
+
+Every provider has a blocking API (generate_response / is_available) and a coroutine API
+(agenerate_response / ais_available) for async views, so pending generations do not tie up
+a worker thread each. astream_response yields the completion in chunks as it is generated.
+
+The generation methods take the whole prompt as one string, and optionally the same
+conversation as chat messages (``messages``: system, user and assistant turns) for
+providers with a chat API; the others ignore it.
 """
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import httpx
 import json
 import logging
-from typing import Optional, Dict, Any
+import threading
+import time
+from contextlib import aclosing, nullcontext
+from typing import Optional, Dict, Any, AsyncIterator, List
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .provider_health import ProviderHealthRegistry
+from .completion_cache import CompletionCache, normalize_message
+from .semantic_cache import SemanticCache
+from .single_flight import SingleFlight
+from .circuit_breaker import CircuitBreaker
+from .hedging import HedgePolicy
+from .admission import AdmissionController, AdmissionRejected
+from .batching import MicroBatcher
+from .provider_registry import ProviderRouter, ProviderSpec, load_provider_specs
+from .session_store import build_session_store
+from .context_builder import ContextBuilder
 import google.generativeai as genai
 import os
 
@@ -16,6 +44,17 @@ class LLMServiceError(Exception):
     """Custom exception for LLM service errors"""
     pass
 
+class LLMServiceOverloaded(LLMServiceError):
+    """No provider could take the request now; answer with ``status`` and a Retry-After header"""
+
+    def __init__(self, message: str, status: int = 503, retry_after: int = 1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+# Errors after which a request moves on to the next provider
+_ATTEMPT_ERRORS = (LLMServiceError, TimeoutError, AdmissionRejected)
+
 class BaseLLMProvider:
     """Base class for LLM providers"""
     
@@ -25,43 +64,169 @@ class BaseLLMProvider:
     def is_available(self) -> bool:
         raise NotImplementedError
 
+    def model_id(self) -> str:
+        """Name of the model the provider generates with"""
+        return str(getattr(self, "model", ""))
+
+    @staticmethod
+    def _build_session(pool_size: int, max_retries: int, hosts: int = 1) -> requests.Session:
+        """
+        Keep-alive connection pool (per host) for the blocking API, shared by all threads of the worker.
+        Requests that fail to connect are retried (nothing was sent yet); read errors and
+        502/503/504 responses are only retried for GET/HEAD, never for a generation POST.
+        """
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            status_forcelist=(502, 503, 504),
+            backoff_factor=0.2,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    async def agenerate_response(self, prompt: str, **kwargs) -> str:
+        """Async variant; providers without a native async client run the blocking call in a thread"""
+        return await asyncio.to_thread(self.generate_response, prompt, **kwargs)
+
+    async def ais_available(self) -> bool:
+        return await asyncio.to_thread(self.is_available)
+
+    def warm(self, system_prompt: str) -> bool:
+        """Load the model with the system prompt evaluated; False if the provider has nothing to warm"""
+        return False
+
+    async def astream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Yield the response in chunks as it is generated; by default the whole response is one chunk"""
+        yield await self.agenerate_response(prompt, **kwargs)
+
 class OllamaProvider(BaseLLMProvider):
-    """Ollama local LLM provider"""
+    """
+    Ollama local LLM provider. Conversations given as messages go to /api/chat: the persona
+    is the system message and the turns keep their roles, so the model's chat template is
+    applied and consecutive turns share a prompt prefix that Ollama does not evaluate again
+    while the model stays loaded (``keep_alive``). Plain prompts go to /api/generate.
+    """
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3:latest"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3:latest",
+                 timeout: float = 120, max_connections: int = 100, connect_timeout: float = 5,
+                 pool_size: int = 10, max_retries: int = 2, keep_alive: Optional[str] = None,
+                 use_chat: bool = True):
         self.base_url = base_url
         self.model = model
         self.api_url = f"{base_url}/api/generate"
+        self.chat_url = f"{base_url}/api/chat"
+        self.keep_alive = keep_alive  # how long the model (and its prompt cache) stays loaded, e.g. "30m"
+        self.use_chat = use_chat
+        self.timeout = timeout  # read timeout; generation on a local model can take minutes
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.session = self._build_session(pool_size, max_retries)
+        # httpx.AsyncClient is bound to the event loop it was first used on
+        self._async_client = None
+        self._async_client_loop = None
+
+    def close(self):
+        self.session.close()
+
+    def _build_payload(self, prompt: str, stream: bool = False,
+                       messages: Optional[List[Dict[str, str]]] = None, **kwargs) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "stream": stream,
+            "options": {
+                "temperature": kwargs.get("temperature", 0.7),
+                "top_p": kwargs.get("top_p", 0.9),
+                "max_tokens": kwargs.get("max_tokens", 2000)
+            }
+        }
+        if messages and self.use_chat:
+            payload["messages"] = messages
+        else:
+            payload["prompt"] = prompt
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    @staticmethod
+    def _endpoint(payload: Dict[str, Any]) -> str:
+        return "/api/chat" if "messages" in payload else "/api/generate"
+
+    @staticmethod
+    def _chunk_text(data: Dict[str, Any]) -> Optional[str]:
+        # /api/chat puts the text in message.content, /api/generate in response
+        if "message" in data:
+            return data["message"].get("content")
+        return data.get("response")
+
+    def _parse_response(self, data: Dict[str, Any]) -> str:
+        text = self._chunk_text(data)
+        if text is not None:
+            logger.info("Successfully received response from Ollama")
+            self._log_prompt_eval(data)
+            return text.strip()
+        raise LLMServiceError(f"Invalid response format from Ollama: {data}")
+
+    @staticmethod
+    def _log_prompt_eval(data: Dict[str, Any]):
+        # Present on the final response; few tokens evaluated means the prompt cache was reused
+        if "prompt_eval_duration" in data:
+            logger.info(f"Ollama prompt eval: {data.get('prompt_eval_count', 0)} tokens in "
+                        f"{data['prompt_eval_duration'] / 1e6:.0f} ms")
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Pooled client shared by all coroutines on the running event loop (one per ASGI worker).
+        A new client is created if the loop changes, e.g. when async code is driven by
+        async_to_sync under a WSGI server.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=min(self.max_connections, 20))
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _request_timeout(self, kwargs: Dict[str, Any]):
+        # A per-call timeout (the service's attempt timeout) replaces the read timeout
+        if kwargs.get("timeout"):
+            return httpx.Timeout(kwargs["timeout"], connect=self.connect_timeout)
+        return httpx.USE_CLIENT_DEFAULT
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
     
     def generate_response(self, prompt: str, **kwargs) -> str:
         """Generate response using Ollama API"""
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": kwargs.get("temperature", 0.7),
-                    "top_p": kwargs.get("top_p", 0.9),
-                    "max_tokens": kwargs.get("max_tokens", 2000)
-                }
-            }
+            payload = self._build_payload(prompt, **kwargs)
+            url = f"{self.base_url}{self._endpoint(payload)}"
             
-            logger.info(f"Sending request to Ollama: {self.api_url}")
-            response = requests.post(
-                self.api_url,
+            logger.info(f"Sending request to Ollama: {url}")
+            response = self.session.post(
+                url,
                 json=payload,
-                timeout=120  # 2 minutes timeout for local generation
+                timeout=(self.connect_timeout, kwargs.get("timeout") or self.timeout)
             )
             response.raise_for_status()
             
-            data = response.json()
-            if "response" in data:
-                logger.info("Successfully received response from Ollama")
-                return data["response"].strip()
-            else:
-                raise LLMServiceError(f"Invalid response format from Ollama: {data}")
+            return self._parse_response(response.json())
                 
+        except LLMServiceError:
+            raise
         except requests.exceptions.ConnectionError:
             raise LLMServiceError("Cannot connect to Ollama server. Make sure 'ollama serve' is running.")
         except requests.exceptions.Timeout:
@@ -74,11 +239,125 @@ class OllamaProvider(BaseLLMProvider):
     def is_available(self) -> bool:
         """Check if Ollama server is available"""
         try:
-            response = requests.get(f"{self.base_url}/api/version", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/version", timeout=(self.connect_timeout, 5))
             return response.status_code == 200
         except:
             return False
 
+    async def agenerate_response(self, prompt: str, **kwargs) -> str:
+        """Generate response using Ollama API without blocking the event loop"""
+        try:
+            payload = self._build_payload(prompt, **kwargs)
+            endpoint = self._endpoint(payload)
+
+            logger.info(f"Sending async request to Ollama: {self.base_url}{endpoint}")
+            response = await self._get_async_client().post(endpoint, json=payload,
+                                                           timeout=self._request_timeout(kwargs))
+            response.raise_for_status()
+
+            return self._parse_response(response.json())
+
+        except LLMServiceError:
+            raise
+        except httpx.ConnectError:
+            raise LLMServiceError("Cannot connect to Ollama server. Make sure 'ollama serve' is running.")
+        except httpx.TimeoutException:
+            raise LLMServiceError("Ollama request timed out. The model might be processing a complex request.")
+        except httpx.HTTPError as e:
+            raise LLMServiceError(f"Ollama API error: {str(e)}")
+        except Exception as e:
+            raise LLMServiceError(f"Unexpected error with Ollama: {str(e)}")
+
+    async def astream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream the response from Ollama. With stream=True Ollama sends one JSON object per
+        line (NDJSON), each carrying the next piece of text, until one with "done": true.
+        """
+        try:
+            payload = self._build_payload(prompt, stream=True, **kwargs)
+            endpoint = self._endpoint(payload)
+
+            logger.info(f"Streaming request to Ollama: {self.base_url}{endpoint}")
+            async with self._get_async_client().stream("POST", endpoint, json=payload,
+                                                       timeout=self._request_timeout(kwargs)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if "error" in data:
+                        raise LLMServiceError(f"Ollama API error: {data['error']}")
+                    text = self._chunk_text(data)
+                    if text:
+                        yield text
+                    if data.get("done"):
+                        logger.info("Ollama stream finished")
+                        self._log_prompt_eval(data)
+                        return
+
+        except LLMServiceError:
+            raise
+        except httpx.ConnectError:
+            raise LLMServiceError("Cannot connect to Ollama server. Make sure 'ollama serve' is running.")
+        except httpx.TimeoutException:
+            raise LLMServiceError("Ollama request timed out. The model might be processing a complex request.")
+        except httpx.HTTPError as e:
+            raise LLMServiceError(f"Ollama API error: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise LLMServiceError(f"Invalid stream format from Ollama: {str(e)}")
+
+    def warm(self, system_prompt: str) -> bool:
+        """
+        Load the model and evaluate the system prompt, so the first chat turn with it only
+        evaluates the new messages. One token is generated; Ollama needs a user turn for that.
+        """
+        payload = self._build_payload(system_prompt, messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "Hello"},
+        ])
+        payload["options"]["num_predict"] = 1
+        try:
+            response = self.session.post(f"{self.base_url}{self._endpoint(payload)}", json=payload,
+                                         timeout=(self.connect_timeout, self.timeout))
+            response.raise_for_status()
+            self._log_prompt_eval(response.json())
+            return True
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Could not prewarm Ollama: {e}")
+            return False
+
+    def embed(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Embedding vector for text from Ollama's embeddings endpoint"""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/embeddings",
+                json={"model": model or self.model, "prompt": text},
+                timeout=(self.connect_timeout, 30)
+            )
+            response.raise_for_status()
+            return response.json()["embedding"]
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            raise LLMServiceError(f"Ollama embeddings error: {str(e)}")
+
+    async def aembed(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Async variant of embed"""
+        try:
+            response = await self._get_async_client().post(
+                "/api/embeddings", json={"model": model or self.model, "prompt": text}, timeout=30
+            )
+            response.raise_for_status()
+            return response.json()["embedding"]
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            raise LLMServiceError(f"Ollama embeddings error: {str(e)}")
+
+    async def ais_available(self) -> bool:
+        """Check if Ollama server is available"""
+        try:
+            response = await self._get_async_client().get("/api/version", timeout=5)
+            return response.status_code == 200
+        except Exception:
+            return False
+
 class GeminiProvider(BaseLLMProvider):
     """Google Gemini API provider (fallback)"""
     
@@ -88,134 +367,988 @@ class GeminiProvider(BaseLLMProvider):
         
         if self.api_key:
             genai.configure(api_key=self.api_key)
+            # No shared chat session: the prompt carries the conversation, and every call stands
+            # alone so concurrent requests (different users, or both sides of a hedge) don't mix
             self.model = genai.GenerativeModel(self.model_name)
-            self.chat_session = self.model.start_chat(history=[])
         else:
             self.model = None
     
+    @staticmethod
+    def _request_options(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"timeout": kwargs["timeout"]} if kwargs.get("timeout") else {}
+
     def generate_response(self, prompt: str, **kwargs) -> str:
         """Generate response using Gemini API"""
         if not self.model:
             raise LLMServiceError("Gemini API key not configured")
         
         try:
-            response = self.chat_session.send_message(prompt)
+            response = self.model.generate_content(prompt, request_options=self._request_options(kwargs))
             return response.text.strip()
         except Exception as e:
             raise LLMServiceError(f"Gemini API error: {str(e)}")
+
+    async def agenerate_response(self, prompt: str, **kwargs) -> str:
+        """Generate response using Gemini's native async API"""
+        if not self.model:
+            raise LLMServiceError("Gemini API key not configured")
+
+        try:
+            response = await self.model.generate_content_async(prompt,
+                                                               request_options=self._request_options(kwargs))
+            return response.text.strip()
+        except Exception as e:
+            raise LLMServiceError(f"Gemini API error: {str(e)}")
+
+    async def astream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream response chunks using Gemini's async streaming API"""
+        if not self.model:
+            raise LLMServiceError("Gemini API key not configured")
+
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True,
+                                                               request_options=self._request_options(kwargs))
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise LLMServiceError(f"Gemini API error: {str(e)}")
+
+    async def ais_available(self) -> bool:
+        return self.is_available()
+
+    def model_id(self) -> str:
+        return self.model_name
     
     def is_available(self) -> bool:
         """Check if Gemini API is available"""
         return self.api_key is not None and self.model is not None
 
+class _ServerInstance:
+    """One server behind an OpenAICompatibleProvider, with its outstanding requests"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.outstanding = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+class OpenAICompatibleProvider(BaseLLMProvider):
+    """
+    Any server with the OpenAI chat completions API: llama.cpp server, vLLM, LM Studio.
+    ``base_urls`` are the API roots (e.g. "http://localhost:8080/v1") of one or more
+    instances serving the same model, such as llama.cpp servers on different ports of one
+    host. Each request goes to the instance with the fewest outstanding requests, ties in
+    turn. An instance that cannot be connected to is skipped for ``retry_seconds`` and the
+    request goes to the next one.
+    """
+
+    def __init__(self, base_urls, model: str = "local", api_key: Optional[str] = None, timeout: float = 120,
+                 connect_timeout: float = 5, max_connections: int = 100, pool_size: int = 10,
+                 max_retries: int = 0, retry_seconds: float = 10):
+        if isinstance(base_urls, str):
+            base_urls = [base_urls]
+        if not base_urls:
+            raise ValueError("OpenAICompatibleProvider needs at least one base URL")
+        self.instances = [_ServerInstance(url) for url in base_urls]
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.retry_seconds = retry_seconds
+        # Few connection retries: another instance is tried instead
+        self.session = self._build_session(pool_size, max_retries, hosts=len(self.instances))
+        self._async_client = None
+        self._async_client_loop = None
+        self._lock = threading.Lock()
+        self._next = 0  # where the search for the least loaded instance starts, so ties take turns
+
+    def close(self):
+        self.session.close()
+
+    def _acquire(self, tried: set) -> _ServerInstance:
+        """The least loaded instance not tried yet, preferring the ones not marked down"""
+        with self._lock:
+            now = time.monotonic()
+            count = len(self.instances)
+            candidates = [self.instances[(self._next + i) % count] for i in range(count)]
+            candidates = [instance for instance in candidates if instance not in tried]
+            up = [instance for instance in candidates if instance.down_until <= now]
+            instance = min(up or candidates, key=lambda instance: instance.outstanding)
+            self._next = (self.instances.index(instance) + 1) % count
+            instance.outstanding += 1
+            instance.requests += 1
+            return instance
+
+    def _release(self, instance: _ServerInstance):
+        with self._lock:
+            instance.outstanding -= 1
+
+    def _connect_failed(self, instance: _ServerInstance, tried: set) -> bool:
+        """Skip the instance for a while; whether an instance is left to try"""
+        tried.add(instance)
+        with self._lock:
+            instance.down_until = time.monotonic() + self.retry_seconds
+            instance.failures += 1
+        logger.warning(f"Cannot connect to {instance.base_url}, skipping it for {self.retry_seconds:g}s")
+        return len(tried) < len(self.instances)
+
+    def _build_payload(self, prompt: str, stream: bool = False,
+                       messages: Optional[List[Dict[str, str]]] = None, **kwargs) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": messages or [{"role": "user", "content": prompt}],
+            "stream": stream,
+            "temperature": kwargs.get("temperature", 0.7),
+            "top_p": kwargs.get("top_p", 0.9),
+            "max_tokens": kwargs.get("max_tokens", 2000)
+        }
+
+    @staticmethod
+    def _parse_response(data: Dict[str, Any]) -> str:
+        try:
+            return data["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            raise LLMServiceError(f"Invalid response format from OpenAI-compatible server: {data}")
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Pooled client for all instances, shared by the coroutines on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=min(self.max_connections, 20))
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _request_timeout(self, kwargs: Dict[str, Any]):
+        if kwargs.get("timeout"):
+            return httpx.Timeout(kwargs["timeout"], connect=self.connect_timeout)
+        return httpx.USE_CLIENT_DEFAULT
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+
+    def generate_response(self, prompt: str, **kwargs) -> str:
+        payload = self._build_payload(prompt, **kwargs)
+        tried = set()
+        while True:
+            instance = self._acquire(tried)
+            try:
+                logger.info(f"Sending request to {instance.base_url}/chat/completions")
+                response = self.session.post(
+                    f"{instance.base_url}/chat/completions", json=payload, headers=self.headers,
+                    timeout=(self.connect_timeout, kwargs.get("timeout") or self.timeout)
+                )
+                response.raise_for_status()
+                return self._parse_response(response.json())
+            except LLMServiceError:
+                raise
+            except requests.exceptions.ConnectionError:
+                if not self._connect_failed(instance, tried):
+                    raise LLMServiceError("Cannot connect to any OpenAI-compatible server instance")
+            except requests.exceptions.Timeout:
+                raise LLMServiceError(f"Request to {instance.base_url} timed out")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                raise LLMServiceError(f"OpenAI-compatible API error from {instance.base_url}: {str(e)}")
+            finally:
+                self._release(instance)
+
+    async def agenerate_response(self, prompt: str, **kwargs) -> str:
+        payload = self._build_payload(prompt, **kwargs)
+        tried = set()
+        while True:
+            instance = self._acquire(tried)
+            try:
+                logger.info(f"Sending async request to {instance.base_url}/chat/completions")
+                response = await self._get_async_client().post(
+                    f"{instance.base_url}/chat/completions", json=payload, timeout=self._request_timeout(kwargs)
+                )
+                response.raise_for_status()
+                return self._parse_response(response.json())
+            except LLMServiceError:
+                raise
+            except httpx.ConnectError:
+                if not self._connect_failed(instance, tried):
+                    raise LLMServiceError("Cannot connect to any OpenAI-compatible server instance")
+            except httpx.TimeoutException:
+                raise LLMServiceError(f"Request to {instance.base_url} timed out")
+            except (httpx.HTTPError, ValueError) as e:
+                raise LLMServiceError(f"OpenAI-compatible API error from {instance.base_url}: {str(e)}")
+            finally:
+                self._release(instance)
+
+    async def astream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream the response as Server-Sent Events: one "data: {json}" line per chunk, with
+        the text in choices[0].delta.content, until "data: [DONE]"
+        """
+        payload = self._build_payload(prompt, stream=True, **kwargs)
+        tried = set()
+        while True:
+            instance = self._acquire(tried)
+            try:
+                logger.info(f"Streaming request to {instance.base_url}/chat/completions")
+                async with self._get_async_client().stream(
+                    "POST", f"{instance.base_url}/chat/completions", json=payload,
+                    timeout=self._request_timeout(kwargs)
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            return
+                        choices = json.loads(data).get("choices") or [{}]
+                        text = (choices[0].get("delta") or {}).get("content")
+                        if text:
+                            yield text
+                    return
+            except httpx.ConnectError:
+                if not self._connect_failed(instance, tried):
+                    raise LLMServiceError("Cannot connect to any OpenAI-compatible server instance")
+            except httpx.TimeoutException:
+                raise LLMServiceError(f"Request to {instance.base_url} timed out")
+            except httpx.HTTPError as e:
+                raise LLMServiceError(f"OpenAI-compatible API error from {instance.base_url}: {str(e)}")
+            except json.JSONDecodeError as e:
+                raise LLMServiceError(f"Invalid stream format from {instance.base_url}: {str(e)}")
+            finally:
+                self._release(instance)
+
+    def _probe(self, instance: _ServerInstance) -> bool:
+        try:
+            response = self.session.get(f"{instance.base_url}/models", headers=self.headers,
+                                        timeout=(self.connect_timeout, 5))
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    async def _aprobe(self, instance: _ServerInstance) -> bool:
+        try:
+            response = await self._get_async_client().get(f"{instance.base_url}/models", timeout=5)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def _record_probes(self, results: List[bool]) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            for instance, up in zip(self.instances, results):
+                instance.down_until = 0.0 if up else max(instance.down_until, now + self.retry_seconds)
+        return any(results)
+
+    def is_available(self) -> bool:
+        """Available if any instance answers; the others are skipped until they do"""
+        return self._record_probes([self._probe(instance) for instance in self.instances])
+
+    async def ais_available(self) -> bool:
+        return self._record_probes(await asyncio.gather(*(self._aprobe(instance) for instance in self.instances)))
+
+    def instance_stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            return [{
+                "base_url": instance.base_url,
+                "outstanding": instance.outstanding,
+                "requests": instance.requests,
+                "connect_failures": instance.failures,
+                "skipped_for": round(max(0.0, instance.down_until - now), 1),
+            } for instance in self.instances]
+
+class _CacheLookup:
+    """Where a request's completion is cached: exact key, semantic scope and message embedding"""
+
+    def __init__(self, scope: str, key: str, message: str):
+        self.scope = scope
+        self.key = key
+        self.message = message
+        self.embedding = None  # computed only when the semantic cache is consulted
+
+PROVIDER_BACKENDS = {
+    "ollama": OllamaProvider,
+    "gemini": GeminiProvider,
+    "openai": OpenAICompatibleProvider,
+}
+
+def _default_provider_specs() -> List[Dict[str, Any]]:
+    """Ollama and Gemini, DEFAULT_LLM_PROVIDER first (when LLM_PROVIDERS is not set)"""
+    primary = getattr(settings, 'DEFAULT_LLM_PROVIDER', 'ollama')
+    return [{"name": name, "backend": name, "priority": 0 if name == primary else 1} for name in ("ollama", "gemini")]
+
+def _build_provider(spec: ProviderSpec) -> BaseLLMProvider:
+    options = dict(spec.options)
+    if spec.backend == "ollama":
+        # The OLLAMA_* settings, unless the entry's options say otherwise
+        options = {
+            "base_url": getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434'),
+            "model": getattr(settings, 'OLLAMA_MODEL', 'llama3:latest'),
+            "timeout": getattr(settings, 'OLLAMA_TIMEOUT', 120),
+            "max_connections": getattr(settings, 'OLLAMA_MAX_CONNECTIONS', 100),
+            "connect_timeout": getattr(settings, 'OLLAMA_CONNECT_TIMEOUT', 5),
+            "pool_size": getattr(settings, 'OLLAMA_POOL_SIZE', 10),
+            "max_retries": getattr(settings, 'OLLAMA_MAX_RETRIES', 2),
+            "keep_alive": getattr(settings, 'OLLAMA_KEEP_ALIVE', None),
+            "use_chat": getattr(settings, 'OLLAMA_USE_CHAT', True),
+            **options
+        }
+    try:
+        return spec.provider_class(**options)
+    except (TypeError, ValueError) as e:
+        raise ImproperlyConfigured(f"Invalid options for LLM provider {spec.name!r}: {e}")
+
 class LLMService:
     """
     Main LLM service that handles provider selection and fallback
     """
     
-    def __init__(self, primary_provider: str = "ollama"):
-        self.primary_provider = primary_provider
-        self.providers = {
-            "ollama": OllamaProvider(
-                base_url=getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434'),
-                model=getattr(settings, 'OLLAMA_MODEL', 'llama3:latest')
-            ),
-            "gemini": GeminiProvider()
-        }
+    def __init__(self, provider_specs: Optional[List[Dict[str, Any]]] = None):
+        specs = load_provider_specs(
+            provider_specs if provider_specs is not None else getattr(settings, 'LLM_PROVIDERS', None)
+            or _default_provider_specs(),
+            PROVIDER_BACKENDS
+        )
+        self.provider_specs = {spec.name: spec for spec in specs}
+        self.providers = {spec.name: _build_provider(spec) for spec in specs}
+        # By priority, and by weight among providers of the same priority
+        self.router = ProviderRouter(specs)
+        self.primary_provider = self.router.ranked()[0]
         
-        # Chat session management for maintaining context
-        self.chat_sessions = {}
+        # Chat sessions for maintaining context, bounded in number, idle time and size
+        self.sessions = build_session_store(
+            backend=getattr(settings, 'CHAT_SESSION_BACKEND', 'memory'),
+            alias=getattr(settings, 'CHAT_SESSION_CACHE_ALIAS', 'chat_sessions'),
+            max_sessions=getattr(settings, 'CHAT_SESSION_MAX_SESSIONS', 1000),
+            ttl=getattr(settings, 'CHAT_SESSION_TTL', 3600),
+            max_exchanges=getattr(settings, 'CHAT_SESSION_MAX_EXCHANGES', 50),
+            max_bytes=getattr(settings, 'CHAT_SESSION_MAX_BYTES', 64 * 1024)
+        )
+        # Persona instruction once, then as much recent history as fits the token budget
+        self.context_builder = ContextBuilder(
+            max_tokens=getattr(settings, 'LLM_CONTEXT_MAX_TOKENS', 512),
+            summarize=getattr(settings, 'LLM_CONTEXT_SUMMARIZE', False),
+            summary_tokens=getattr(settings, 'LLM_CONTEXT_SUMMARY_TOKENS', 128),
+            prefix_step=getattr(settings, 'LLM_CONTEXT_PREFIX_STEP', 4)
+        )
+        self.context_max_exchanges = getattr(settings, 'LLM_CONTEXT_MAX_EXCHANGES', 10)
+
+        # Cached availability, so chat requests do not probe providers themselves
+        self.health = ProviderHealthRegistry(
+            self.providers,
+            ttl=getattr(settings, 'LLM_HEALTH_TTL', 30),
+            base_backoff=getattr(settings, 'LLM_HEALTH_BACKOFF', 2),
+            max_backoff=getattr(settings, 'LLM_HEALTH_MAX_BACKOFF', 60)
+        )
+
+        # Failing or slow providers are skipped for a while, and a request falls back to the
+        # next provider within its deadline
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                window=getattr(settings, 'LLM_BREAKER_WINDOW', 20),
+                min_calls=getattr(settings, 'LLM_BREAKER_MIN_CALLS', 5),
+                failure_rate=getattr(settings, 'LLM_BREAKER_FAILURE_RATE', 0.5),
+                slow_call_seconds=getattr(settings, 'LLM_BREAKER_SLOW_CALL_SECONDS', 30),
+                slow_call_rate=getattr(settings, 'LLM_BREAKER_SLOW_CALL_RATE', 0.5),
+                open_seconds=getattr(settings, 'LLM_BREAKER_OPEN_SECONDS', 30)
+            )
+            for name in self.providers
+        }
+        self.request_deadline = getattr(settings, 'LLM_REQUEST_DEADLINE', 60)
+        self.attempt_timeout = getattr(settings, 'LLM_ATTEMPT_TIMEOUT', 30)
+        local = [spec for spec in specs if spec.local]
+        # At most a few generations at once on each local backend, across worker processes
+        self.admission = {
+            spec.name: AdmissionController(
+                spec.name,
+                max_inflight=spec.max_inflight or getattr(settings, 'LLM_ADMISSION_MAX_INFLIGHT', 2)
+                * len(getattr(self.providers[spec.name], "instances", [None])),
+                max_waiting=getattr(settings, 'LLM_ADMISSION_MAX_WAITING', 16),
+                max_wait=getattr(settings, 'LLM_ADMISSION_MAX_WAIT', 20),
+                reserved_slots=getattr(settings, 'LLM_ADMISSION_RESERVED_SLOTS', 1),
+                lock_dir=getattr(settings, 'LLM_ADMISSION_LOCK_DIR', None),
+                enabled=getattr(settings, 'LLM_ADMISSION_ENABLED', True)
+            )
+            for spec in local
+        }
+        # Opt-in: async generations arriving together are sent to the server's parallel slots at
+        # once; each still takes its own admission slot
+        self.batchers = {
+            spec.name: MicroBatcher(
+                spec.name,
+                max_size=getattr(settings, 'LLM_BATCH_MAX_SIZE', 4),
+                max_wait=getattr(settings, 'LLM_BATCH_MAX_WAIT_MS', 5) / 1000,
+                enabled=getattr(settings, 'LLM_BATCH_ENABLED', False)
+            )
+            for spec in local
+        }
+        # Opt-in: a request the primary is slow to answer is also sent to the next provider
+        self.hedging = HedgePolicy(
+            enabled=getattr(settings, 'LLM_HEDGE_ENABLED', False),
+            percentile=getattr(settings, 'LLM_HEDGE_PERCENTILE', 95),
+            min_samples=getattr(settings, 'LLM_HEDGE_MIN_SAMPLES', 20),
+            default_delay=getattr(settings, 'LLM_HEDGE_DEFAULT_DELAY', 10),
+            min_delay=getattr(settings, 'LLM_HEDGE_MIN_DELAY', 0.5),
+            max_rate=getattr(settings, 'LLM_HEDGE_MAX_RATE', 0.1),
+            burst=getattr(settings, 'LLM_HEDGE_BURST', 5)
+        )
+
+        # Reuse completions of identical requests (see completion_cache for the key)
+        self.completion_cache = CompletionCache(
+            alias=getattr(settings, 'LLM_CACHE_ALIAS', 'llm'),
+            max_temperature=getattr(settings, 'LLM_CACHE_MAX_TEMPERATURE', 0.7),
+            enabled=getattr(settings, 'LLM_CACHE_ENABLED', True)
+        )
+        # Optional second layer matching paraphrases by embedding similarity
+        self.semantic_cache = SemanticCache(
+            threshold=getattr(settings, 'LLM_SEMANTIC_CACHE_THRESHOLD', 0.92),
+            max_entries=getattr(settings, 'LLM_SEMANTIC_CACHE_MAX_ENTRIES', 2000),
+            path=getattr(settings, 'LLM_SEMANTIC_CACHE_PATH', None),
+            enabled=self.completion_cache.enabled and getattr(settings, 'LLM_SEMANTIC_CACHE_ENABLED', False)
+        )
+        self.embedding_model = getattr(settings, 'OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+
+        # Identical requests arriving together share one generation (same key as the cache)
+        self.single_flight = SingleFlight(
+            timeout=getattr(settings, 'LLM_SINGLE_FLIGHT_TIMEOUT', 120),
+            enabled=getattr(settings, 'LLM_SINGLE_FLIGHT_ENABLED', True)
+        )
+
+    def _provider_order(self):
+        """Provider names in the order this request tries them"""
+        return [name for name in self.router.order() if name in self.providers]
+
+    def _log_choice(self, name: str):
+        if self.router.is_preferred(name):
+            logger.info(f"Using primary provider: {name}")
+        else:
+            logger.warning(f"Primary provider unavailable, using fallback: {name}")
+
+    def _choose_provider(self):
+        for name in self._provider_order():
+            if self.health.is_available(name):
+                self._log_choice(name)
+                return name, self.providers[name]
+        raise LLMServiceError("No LLM providers are available")
+
+    async def _achoose_provider(self):
+        for name in self._provider_order():
+            if await self.health.ais_available(name):
+                self._log_choice(name)
+                return name, self.providers[name]
+        raise LLMServiceError("No LLM providers are available")
     
     def get_available_provider(self) -> BaseLLMProvider:
         """Get the first available provider, starting with primary"""
-        # Try primary provider first
-        if self.primary_provider in self.providers:
-            provider = self.providers[self.primary_provider]
-            if provider.is_available():
-                logger.info(f"Using primary provider: {self.primary_provider}")
-                return provider
-        
-        # Try fallback providers
-        for name, provider in self.providers.items():
-            if name != self.primary_provider and provider.is_available():
-                logger.warning(f"Primary provider unavailable, using fallback: {name}")
-                return provider
-        
-        raise LLMServiceError("No LLM providers are available")
+        return self._choose_provider()[1]
+
+    async def aget_available_provider(self) -> BaseLLMProvider:
+        """Async variant of get_available_provider"""
+        return (await self._achoose_provider())[1]
     
-    def generate_response(self, prompt: str, session_id: Optional[str] = None, **kwargs) -> str:
+    def _candidates(self):
+        """Providers to try for a request, primary first: available, and not cut off by their circuit breaker"""
+        for name in self._provider_order():
+            if self.health.is_available(name) and self.breakers[name].allow():
+                self._log_choice(name)
+                yield name, self.providers[name]
+
+    async def _acandidates(self):
+        for name in self._provider_order():
+            if await self.health.ais_available(name) and self.breakers[name].allow():
+                self._log_choice(name)
+                yield name, self.providers[name]
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        return min(self.attempt_timeout, deadline - time.monotonic())
+
+    def _attempt_failed(self, name: str, error: Exception, errors: List[tuple]):
+        if isinstance(error, TimeoutError):
+            # Waited out by the request; a provider error was recorded where it was raised
+            self.breakers[name].record_failure(str(error))
+        errors.append((name, error))
+        logger.warning(f"LLM provider {name} failed, falling back to the next one: {error}")
+
+    def _no_response(self, errors: List[tuple], deadline: float) -> LLMServiceError:
+        reasons = [f"{name}: {error}" for name, error in errors]
+        if time.monotonic() >= deadline:
+            reasons.append(f"no response within {self.request_deadline:g}s")
+        if not reasons:
+            return LLMServiceError("No LLM providers are available")
+        message = "All LLM providers failed: " + "; ".join(reasons)
+        rejections = [error for _, error in errors if isinstance(error, AdmissionRejected)]
+        if rejections:
+            # Busy rather than broken: tell the client when to come back
+            return LLMServiceOverloaded(message, status=rejections[0].status, retry_after=rejections[0].retry_after)
+        return LLMServiceError(message)
+
+    def generate_response(self, prompt: str, session_id: Optional[str] = None,
+                          persona_prompt: Optional[str] = None, use_cache: bool = True,
+                          priority: str = "interactive", **kwargs) -> str:
         """
-        Generate response using the best available provider
+        Generate response using the best available provider. A provider that fails or does
+        not answer within its attempt timeout is followed by the next one, in the same
+        request, until LLM_REQUEST_DEADLINE has passed. (Hedging is only done by the async
+        variants, which can cancel the losing request.)
         
         Args:
-            prompt: The input prompt
+            prompt: The input prompt (the user's message when persona_prompt is given)
             session_id: Optional session ID for context management
+            persona_prompt: Optional persona instruction placed before the message
+            use_cache: Set to False to always generate a fresh response
+            priority: Admission class for a busy local model: "interactive" or "diagnostic"
             **kwargs: Additional generation parameters
         
         Returns:
             Generated response text
         """
-        provider = self.get_available_provider()
-        
+        deadline = time.monotonic() + self.request_deadline
+        errors = []
+
         try:
-            # For session-based conversations, you might want to add context
-            if session_id and session_id in self.chat_sessions:
-                # Add previous context if needed
-                full_prompt = self._build_contextual_prompt(prompt, session_id)
-            else:
-                full_prompt = prompt
-            
-            response = provider.generate_response(full_prompt, **kwargs)
-            
-            # Store response in session if session_id provided
-            if session_id:
-                if session_id not in self.chat_sessions:
-                    self.chat_sessions[session_id] = []
-                self.chat_sessions[session_id].append({
-                    "prompt": prompt,
-                    "response": response,
-                    "provider": provider.__class__.__name__
-                })
-            
-            return response
+            history = self._recent_history(session_id)
+            for name, provider in self._candidates():
+                timeout = self._attempt_timeout(deadline)
+                if timeout <= 0:
+                    break
+                try:
+                    full_prompt, messages, lookup = self._prepare_request(name, provider, prompt, history,
+                                                                          persona_prompt, use_cache, kwargs)
+                    response = self._find_cached(lookup)
+                    if response is None:
+                        def generate():
+                            return self._generate(name, provider, full_prompt, messages, lookup, kwargs, timeout,
+                                                  priority)
+                        response = self.single_flight.do(lookup.key, generate, timeout) if lookup else generate()
+                except _ATTEMPT_ERRORS as e:
+                    self._attempt_failed(name, e, errors)
+                    continue
+                self._record_exchange(session_id, prompt, response, provider)
+                return response
+            raise self._no_response(errors, deadline)
             
         except LLMServiceError:
             raise
         except Exception as e:
             raise LLMServiceError(f"Unexpected error generating response: {str(e)}")
+
+    async def agenerate_response(self, prompt: str, session_id: Optional[str] = None,
+                                 persona_prompt: Optional[str] = None, use_cache: bool = True,
+                                 priority: str = "interactive", **kwargs) -> str:
+        """
+        Async variant of generate_response, for async views. With LLM_HEDGE_ENABLED a slow
+        primary is hedged: see _ahedge.
+        """
+        deadline = time.monotonic() + self.request_deadline
+        errors = []
+        self.hedging.start_request()
+
+        try:
+            history = await self._arecent_history(session_id)
+
+            async def attempt(name, provider):
+                timeout = self._attempt_timeout(deadline)
+                if timeout <= 0:
+                    raise TimeoutError(f"No time left for {name}")
+                full_prompt, messages, lookup = self._prepare_request(name, provider, prompt, history,
+                                                                      persona_prompt, use_cache, kwargs)
+                response = await self._afind_cached(lookup)
+                if response is not None:
+                    return response
+
+                def generate():
+                    return self._agenerate(name, provider, full_prompt, messages, lookup, kwargs, timeout,
+                                           priority)
+                if lookup:
+                    return await self.single_flight.ado(lookup.key, generate, timeout)
+                return await asyncio.wait_for(generate(), timeout)
+
+            async with aclosing(self._acandidates()) as candidates:
+                async for first in candidates:
+                    if time.monotonic() >= deadline:
+                        break
+                    answer = await self._ahedge(candidates, first, attempt, "response", deadline, errors)
+                    if answer is not None:
+                        name, provider, response = answer
+                        await self._arecord_exchange(session_id, prompt, response, provider)
+                        return response
+            raise self._no_response(errors, deadline)
+
+        except LLMServiceError:
+            raise
+        except Exception as e:
+            raise LLMServiceError(f"Unexpected error generating response: {str(e)}")
+
+    async def astream_response(self, prompt: str, session_id: Optional[str] = None,
+                               persona_prompt: Optional[str] = None, use_cache: bool = True,
+                               priority: str = "interactive", **kwargs) -> AsyncIterator[str]:
+        """
+        Stream the response in chunks from the best available provider. The complete
+        response is recorded in the session history (and the completion cache) once the
+        stream has finished; a stream that fails or is abandoned part-way is not recorded.
+        A cached response is sent as a single chunk. Falling back to the next provider (or
+        hedging) is only possible until the first chunk has arrived, and the deadline applies
+        to it.
+        """
+        deadline = time.monotonic() + self.request_deadline
+        errors = []
+        self.hedging.start_request()
+
+        try:
+            history = await self._arecent_history(session_id)
+
+            async def attempt(name, provider):
+                """The provider's stream and its first chunk (None if it is empty)"""
+                timeout = self._attempt_timeout(deadline)
+                if timeout <= 0:
+                    raise TimeoutError(f"No time left for {name}")
+                full_prompt, messages, lookup = self._prepare_request(name, provider, prompt, history,
+                                                                      persona_prompt, use_cache, kwargs)
+                response = await self._afind_cached(lookup)
+                if response is not None:
+                    return None, response
+
+                def stream():
+                    return self._astream(name, provider, full_prompt, messages, lookup, kwargs, timeout,
+                                        priority)
+                chunks = self.single_flight.astream(lookup.key, stream, timeout) if lookup else stream()
+                try:
+                    return chunks, await asyncio.wait_for(anext(chunks, None), timeout)
+                except TimeoutError:
+                    raise TimeoutError(f"No response within {timeout:.3g}s")
+
+            answer = None
+            async with aclosing(self._acandidates()) as candidates:
+                async for first in candidates:
+                    if time.monotonic() >= deadline:
+                        break
+                    answer = await self._ahedge(candidates, first, attempt, "first_chunk", deadline, errors,
+                                                discard=self._close_stream)
+                    if answer is not None:
+                        break
+            if answer is None:
+                raise self._no_response(errors, deadline)
+
+            name, provider, (chunks, first_chunk) = answer
+            received = [] if first_chunk is None else [first_chunk]
+            if first_chunk is not None:
+                yield first_chunk
+            if chunks is not None:
+                async for chunk in chunks:
+                    received.append(chunk)
+                    yield chunk
+            await self._arecord_exchange(session_id, prompt, "".join(received).strip(), provider)
+
+        except LLMServiceError:
+            raise
+        except TimeoutError as e:
+            raise LLMServiceError(str(e))
+        except Exception as e:
+            raise LLMServiceError(f"Unexpected error generating response: {str(e)}")
+
+    @staticmethod
+    async def _close_stream(result):
+        chunks, _ = result
+        if chunks is not None:
+            await chunks.aclose()
+
+    async def _ahedge(self, candidates, first, attempt, kind: str, deadline: float, errors: List[str],
+                      discard=None):
+        """
+        Run attempt(name, provider) for the first candidate. If hedging is enabled and it has
+        not finished within the provider's hedge delay, run it for the next candidate too.
+        Returns (name, provider, result) of the first to succeed, after cancelling the other
+        (and passing a result it produced anyway to discard), or None when all failed.
+        """
+        tasks = {asyncio.ensure_future(attempt(*first)): first}
+        primary = next(iter(tasks))
+        hedge_at = time.monotonic() + self.hedging.delay(first[0], kind) if self.hedging.enabled else None
+        try:
+            while tasks:
+                wait_until = deadline if hedge_at is None else min(hedge_at, deadline)
+                done, _ = await asyncio.wait(tasks, timeout=max(0, wait_until - time.monotonic()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_at is None or time.monotonic() >= deadline:
+                        raise TimeoutError("still waiting at the deadline")
+                    hedge_at = None  # at most one hedge
+                    if self.hedging.try_hedge():
+                        second = await anext(candidates, None)
+                        if second is not None:
+                            logger.info(f"LLM provider {first[0]} is slow, hedging with {second[0]}")
+                            tasks[asyncio.ensure_future(attempt(*second))] = second
+                    continue
+                for task in done:
+                    name, provider = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except _ATTEMPT_ERRORS as e:
+                        self._attempt_failed(name, e, errors)
+                        continue
+                    if task is not primary:
+                        self.hedging.hedge_won()
+                        logger.info(f"Hedge request to {name} answered first")
+                    return name, provider, result
+            return None
+        except TimeoutError as e:
+            for name, _ in tasks.values():
+                self._attempt_failed(name, e, errors)
+            return None
+        finally:
+            # The loser (and anything still running when giving up) is cancelled
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                if discard is not None:
+                    for result in results:
+                        if not isinstance(result, BaseException):
+                            await discard(result)
+
+    # One provider call each. They update the provider's health and circuit breaker and
+    # cache the response, once per generation however many coalesced requests are waiting for it.
+
+    def _generate(self, name: str, provider: BaseLLMProvider, full_prompt: str, messages: List[Dict[str, str]],
+                  lookup: Optional["_CacheLookup"], params: Dict[str, Any], timeout: float,
+                  priority: str = "interactive") -> str:
+        entered = time.monotonic()
+        with self._admission(name, priority, timeout):
+            started = time.monotonic()
+            timeout = self._remaining(timeout, entered, started)
+            try:
+                response = provider.generate_response(full_prompt, messages=messages, timeout=timeout, **params)
+            except Exception as e:
+                raise self._provider_failed(name, e)
+        self._provider_succeeded(name, started)
+        self._store_cached(lookup, response)
+        return response
+
+    async def _agenerate(self, name: str, provider: BaseLLMProvider, full_prompt: str,
+                         messages: List[Dict[str, str]], lookup: Optional["_CacheLookup"],
+                         params: Dict[str, Any], timeout: float, priority: str = "interactive") -> str:
+        def generate():
+            return self._agenerate_admitted(name, provider, full_prompt, messages, params, timeout, priority)
+
+        batcher = self.batchers.get(name)
+        if batcher is not None and batcher.enabled:
+            # Sent together with the requests arriving alongside it; cancelling this call cancels it
+            started, response = await batcher.submit(generate)
+        else:
+            started, response = await generate()
+        self._provider_succeeded(name, started)
+        self._store_cached(lookup, response)
+        return response
+
+    async def _agenerate_admitted(self, name: str, provider: BaseLLMProvider, full_prompt: str,
+                                  messages: List[Dict[str, str]], params: Dict[str, Any], timeout: float,
+                                  priority: str) -> tuple:
+        """(started, response) of one generation, holding an admission slot while it runs"""
+        entered = time.monotonic()
+        async with self._admission(name, priority, timeout, is_async=True):
+            started = time.monotonic()
+            try:
+                response = await provider.agenerate_response(full_prompt, messages=messages,
+                                                             timeout=self._remaining(timeout, entered, started),
+                                                             **params)
+            except Exception as e:
+                raise self._provider_failed(name, e)
+        return started, response
+
+    async def _astream(self, name: str, provider: BaseLLMProvider, full_prompt: str,
+                       messages: List[Dict[str, str]], lookup: Optional["_CacheLookup"],
+                       params: Dict[str, Any], timeout: float,
+                       priority: str = "interactive") -> AsyncIterator[str]:
+        entered = time.monotonic()
+        # The slot is held until the whole reply has been streamed
+        async with self._admission(name, priority, timeout, is_async=True):
+            started = time.monotonic()
+            timeout = self._remaining(timeout, entered, started)
+            first_chunk_at = None
+            chunks = []
+            try:
+                async for chunk in provider.astream_response(full_prompt, messages=messages, timeout=timeout,
+                                                             **params):
+                    if first_chunk_at is None:
+                        first_chunk_at = time.monotonic()
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                raise self._provider_failed(name, e)
+        # The time to the first chunk is what a user waits for; rate that, not the whole reply
+        self._provider_succeeded(name, started, first_chunk_at, kind="first_chunk")
+        self._store_cached(lookup, "".join(chunks).strip())
+
+    def _admission(self, name: str, priority: str, timeout: float, is_async: bool = False):
+        """A slot of the provider's admission controller, if it has one"""
+        admission = self.admission.get(name)
+        if admission is None:
+            return nullcontext()
+        return admission.aacquire(priority, timeout) if is_async else admission.acquire(priority, timeout)
+
+    @staticmethod
+    def _remaining(timeout: float, entered: float, started: float) -> float:
+        # Time spent waiting for a slot comes out of the attempt's timeout (leaving it at least a second)
+        return max(1.0, timeout - (started - entered))
+
+    def _provider_succeeded(self, name: str, started: float, finished: Optional[float] = None,
+                            kind: str = "response"):
+        seconds = (finished or time.monotonic()) - started
+        self.health.mark_up(name)
+        self.breakers[name].record_success(seconds)
+        self.hedging.record(name, kind, seconds)
+
+    def _provider_failed(self, name: str, error: Exception) -> LLMServiceError:
+        # Failed generations count against the circuit breaker; the health registry only
+        # tracks the availability probe, so a single failure does not take the provider out
+        self.breakers[name].record_failure(str(error))
+        if isinstance(error, LLMServiceError):
+            return error
+        return LLMServiceError(f"Unexpected error generating response: {str(error)}")
+
+    def _prepare_request(self, name: str, provider: BaseLLMProvider, prompt: str, history: List[Dict[str, Any]],
+                         persona_prompt: Optional[str], use_cache: bool, params: Dict[str, Any]):
+        """
+        Return the prompt to send with its conversation context, both as one string and as chat
+        messages, and its cache lookup (None if not cacheable)
+        """
+        full_prompt = self._build_contextual_prompt(prompt, history, persona_prompt)
+        messages = self.context_builder.build_messages(prompt, history, persona_prompt)
+
+        lookup = None
+        if use_cache and self.completion_cache.is_cacheable(params):
+            context = [(exchange["message"], exchange["response"]) for exchange in history]
+            scope = self.completion_cache.make_scope(name, provider.model_id(), persona_prompt, context, params)
+            lookup = _CacheLookup(scope, self.completion_cache.make_key(scope, prompt), prompt)
+        return full_prompt, messages, lookup
+
+    def _find_cached(self, lookup: Optional["_CacheLookup"]) -> Optional[str]:
+        """Exact completion cache first, then (if enabled) the semantic cache"""
+        if lookup is None:
+            return None
+        response = self.completion_cache.get(lookup.key)
+        if response is None and self._semantic_cache_usable():
+            lookup.embedding = self._embed(lookup.message)
+            response = self._find_similar(lookup)
+        return response
+
+    async def _afind_cached(self, lookup: Optional["_CacheLookup"]) -> Optional[str]:
+        """Async variant of _find_cached"""
+        if lookup is None:
+            return None
+        response = self.completion_cache.get(lookup.key)
+        if response is None and self._semantic_cache_usable():
+            lookup.embedding = await self._aembed(lookup.message)
+            response = self._find_similar(lookup)
+        return response
+
+    def _find_similar(self, lookup: "_CacheLookup") -> Optional[str]:
+        if lookup.embedding is None:
+            return None
+        response = self.semantic_cache.get(lookup.scope, lookup.embedding)
+        if response is not None:
+            # The exact cache answers this wording directly next time
+            self.completion_cache.set(lookup.key, response)
+        return response
+
+    def _store_cached(self, lookup: Optional["_CacheLookup"], response: str):
+        if lookup is None:
+            return
+        self.completion_cache.set(lookup.key, response)
+        if lookup.embedding is not None:
+            self.semantic_cache.add(lookup.scope, lookup.embedding, response)
+
+    def _semantic_cache_usable(self) -> bool:
+        # Embeddings come from Ollama; skip the layer (rather than stall) while it is down
+        return self.semantic_cache.enabled and "ollama" in self.providers and self.health.is_available("ollama")
+
+    def _embed(self, message: str) -> Optional[List[float]]:
+        try:
+            return self.providers["ollama"].embed(normalize_message(message), model=self.embedding_model)
+        except LLMServiceError as e:
+            self.semantic_cache.embedding_errors += 1
+            logger.warning(f"Semantic cache skipped: {e}")
+            return None
+
+    async def _aembed(self, message: str) -> Optional[List[float]]:
+        try:
+            return await self.providers["ollama"].aembed(normalize_message(message), model=self.embedding_model)
+        except LLMServiceError as e:
+            self.semantic_cache.embedding_errors += 1
+            logger.warning(f"Semantic cache skipped: {e}")
+            return None
+
+    def _record_exchange(self, session_id: Optional[str], message: str, response: str, provider: BaseLLMProvider):
+        # Store response in session if session_id provided
+        if session_id:
+            self.sessions.append(session_id, {
+                "message": message,
+                "response": response,
+                "provider": provider.__class__.__name__
+            })
+
+    async def _arecord_exchange(self, session_id: Optional[str], message: str, response: str,
+                                provider: BaseLLMProvider):
+        if session_id:
+            await self.sessions.aappend(session_id, {
+                "message": message,
+                "response": response,
+                "provider": provider.__class__.__name__
+            })
+
+    def _recent_history(self, session_id: Optional[str]):
+        # The context builder keeps as many of these as fit its token budget
+        return self.sessions.history(session_id, last=self.context_max_exchanges)
+
+    async def _arecent_history(self, session_id: Optional[str]):
+        return await self.sessions.ahistory(session_id, last=self.context_max_exchanges)
     
-    def _build_contextual_prompt(self, prompt: str, session_id: str) -> str:
+    def _build_contextual_prompt(self, prompt: str, history, persona_prompt: Optional[str] = None) -> str:
         """Build prompt with conversation context"""
-        # This is a simple implementation - you can enhance it based on your needs
-        session_history = self.chat_sessions.get(session_id, [])
-        
-        # Only include last few exchanges to avoid token limits
-        recent_history = session_history[-3:] if len(session_history) > 3 else session_history
-        
-        context_parts = []
-        for exchange in recent_history:
-            context_parts.append(f"User: {exchange['prompt']}")
-            context_parts.append(f"Assistant: {exchange['response']}")
-        
-        if context_parts:
-            context = "\n".join(context_parts)
-            return f"Previous conversation:\n{context}\n\nCurrent user message: {prompt}"
-        else:
-            return prompt
+        return self.context_builder.build(prompt, history, persona_prompt)
     
+    def prewarm(self, system_prompts) -> int:
+        """Send each system prompt to the providers ahead of the first chat; returns how many were warmed"""
+        warmed = 0
+        for system_prompt in system_prompts:
+            for name in self._provider_order():
+                if self.providers[name].warm(system_prompt):
+                    warmed += 1
+        logger.info(f"Prewarmed {warmed} persona prompts")
+        return warmed
+
     def clear_session(self, session_id: str):
         """Clear chat session history"""
-        if session_id in self.chat_sessions:
-            del self.chat_sessions[session_id]
+        self.sessions.delete(session_id)
+
+    async def aclear_session(self, session_id: str):
+        await self.sessions.adelete(session_id)
     
-    def get_provider_status(self) -> Dict[str, Dict[str, Any]]:
-        """Get status of all providers"""
-        status = {}
-        for name, provider in self.providers.items():
-            status[name] = {
-                "available": provider.is_available(),
-                "type": provider.__class__.__name__
-            }
+    def get_provider_status(self, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Get status of all providers from the health registry (no network round trip unless
+        refresh=True, which probes every provider now)
+        """
+        if refresh:
+            for name in self.providers:
+                self.health.refresh(name)
+        return self._with_circuits(self.health.status())
+
+    async def aget_provider_status(self) -> Dict[str, Dict[str, Any]]:
+        """Async variant of get_provider_status (cached, never blocks)"""
+        return self._with_circuits(self.health.status())
+
+    def _with_circuits(self, status: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        for name, provider_status in status.items():
+            provider_status["circuit"] = self.breakers[name].stats()["state"]
         return status
 
 # Global instance
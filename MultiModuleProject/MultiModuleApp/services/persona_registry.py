@@ -0,0 +1,123 @@
+"""
+Persona system prompts, rendered once instead of on every chat request.
+
+The prompt template (``prompt_template.txt`` in BASE_DIR) is read and formatted for every
+persona when the app starts (MultimoduleappConfig.ready). Requests take the pre-rendered
+prompt from memory; the template file is only checked for a new mtime, at most every
+``check_interval`` seconds, and re-rendered when it changed. If the file goes missing or
+fails to render after it was loaded, the last good prompts stay in use.
+
+Because a persona always gets the same string, the prompts can also be sent to the model
+server ahead of the first chat (LLMService.prewarm) so its prompt cache already holds them.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Available personas
+PERSONA_OPTIONS = {
+    "Isaac Newton": "Mathematician and physicist",
+    "Marie Curie": "Pioneering scientist in radioactivity",
+    "William Shakespeare": "English playwright and poet",
+    "Adam Smith": "Father of modern economics",
+    "Alan Turing": "Father of computer science"
+}
+
+
+class PersonaRegistry:
+    """Pre-rendered system prompt per persona, reloaded when the template file changes"""
+
+    def __init__(self, template_path, options: Optional[Dict[str, str]] = None, check_interval: float = 2.0):
+        self.template_path = os.fspath(template_path)
+        self.options = dict(PERSONA_OPTIONS if options is None else options)
+        self.check_interval = check_interval
+        self._prompts: Dict[str, str] = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def __contains__(self, persona: str) -> bool:
+        return persona in self.options
+
+    def names(self):
+        return list(self.options)
+
+    def load(self):
+        """Read and render the template now; raises FileNotFoundError if it does not exist"""
+        with self._lock:
+            self._load(os.stat(self.template_path).st_mtime_ns)
+
+    def _load(self, mtime):
+        with open(self.template_path, "r", encoding="utf-8") as file:
+            template = file.read().strip()
+        self._prompts = {
+            name: template.format(persona_name=name, persona_description=description)
+            for name, description in self.options.items()
+        }
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+        self.reloads += 1
+        logger.info(f"Loaded persona prompts for {len(self._prompts)} personas from {self.template_path}")
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._prompts and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._prompts and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.template_path).st_mtime_ns
+                if mtime != self._mtime:
+                    self._load(mtime)
+            except (OSError, KeyError, IndexError, ValueError) as e:
+                if not self._prompts:
+                    raise
+                logger.warning(f"Keeping the loaded persona prompts, cannot reload {self.template_path}: {e}")
+
+    def prompt(self, persona: str) -> str:
+        """
+        System prompt for a persona; raises KeyError for an unknown persona and
+        FileNotFoundError if the template was never loaded and does not exist
+        """
+        if persona not in self.options:
+            raise KeyError(persona)
+        self._refresh()
+        return self._prompts[persona]
+
+    def prompts(self) -> Dict[str, str]:
+        self._refresh()
+        return dict(self._prompts)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "personas": len(self.options),
+            "loaded": bool(self._prompts),
+            "reloads": self.reloads,
+            "template": self.template_path,
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_persona_registry() -> PersonaRegistry:
+    """The registry for the template configured in settings (PERSONA_TEMPLATE_PATH)"""
+    global _registry
+    if _registry is None:
+        from django.conf import settings
+
+        with _registry_lock:
+            if _registry is None:
+                _registry = PersonaRegistry(
+                    getattr(settings, 'PERSONA_TEMPLATE_PATH', settings.BASE_DIR / 'prompt_template.txt'),
+                    check_interval=getattr(settings, 'PERSONA_TEMPLATE_CHECK_INTERVAL', 2.0)
+                )
+    return _registry
@@ -0,0 +1,140 @@
+"""
+Cached provider health for the LLM service.
+
+Probing a provider (e.g. Ollama's GET /api/version) on every chat request adds a round
+trip per request and stalls for the whole probe timeout when the server is down. The
+registry keeps the last known status of each provider instead:
+
+- A status younger than ``ttl`` seconds is used as is. An older one is still used, but a
+  probe is started on a background thread to refresh it.
+- A provider whose probe fails is marked down and not probed again until its backoff has
+  passed (``base_backoff`` seconds, doubling with every consecutive failure up to
+  ``max_backoff``). A successful request or probe marks it up again. Failed requests are
+  left to the provider's circuit breaker (see circuit_breaker).
+- Only a provider that has never been checked is probed in the caller's thread; status()
+  reports it as unavailable and checks it in the background instead.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _ProviderHealth:
+    def __init__(self):
+        self.available: Optional[bool] = None  # None = never checked
+        self.checked_at = 0.0
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        self.refreshing = False
+
+
+class ProviderHealthRegistry:
+    """Last known availability of each provider, refreshed in the background"""
+
+    def __init__(self, providers: Dict[str, Any], ttl: float = 30, base_backoff: float = 2,
+                 max_backoff: float = 60):
+        self.providers = providers
+        self.ttl = ttl
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._health = {name: _ProviderHealth() for name in providers}
+        self._lock = threading.Lock()
+
+    def is_available(self, name: str) -> bool:
+        if self._health[name].available is None:
+            self.refresh(name)
+        else:
+            self._refresh_in_background_if_due(name)
+        return bool(self._health[name].available)
+
+    async def ais_available(self, name: str) -> bool:
+        if self._health[name].available is None:
+            await asyncio.to_thread(self.refresh, name)
+        else:
+            self._refresh_in_background_if_due(name)
+        return bool(self._health[name].available)
+
+    def refresh(self, name: str) -> bool:
+        """Probe a provider now, in the calling thread, and record the result"""
+        provider = self.providers[name]
+        try:
+            available = provider.is_available()
+            error = None if available else "Availability check failed"
+        except Exception as e:
+            available, error = False, str(e)
+
+        if available:
+            self.mark_up(name)
+        else:
+            self.mark_down(name, error)
+        return available
+
+    def mark_up(self, name: str):
+        with self._lock:
+            health = self._health[name]
+            if health.available is False:
+                logger.info(f"LLM provider {name} is available again")
+            health.available = True
+            health.checked_at = time.monotonic()
+            health.consecutive_failures = 0
+            health.retry_at = 0.0
+            health.last_error = None
+
+    def mark_down(self, name: str, error: Optional[str] = None):
+        with self._lock:
+            health = self._health[name]
+            health.consecutive_failures += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (health.consecutive_failures - 1))
+            now = time.monotonic()
+            health.available = False
+            health.checked_at = now
+            health.retry_at = now + backoff
+            health.last_error = error
+        logger.warning(f"LLM provider {name} marked down for {backoff:.0f}s: {error}")
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Cached status of every provider; stale entries are refreshed in the background"""
+        now = time.monotonic()
+        status = {}
+        for name, provider in self.providers.items():
+            self._refresh_in_background_if_due(name)
+            health = self._health[name]
+            status[name] = {
+                "available": bool(health.available),
+                "type": provider.__class__.__name__,
+                "checked_seconds_ago": round(now - health.checked_at, 1) if health.available is not None else None,
+                "consecutive_failures": health.consecutive_failures,
+                "retry_in": round(max(0.0, health.retry_at - now), 1) if health.available is False else 0.0,
+                "last_error": health.last_error,
+            }
+        return status
+
+    def _refresh_in_background_if_due(self, name: str):
+        now = time.monotonic()
+        with self._lock:
+            health = self._health[name]
+            if health.refreshing:
+                return
+            if health.available is None:
+                due = True
+            elif health.available is False:
+                due = now >= health.retry_at
+            else:
+                due = now - health.checked_at >= self.ttl
+            if not due:
+                return
+            health.refreshing = True
+        threading.Thread(target=self._background_refresh, args=(name,), daemon=True,
+                         name=f"llm-health-{name}").start()
+
+    def _background_refresh(self, name: str):
+        try:
+            self.refresh(name)
+        finally:
+            with self._lock:
+                self._health[name].refreshing = False
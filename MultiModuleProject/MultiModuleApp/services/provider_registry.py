@@ -0,0 +1,96 @@
+"""
+LLM providers configured in ``settings.LLM_PROVIDERS``, and the order a request tries them in.
+
+Each entry is a dict:
+
+- ``name``: key of the provider in status, health and stats output (unique)
+- ``backend``: a registered backend ("ollama", "gemini", "openai") or the dotted path of a
+  BaseLLMProvider subclass
+- ``priority``: lower is tried first; providers of a higher priority are fallbacks
+- ``weight``: share of the requests among providers of the same priority (default 1)
+- ``local``: generations go through admission control and micro-batching; defaults to True
+  for the local backends (ollama, openai)
+- ``max_inflight``: admission slots, instead of LLM_ADMISSION_MAX_INFLIGHT per server instance
+- ``options``: keyword arguments for the provider class
+
+Within one priority the order is drawn per request, each provider coming first with a
+probability proportional to its weight; the others remain fallbacks in the same draw.
+"""
+import random
+from typing import Any, Dict, List, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+LOCAL_BACKENDS = ("ollama", "openai")
+
+
+class ProviderSpec:
+    """One entry of LLM_PROVIDERS, with its backend resolved to a provider class"""
+
+    def __init__(self, name: str, backend: str, provider_class: type, priority: int = 0, weight: float = 1.0,
+                 local: Optional[bool] = None, max_inflight: Optional[int] = None,
+                 options: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.backend = backend
+        self.provider_class = provider_class
+        self.priority = priority
+        self.weight = weight
+        self.local = backend in LOCAL_BACKENDS if local is None else local
+        self.max_inflight = max_inflight
+        self.options = options or {}
+
+
+def load_provider_specs(entries: List[Dict[str, Any]], backends: Dict[str, type]) -> List[ProviderSpec]:
+    """Validate LLM_PROVIDERS entries; backends maps the registered backend names to classes"""
+    specs = []
+    for entry in entries:
+        entry = dict(entry)
+        name = entry.pop("name", None)
+        backend = entry.pop("backend", name)
+        if not name or not backend:
+            raise ImproperlyConfigured(f"LLM_PROVIDERS entry needs a name and a backend: {entry}")
+        if name in (spec.name for spec in specs):
+            raise ImproperlyConfigured(f"LLM provider {name!r} is configured twice")
+        if backend in backends:
+            provider_class = backends[backend]
+        else:
+            try:
+                provider_class = import_string(backend)
+            except ImportError as e:
+                raise ImproperlyConfigured(
+                    f"Unknown backend {backend!r} for LLM provider {name!r}; expected one of "
+                    f"{sorted(backends)} or a dotted path: {e}"
+                )
+        weight = entry.pop("weight", 1.0)
+        if weight <= 0:
+            raise ImproperlyConfigured(f"LLM provider {name!r} needs a positive weight, not {weight}")
+        try:
+            specs.append(ProviderSpec(name, backend, provider_class, weight=weight, **entry))
+        except TypeError as e:
+            raise ImproperlyConfigured(f"Invalid LLM_PROVIDERS entry for {name!r}: {e}")
+    if not specs:
+        raise ImproperlyConfigured("LLM_PROVIDERS is empty")
+    return specs
+
+
+class ProviderRouter:
+    """Order of the providers for a request: by priority, drawn by weight within a priority"""
+
+    def __init__(self, specs: List[ProviderSpec], rng: Optional[random.Random] = None):
+        self._specs = sorted(specs, key=lambda spec: (spec.priority, -spec.weight))
+        self._rng = rng or random.Random()
+        self._top_priority = self._specs[0].priority
+
+    def ranked(self) -> List[str]:
+        """Fixed order, heaviest first within a priority (for status output)"""
+        return [spec.name for spec in self._specs]
+
+    def order(self) -> List[str]:
+        # Sorting by random() ** (1 / weight) puts a provider first with probability weight / total
+        keys = {spec.name: self._rng.random() ** (1 / spec.weight) for spec in self._specs}
+        return [spec.name for spec in sorted(self._specs, key=lambda spec: (spec.priority, -keys[spec.name]))]
+
+    def is_preferred(self, name: str) -> bool:
+        """Whether the provider has the highest priority (it is not a fallback)"""
+        return any(spec.name == name and spec.priority == self._top_priority for spec in self._specs)
@@ -0,0 +1,181 @@
+"""
+Semantic cache for the LLM service: reuses a completion when a new message means the same
+as an earlier one ("what is gravity?" / "tell me about gravity"), even though the exact
+completion cache key differs.
+
+Messages are embedded (Ollama's embeddings endpoint) and compared by cosine similarity with
+the messages cached in the same scope. A scope is everything else the exact key covers
+(provider, model, persona prompt, generation parameters, conversation context), so a match
+is only ever reused for the same persona and context. The index lives in process memory,
+holds at most ``max_entries`` entries (least recently used are evicted first), and is saved
+to ``path`` so a restarted worker starts warm. Each worker keeps its own index; the last
+one to save wins the file.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Scope:
+    def __init__(self, dimensions: int):
+        self.embeddings = np.empty((0, dimensions), dtype=np.float32)
+        self.responses = []
+        self.last_used = []
+
+
+class SemanticCache:
+    """In-process vector index of cached completions, one per cache scope"""
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 2000, path: Optional[str] = None,
+                 enabled: bool = False, save_every: int = 20):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.enabled = enabled
+        self.save_every = save_every  # save after this many new entries
+        self._scopes: Dict[str, _Scope] = {}
+        self._entries = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.embedding_errors = 0
+
+        if self.enabled and self.path:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if not vector.size or norm == 0.0:
+            return None
+        return vector / norm
+
+    def get(self, scope: str, embedding) -> Optional[str]:
+        """Cached response for the most similar message in the scope, if similar enough"""
+        vector = self._normalize(embedding)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if vector is None or entries is None or not entries.responses \
+                    or entries.embeddings.shape[1] != vector.size:
+                self.misses += 1
+                return None
+            similarities = entries.embeddings @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entries.last_used[best] = time.time()
+            logger.info(f"Semantic cache hit (similarity {similarities[best]:.3f})")
+            return entries.responses[best]
+
+    def add(self, scope: str, embedding, response: str):
+        vector = self._normalize(embedding)
+        if vector is None or not response:
+            return
+        with self._lock:
+            while self._entries >= self.max_entries:
+                self._evict_oldest()
+            entries = self._scopes.get(scope)
+            if entries is None or entries.embeddings.shape[1] != vector.size:
+                # New scope, or the embedding model changed
+                if entries is not None:
+                    self._entries -= len(entries.responses)
+                entries = self._scopes[scope] = _Scope(vector.size)
+            entries.embeddings = np.vstack([entries.embeddings, vector])
+            entries.responses.append(response)
+            entries.last_used.append(time.time())
+            self._entries += 1
+            self._unsaved += 1
+            save_now = self.path and self._unsaved >= self.save_every
+        if save_now:
+            self.save()
+
+    def _evict_oldest(self):
+        scope_key, index = min(
+            ((key, i) for key, entries in self._scopes.items() for i in range(len(entries.responses))),
+            key=lambda item: self._scopes[item[0]].last_used[item[1]]
+        )
+        entries = self._scopes[scope_key]
+        entries.embeddings = np.delete(entries.embeddings, index, axis=0)
+        del entries.responses[index]
+        del entries.last_used[index]
+        if not entries.responses:
+            del self._scopes[scope_key]
+        self._entries -= 1
+        self.evictions += 1
+
+    def save(self):
+        """Write the index to ``path`` (atomically, so a crash never leaves half a file)"""
+        if not self.path:
+            return
+        with self._lock:
+            scopes = list(self._scopes.items())
+            arrays = {f"embeddings_{i}": entries.embeddings for i, (_, entries) in enumerate(scopes)}
+            metadata = [
+                {"scope": key, "responses": entries.responses, "last_used": entries.last_used}
+                for key, entries in scopes
+            ]
+            self._unsaved = 0
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz", delete=False) as tmp:
+            np.savez(tmp, metadata=np.array(json.dumps(metadata)), **arrays)
+        os.replace(tmp.name, self.path)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                metadata = json.loads(str(data["metadata"]))
+                scopes = {}
+                for i, item in enumerate(metadata):
+                    entries = _Scope(0)
+                    entries.embeddings = data[f"embeddings_{i}"].astype(np.float32)
+                    entries.responses = list(item["responses"])
+                    entries.last_used = list(item["last_used"])
+                    scopes[item["scope"]] = entries
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load semantic cache from {self.path}: {e}")
+            return
+        with self._lock:
+            self._scopes = scopes
+            self._entries = sum(len(entries.responses) for entries in scopes.values())
+            while self._entries > self.max_entries:
+                self._evict_oldest()
+        logger.info(f"Loaded {self._entries} semantic cache entries from {self.path}")
+
+    def clear(self):
+        with self._lock:
+            self._scopes = {}
+            self._entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": self._entries,
+                "scopes": len(self._scopes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "embedding_errors": self.embedding_errors,
+            }
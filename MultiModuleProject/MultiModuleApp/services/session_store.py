@@ -0,0 +1,423 @@
+"""
+Bounded chat session store for the LLM service.
+
+A session is the persona it was started with and its exchanges (user message, response,
+provider). Every session is capped at ``max_exchanges`` exchanges and ``max_bytes`` of
+JSON; the oldest exchanges are dropped first. Sessions idle for longer than ``ttl`` seconds
+expire. Three backends:
+
+- ``memory``: a per-worker LRU dict holding at most ``max_sessions`` sessions. Fastest, but
+  each gunicorn worker has its own sessions and they are lost when the worker restarts.
+- ``cache``: a Django cache alias. With a shared backend (file, Redis, Memcached) every
+  worker sees the same sessions; the alias bounds the number of sessions (MAX_ENTRIES).
+- ``db``: a Django DatabaseCache alias (``manage.py createcachetable``), so sessions
+  survive restarts; the table is counted for the gauges.
+- ``models``: the Conversation and Message tables. The whole history is kept (the caps,
+  ``max_bytes`` included, bound what is loaded, not what is stored), each turn is one insert
+  of the user message and reply, and a request reads only the last few turns it needs. An
+  expired session starts a new context window; its messages are never deleted by expiry.
+
+The a-prefixed methods are for async views: the cache and database backends must not
+block the event loop (Django refuses database queries from async code).
+"""
+import asyncio
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import InvalidCacheBackendError, caches
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _size(session: Dict[str, Any]) -> int:
+    return len(json.dumps(session, ensure_ascii=False).encode("utf-8"))
+
+
+class SessionStore:
+    """Chat sessions with per-session caps; backends implement load, save, delete and stats"""
+
+    def __init__(self, ttl: float = 3600, max_exchanges: int = 50, max_bytes: int = 64 * 1024):
+        self.ttl = ttl
+        self.max_exchanges = max_exchanges
+        self.max_bytes = max_bytes
+        self.trimmed = 0
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, session: Dict[str, Any]):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def aload(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.load, session_id)
+
+    async def asave(self, session_id: str, session: Dict[str, Any]):
+        await asyncio.to_thread(self.save, session_id, session)
+
+    async def adelete(self, session_id: str):
+        await asyncio.to_thread(self.delete, session_id)
+
+    def start(self, session_id: str, persona: str) -> Dict[str, Any]:
+        """The session, started over (without history) if it is new or the persona changed"""
+        session = self.load(session_id)
+        if session is None or session["persona"] != persona:
+            session = {"persona": persona, "exchanges": []}
+            self.save(session_id, session)
+        return session
+
+    async def astart(self, session_id: str, persona: str) -> Dict[str, Any]:
+        session = await self.aload(session_id)
+        if session is None or session["persona"] != persona:
+            session = {"persona": persona, "exchanges": []}
+            await self.asave(session_id, session)
+        return session
+
+    def history(self, session_id: Optional[str], last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Exchanges of a session, oldest first (only the ``last`` ones if given)"""
+        session = self.load(session_id) if session_id else None
+        return self._exchanges(session, last)
+
+    async def ahistory(self, session_id: Optional[str], last: Optional[int] = None) -> List[Dict[str, Any]]:
+        session = await self.aload(session_id) if session_id else None
+        return self._exchanges(session, last)
+
+    def append(self, session_id: str, exchange: Dict[str, Any]):
+        session = self._appended(self.load(session_id), exchange)
+        self.save(session_id, session)
+
+    async def aappend(self, session_id: str, exchange: Dict[str, Any]):
+        session = self._appended(await self.aload(session_id), exchange)
+        await self.asave(session_id, session)
+
+    @staticmethod
+    def _exchanges(session: Optional[Dict[str, Any]], last: Optional[int]) -> List[Dict[str, Any]]:
+        if session is None:
+            return []
+        exchanges = session["exchanges"]
+        return exchanges[-last:] if last else exchanges
+
+    def _appended(self, session: Optional[Dict[str, Any]], exchange: Dict[str, Any]) -> Dict[str, Any]:
+        session = session or {"persona": None, "exchanges": []}
+        session["exchanges"].append(exchange)
+        self._trim(session)
+        return session
+
+    def _trim(self, session: Dict[str, Any]):
+        exchanges = session["exchanges"]
+        dropped = max(0, len(exchanges) - self.max_exchanges)
+        del exchanges[:dropped]
+        if dropped:
+            self.trimmed += dropped
+        self._trim_bytes(session)
+
+    def _trim_bytes(self, session: Dict[str, Any]):
+        exchanges = session["exchanges"]
+        dropped = 0
+        # Keep the latest exchange even if it alone is over the byte cap
+        while len(exchanges) > 1 and _size(session) > self.max_bytes:
+            del exchanges[0]
+            dropped += 1
+        if dropped:
+            self.trimmed += dropped
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process LRU of sessions with idle expiry"""
+
+    def __init__(self, max_sessions: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (session, size, last_used)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            session, size, _ = entry
+            self._sessions[session_id] = (session, size, now)
+            self._sessions.move_to_end(session_id)
+            # A copy, so callers cannot change the stored session without save()
+            return {"persona": session["persona"], "exchanges": list(session["exchanges"])}
+
+    def save(self, session_id: str, session: Dict[str, Any]):
+        size = _size(session)
+        now = time.monotonic()
+        with self._lock:
+            old = self._sessions.pop(session_id, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._sessions[session_id] = (session, size, now)
+            self._bytes += size
+            self._expire(now)
+            while len(self._sessions) > self.max_sessions:
+                _, (_, evicted_size, _) = self._sessions.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evicted += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    # Nothing here blocks, so the async variants need no thread
+
+    async def aload(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.load(session_id)
+
+    async def asave(self, session_id: str, session: Dict[str, Any]):
+        self.save(session_id, session)
+
+    async def adelete(self, session_id: str):
+        self.delete(session_id)
+
+    def _expire(self, now: float):
+        # Least recently used first, so expired sessions are all at the front
+        while self._sessions:
+            session_id, (_, size, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.ttl:
+                break
+            del self._sessions[session_id]
+            self._bytes -= size
+            self.expired += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "evicted": self.evicted,
+                "expired": self.expired,
+                "trimmed_exchanges": self.trimmed,
+            }
+
+
+class CacheSessionStore(SessionStore):
+    """Sessions in a Django cache alias; the entry timeout is renewed on every save"""
+
+    backend_name = "cache"
+
+    def __init__(self, alias: str = "chat_sessions", **kwargs):
+        super().__init__(**kwargs)
+        self.alias = alias
+        self.reads = 0
+        self.writes = 0
+
+    @property
+    def cache(self):
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            return caches["default"]
+
+    def _key(self, session_id: str) -> str:
+        return f"chat:session:{session_id}"
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self.reads += 1
+        return self.cache.get(self._key(session_id))
+
+    def save(self, session_id: str, session: Dict[str, Any]):
+        self.writes += 1
+        self.cache.set(self._key(session_id), session, timeout=self.ttl)
+
+    def delete(self, session_id: str):
+        self.cache.delete(self._key(session_id))
+
+    async def aload(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self.reads += 1
+        return await self.cache.aget(self._key(session_id))
+
+    async def asave(self, session_id: str, session: Dict[str, Any]):
+        self.writes += 1
+        await self.cache.aset(self._key(session_id), session, timeout=self.ttl)
+
+    async def adelete(self, session_id: str):
+        await self.cache.adelete(self._key(session_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend_name,
+            "alias": self.alias,
+            "reads": self.reads,
+            "writes": self.writes,
+            "trimmed_exchanges": self.trimmed,
+        }
+
+
+class DatabaseSessionStore(CacheSessionStore):
+    """Sessions in a DatabaseCache table, which also gives the session count and size"""
+
+    backend_name = "db"
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        cache = self.cache
+        table = getattr(cache, "_table", None)
+        if table is None:
+            logger.warning(f"Cache alias {self.alias} is not a DatabaseCache; session gauges unavailable")
+            return stats
+        connection = connections[router.db_for_read(cache.cache_model_class)]
+        now = connection.ops.adapt_datetimefield_value(timezone.now().replace(microsecond=0))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM {connection.ops.quote_name(table)} "
+                f"WHERE cache_key LIKE %s AND expires > %s",
+                [cache.make_key(self._key("%")), now]
+            )
+            stats["sessions"], stats["bytes"] = cursor.fetchone()
+        return stats
+
+
+class ModelSessionStore(SessionStore):
+    """Sessions as Conversation and Message rows"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.reads = 0
+        self.writes = 0
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        from MultiModuleApp.models import Conversation
+
+        self.reads += 1
+        conversation = Conversation.objects.filter(session_id=session_id).only("persona", "updated_at").first()
+        if conversation is None or (timezone.now() - conversation.updated_at).total_seconds() > self.ttl:
+            return None  # an idle session starts over
+        return {"persona": conversation.persona,
+                "exchanges": self.history(session_id, last=self.max_exchanges)}
+
+    def save(self, session_id: str, session: Dict[str, Any]):
+        """Start a new context window with the session's persona and history; earlier messages are kept"""
+        from MultiModuleApp.models import Conversation
+
+        now = timezone.now()
+        with transaction.atomic():
+            self._upsert(Conversation(session_id=session_id, persona=session["persona"] or "",
+                                      created_at=now, updated_at=now, context_started_at=now),
+                         ["persona", "updated_at", "context_started_at"])
+            self._insert(session_id, session["exchanges"], now)
+
+    def delete(self, session_id: str):
+        from MultiModuleApp.models import Conversation
+
+        Conversation.objects.filter(session_id=session_id).delete()
+
+    def history(self, session_id: Optional[str], last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The last exchanges of the current context window within max_bytes, from one query on
+        the (session_id, created_at) index
+        """
+        from MultiModuleApp.models import Message
+
+        if not session_id:
+            return []
+        self.reads += 1
+        rows = Message.objects.filter(conversation_id=session_id,
+                                      created_at__gte=F("conversation__context_started_at"))
+        rows = rows.order_by("-created_at", "-id")
+        rows = list(rows.values_list("role", "content", "provider")[:2 * (last or self.max_exchanges)])
+        exchanges, message = [], None
+        for role, content, provider in reversed(rows):
+            if role == Message.ROLE_USER:
+                message = content
+            elif message is not None:
+                exchanges.append({"message": message, "response": content, "provider": provider})
+                message = None
+        self._trim_bytes({"persona": None, "exchanges": exchanges})
+        return exchanges
+
+    def append(self, session_id: str, exchange: Dict[str, Any]):
+        """Write the turn (user message and reply) in one transaction"""
+        from MultiModuleApp.models import Conversation
+
+        now = timezone.now()
+        with transaction.atomic():
+            self._upsert(Conversation(session_id=session_id, created_at=now, updated_at=now), ["updated_at"])
+            self._insert(session_id, [exchange], now)
+
+    @staticmethod
+    def _upsert(conversation, update_fields: List[str]):
+        # One INSERT ... ON CONFLICT statement instead of a SELECT and then an INSERT or UPDATE
+        type(conversation).objects.bulk_create(
+            [conversation], update_conflicts=True, unique_fields=["session_id"], update_fields=update_fields
+        )
+
+    def _insert(self, session_id: str, exchanges: List[Dict[str, Any]], now):
+        from MultiModuleApp.models import Message
+
+        messages = []
+        for exchange in exchanges:
+            messages.append(Message(conversation_id=session_id, role=Message.ROLE_USER,
+                                    content=exchange["message"], created_at=now))
+            messages.append(Message(conversation_id=session_id, role=Message.ROLE_ASSISTANT,
+                                    content=exchange["response"], provider=exchange.get("provider", ""),
+                                    created_at=now))
+        if messages:
+            Message.objects.bulk_create(messages)
+            self.writes += 1
+
+    # The ORM is synchronous; run it on Django's thread for sync code called from async views
+
+    async def astart(self, session_id: str, persona: str) -> Dict[str, Any]:
+        return await sync_to_async(self.start)(session_id, persona)
+
+    async def ahistory(self, session_id: Optional[str], last: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await sync_to_async(self.history)(session_id, last)
+
+    async def aappend(self, session_id: str, exchange: Dict[str, Any]):
+        await sync_to_async(self.append)(session_id, exchange)
+
+    async def adelete(self, session_id: str):
+        await sync_to_async(self.delete)(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        from MultiModuleApp.models import Conversation
+
+        active_since = timezone.now() - datetime.timedelta(seconds=self.ttl)
+        return {
+            "backend": "models",
+            "sessions": Conversation.objects.filter(updated_at__gte=active_since).count(),
+            "reads": self.reads,
+            "writes": self.writes,
+            "trimmed_exchanges": self.trimmed,
+        }
+
+
+def build_session_store(backend: str = "memory", alias: str = "chat_sessions", max_sessions: int = 1000,
+                        **kwargs) -> SessionStore:
+    """Session store for a backend name: 'memory', 'cache', 'db' or 'models'"""
+    if backend == "memory":
+        return InMemorySessionStore(max_sessions=max_sessions, **kwargs)
+    if backend == "cache":
+        return CacheSessionStore(alias=alias, **kwargs)
+    if backend == "db":
+        return DatabaseSessionStore(alias=alias, **kwargs)
+    if backend == "models":
+        return ModelSessionStore(**kwargs)
+    raise ValueError(f"Unknown chat session backend: {backend}")
@@ -0,0 +1,234 @@
+"""
+Single-flight coalescing of identical LLM generations.
+
+When a room full of users sends the same message to the same persona at the same moment,
+every request would start its own generation and they would all compete for the model.
+Requests with the same completion cache key (provider, model, persona, parameters, context
+and normalized message) share one generation instead, for as long as it is running:
+
+- The first request starts the generation; the others attach to it and get its response,
+  or its error.
+- A waiter gives up after ``timeout`` seconds (or the shorter timeout given with the call)
+  with a TimeoutError. The generation goes on for the others.
+- An async generation runs in a task of its own, so a client that disconnects does not
+  cancel it for everyone else. The task is cancelled once nobody is waiting for it.
+- A streaming request on the same event loop as a streaming generation receives every
+  chunk, including those sent before it attached. Any other waiter gets the complete
+  response once it is done.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self, key: str, loop: Optional[asyncio.AbstractEventLoop] = None, streaming: bool = False):
+        self.key = key
+        self.future = concurrent.futures.Future()  # the complete response, or the error
+        self.waiters = 0
+        # Async generations only: the task running it and the loop it runs on
+        self.loop = loop
+        self.task: Optional[asyncio.Task] = None
+        # Streaming generations only: chunks so far, and a condition notified on every new one
+        self.streaming = streaming
+        self.chunks = []
+        self.changed = asyncio.Condition() if streaming else None
+
+
+class SingleFlight:
+    """Runs at most one generation per key at a time; concurrent callers share its result"""
+
+    def __init__(self, timeout: float = 120, enabled: bool = True):
+        self.timeout = timeout
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+        self.generations = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key: str, generate: Callable[[], str], timeout: Optional[float] = None) -> str:
+        """Return generate(), or the result of the identical call already running"""
+        if not self.enabled:
+            return generate()
+        flight, leader = self._attach(key)
+        try:
+            if not leader:
+                return self._wait(flight, self._timeout(timeout))
+            try:
+                response = generate()
+            except BaseException as e:
+                self._finish(flight, error=e)
+                raise
+            self._finish(flight, response)
+            return response
+        finally:
+            self._detach(flight)
+
+    async def ado(self, key: str, generate: Callable[[], Awaitable[str]], timeout: Optional[float] = None) -> str:
+        """Async variant of do(); generate returns the coroutine to run"""
+        if not self.enabled:
+            return await generate()
+        loop = asyncio.get_running_loop()
+        flight, leader = self._attach(key, loop)
+        try:
+            if leader:
+                flight.task = loop.create_task(self._run(flight, generate()))
+            return await self._await(flight, self._timeout(timeout), leader)
+        finally:
+            self._detach(flight)
+
+    async def astream(self, key: str, stream: Callable[[], AsyncIterator[str]],
+                      timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Chunks of stream(), or of the identical stream already running; waits up to ``timeout`` per chunk"""
+        if not self.enabled:
+            async for chunk in stream():
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        timeout = self._timeout(timeout)
+        flight, leader = self._attach(key, loop, streaming=True)
+        try:
+            if leader:
+                flight.task = loop.create_task(self._run(flight, self._produce(flight, stream())))
+            if not flight.streaming or flight.loop is not loop:
+                # Generated without streaming, or on another loop: send it in one piece
+                yield await self._await(flight, timeout, leader)
+                return
+
+            sent = 0
+            while True:
+                async with flight.changed:
+                    try:
+                        await asyncio.wait_for(
+                            flight.changed.wait_for(lambda: len(flight.chunks) > sent or flight.future.done()),
+                            timeout
+                        )
+                    except asyncio.TimeoutError:
+                        self._timed_out(timeout, leader)
+                    new_chunks = flight.chunks[sent:]
+                if not new_chunks and flight.future.done():
+                    flight.future.result()  # raises the generation's error, if any
+                    return
+                for chunk in new_chunks:
+                    yield chunk
+                sent += len(new_chunks)
+        finally:
+            self._detach(flight)
+
+    def _attach(self, key: str, loop: Optional[asyncio.AbstractEventLoop] = None, streaming: bool = False):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(key, loop, streaming)
+                self.generations += 1
+            else:
+                self.coalesced += 1
+            flight.waiters += 1
+        if not leader:
+            logger.info("Joined an identical generation already in flight")
+        return flight, leader
+
+    def _detach(self, flight: _Flight):
+        with self._lock:
+            flight.waiters -= 1
+            abandoned = flight.waiters == 0 and not flight.future.done()
+            if abandoned and self._flights.get(flight.key) is flight:
+                # Nobody can join a generation that is about to be cancelled
+                del self._flights[flight.key]
+        if abandoned and flight.task is not None:
+            try:
+                flight.loop.call_soon_threadsafe(flight.task.cancel)
+            except RuntimeError:
+                pass  # the loop is closed, and the task with it
+
+    def _finish(self, flight: _Flight, response: Optional[str] = None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if error is None:
+            flight.future.set_result(response)
+        else:
+            flight.future.set_exception(error)
+
+    async def _run(self, flight: _Flight, generation: Awaitable[str]):
+        try:
+            response = await generation
+        except asyncio.CancelledError:
+            self._finish(flight, error=TimeoutError("Generation cancelled: no request is waiting for it"))
+            raise
+        except Exception as e:
+            self._finish(flight, error=e)
+        else:
+            self._finish(flight, response)
+        finally:
+            if flight.streaming:
+                async with flight.changed:
+                    flight.changed.notify_all()
+
+    @staticmethod
+    async def _produce(flight: _Flight, chunks: AsyncIterator[str]) -> str:
+        try:
+            async for chunk in chunks:
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        finally:
+            # Close the provider's stream (and its connection) now, also when cancelled
+            await chunks.aclose()
+        # What a non-streamed generation would have returned
+        return "".join(flight.chunks).strip()
+
+    def _timeout(self, timeout: Optional[float]) -> float:
+        return self.timeout if timeout is None else min(timeout, self.timeout)
+
+    def _wait(self, flight: _Flight, timeout: float) -> str:
+        # Only followers wait: a synchronous leader runs the generation itself
+        try:
+            return flight.future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            if flight.future.done():
+                raise  # the generation itself timed out
+            self._timed_out(timeout, leader=False)
+
+    async def _await(self, flight: _Flight, timeout: float, leader: bool) -> str:
+        waiter = asyncio.wrap_future(flight.future)
+        try:
+            # shield: a waiter timing out must not cancel the shared future
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if flight.future.done():
+                raise  # the generation itself timed out
+            self._forget(waiter)
+            self._timed_out(timeout, leader)
+        except asyncio.CancelledError:
+            self._forget(waiter)  # e.g. the losing request of a hedge
+            raise
+
+    @staticmethod
+    def _forget(waiter: asyncio.Future):
+        # Nobody awaits the waiter any more; retrieve its outcome so asyncio does not log it
+        waiter.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    def _timed_out(self, timeout: float, leader: bool):
+        with self._lock:
+            self.timeouts += 1
+        if leader:
+            raise TimeoutError(f"No response after {timeout:.3g}s from the generation")
+        raise TimeoutError(f"No response after {timeout:.3g}s from the identical generation it joined")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._flights),
+                "generations": self.generations,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+            }
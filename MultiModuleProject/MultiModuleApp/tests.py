@@ -1,3 +1,710 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import Client, SimpleTestCase, TestCase
+from django.utils import timezone
+
+from MultiModuleApp.models import Conversation, Message
+from MultiModuleApp.modules.tracker_session import TrackerSession
+from MultiModuleApp.services.admission import AdmissionController, AdmissionRejected
+from MultiModuleApp.services.batching import MicroBatcher
+from MultiModuleApp.services.circuit_breaker import CircuitBreaker
+from MultiModuleApp.services.llm_service import LLMServiceOverloaded
+from MultiModuleApp.services.session_store import ModelSessionStore
+from MultiModuleApp.services.single_flight import SingleFlight
+from MultiModuleApp.views import overloaded_response
+
+
+def wait_until(condition, timeout=2.0):
+    """Poll condition() until it holds; fails the test after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not reached in time")
+        time.sleep(0.005)
+
+
+class SingleFlightTests(SimpleTestCase):
+    callers = 5
+
+    def setUp(self):
+        self.flight = SingleFlight(timeout=2)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def waiters(self, key):
+        flight = self.flight._flights.get(key)
+        return flight.waiters if flight else 0
+
+    def generate(self):
+        self.calls += 1
+        self.release.wait(2)
+        return "reply"
+
+    def fail(self):
+        self.calls += 1
+        self.release.wait(2)
+        raise ValueError("provider down")
+
+    def run_callers(self, generate, timeout=None):
+        """Start the callers, release the generation once all have joined; returns their futures"""
+        pool = ThreadPoolExecutor(self.callers)
+        self.addCleanup(pool.shutdown)
+        futures = [pool.submit(self.flight.do, "key", generate, timeout) for _ in range(self.callers)]
+        wait_until(lambda: self.waiters("key") == self.callers)
+        self.release.set()
+        return futures
+
+    def test_concurrent_callers_share_one_generation(self):
+        futures = self.run_callers(self.generate)
+
+        self.assertEqual([future.result(2) for future in futures], ["reply"] * self.callers)
+        self.assertEqual(self.calls, 1)
+        stats = self.flight.stats()
+        self.assertEqual(stats["generations"], 1)
+        self.assertEqual(stats["coalesced"], self.callers - 1)
+
+    def test_error_reaches_every_waiter(self):
+        futures = self.run_callers(self.fail)
+
+        for future in futures:
+            with self.assertRaisesMessage(ValueError, "provider down"):
+                future.result(2)
+        self.assertEqual(self.calls, 1)
+
+    def test_entry_is_removed_after_the_generation(self):
+        for future in self.run_callers(self.generate):
+            future.result(2)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+        self.release.clear()
+        for future in self.run_callers(self.fail):
+            with self.assertRaises(ValueError):
+                future.result(2)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+        # The next identical call starts a generation of its own
+        self.assertEqual(self.flight.do("key", lambda: "fresh"), "fresh")
+        self.assertEqual(self.flight.stats()["generations"], 3)
+
+    def test_follower_times_out_without_stopping_the_generation(self):
+        pool = ThreadPoolExecutor(1)
+        self.addCleanup(pool.shutdown)
+        leader = pool.submit(self.flight.do, "key", self.generate)
+        wait_until(lambda: self.waiters("key") == 1)
+
+        with self.assertRaisesMessage(TimeoutError, "identical generation it joined"):
+            self.flight.do("key", self.generate, timeout=0.05)
+        self.release.set()
+
+        self.assertEqual(leader.result(2), "reply")
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.stats()["timeouts"], 1)
+
+    def test_async_callers_share_one_generation(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def generate():
+                self.calls += 1
+                await release.wait()
+                return "reply"
+
+            callers = [asyncio.create_task(self.flight.ado("key", generate)) for _ in range(self.callers)]
+            while self.waiters("key") < self.callers:
+                await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(*callers)
+
+        self.assertEqual(asyncio.run(scenario()), ["reply"] * self.callers)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+    def test_async_leader_timeout_cancels_the_abandoned_generation(self):
+        cancelled = []
+
+        async def generate():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def scenario():
+            with self.assertRaisesMessage(TimeoutError, "from the generation"):
+                await self.flight.ado("key", generate, timeout=0.05)
+            await asyncio.sleep(0.01)  # let the cancellation reach the task
+
+        asyncio.run(scenario())
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(self.flight.stats()["timeouts"], 1)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+    def test_async_follower_timeout(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def generate():
+                await release.wait()
+                return "reply"
+
+            leader = asyncio.create_task(self.flight.ado("key", generate))
+            await asyncio.sleep(0)
+            with self.assertRaisesMessage(TimeoutError, "identical generation it joined"):
+                await self.flight.ado("key", generate, timeout=0.05)
+            release.set()
+            return await leader
+
+        self.assertEqual(asyncio.run(scenario()), "reply")
+        self.assertEqual(self.flight.stats()["timeouts"], 1)
+
+    def test_stream_follower_honours_its_own_timeout(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def stream():
+                yield "first "
+                await release.wait()
+                yield "second"
+
+            async def consume(timeout=None):
+                return [chunk async for chunk in self.flight.astream("key", stream, timeout)]
+
+            leader = asyncio.create_task(consume())
+            await asyncio.sleep(0.01)
+            started = time.monotonic()
+            with self.assertRaisesMessage(TimeoutError, "identical generation it joined"):
+                await consume(timeout=0.05)
+            waited = time.monotonic() - started
+            release.set()
+            return waited, await leader
+
+        waited, chunks = asyncio.run(scenario())
+        self.assertLess(waited, 1)  # not the flight's 2s timeout
+        self.assertEqual(chunks, ["first ", "second"])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("MultiModuleApp.services.circuit_breaker.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test", window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=5,
+                                      slow_call_rate=0.5, open_seconds=30, half_open_calls=2)
+
+    def trip(self):
+        for _ in range(4):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure("boom")
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_stays_closed_below_min_calls(self):
+        for _ in range(3):
+            self.breaker.record_failure("boom")
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_stays_closed_below_failure_rate(self):
+        for failed in (False, False, True, False, False, True):
+            if failed:
+                self.breaker.record_failure("boom")
+            else:
+                self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_opens_at_failure_threshold_and_refuses_calls(self):
+        self.breaker.record_success(0.1)
+        self.breaker.record_success(0.1)
+        self.breaker.record_failure("boom")
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record_failure("boom")
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        stats = self.breaker.stats()
+        self.assertEqual(stats["times_opened"], 1)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["last_error"], "boom")
+
+    def test_opens_on_slow_calls(self):
+        for _ in range(4):
+            self.breaker.record_success(6)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_half_open_lets_one_trial_through_after_open_seconds(self):
+        self.trip()
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now += 1
+        self.assertEqual(self.breaker.stats()["state"], "half_open")
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, "half_open")
+        # Only one trial at a time
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_closes_after_successful_trials(self):
+        self.trip()
+        self.clock.now += 30
+        for _ in range(2):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_success(0.1)
+
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.breaker.stats()["calls"], 0)
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_reopens_on_failed_trial(self):
+        self.trip()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success(0.1)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure("still down")
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(self.breaker.stats()["times_opened"], 2)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_reopens_on_slow_trial(self):
+        self.trip()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success(6)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_unrecorded_trial_is_retried_after_open_seconds(self):
+        self.trip()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())  # e.g. answered from the cache, never recorded
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+        self.pool = ThreadPoolExecutor(4)
+        self.addCleanup(self.pool.shutdown)
+
+    def controller(self, **options):
+        options.setdefault("poll_interval", 0.005)
+        return AdmissionController("test", lock_dir=self.lock_dir, **options)
+
+    def hold(self, controller, priority="interactive"):
+        """Take a slot in a worker thread; returns the event that releases it"""
+        release = threading.Event()
+        taken = threading.Event()
+
+        def holder():
+            with controller.acquire(priority):
+                taken.set()
+                release.wait(2)
+
+        self.pool.submit(holder)
+        self.assertTrue(taken.wait(2))
+        self.addCleanup(release.set)
+        return release
+
+    def test_slots_are_lock_files(self):
+        controller = self.controller(max_inflight=2)
+        self.assertTrue(controller.cross_process)
+        with controller.acquire():
+            with controller.acquire():
+                self.assertEqual(controller.stats()["inflight_here"], 2)
+        self.assertEqual(controller.stats()["inflight_here"], 0)
+
+    def test_slots_are_shared_with_another_controller(self):
+        # A second controller on the same lock directory stands in for another worker process
+        first = self.controller(max_inflight=1)
+        second = self.controller(max_inflight=1)
+        with first.acquire():
+            with self.assertRaises(AdmissionRejected):
+                with second.acquire(timeout=0.05):
+                    pass
+        with second.acquire(timeout=0.05):
+            pass
+
+    def test_diagnostic_requests_leave_reserved_slots_for_chat(self):
+        controller = self.controller(max_inflight=2, reserved_slots=1)
+        self.hold(controller, "diagnostic")
+
+        with self.assertRaisesMessage(AdmissionRejected, "no free slot within"):
+            with controller.acquire("diagnostic", timeout=0.05):
+                pass
+        with controller.acquire("interactive", timeout=0.05):
+            self.assertEqual(controller.stats()["inflight_here"], 2)
+
+    def test_waiting_interactive_request_goes_before_diagnostic(self):
+        controller = self.controller(max_inflight=1)
+        release = self.hold(controller)
+        admitted = []
+
+        def waiter(priority):
+            with controller.acquire(priority, timeout=2):
+                admitted.append(priority)
+
+        diagnostic = self.pool.submit(waiter, "diagnostic")
+        wait_until(lambda: controller.stats()["waiting_here"] == 1)
+        interactive = self.pool.submit(waiter, "interactive")
+        wait_until(lambda: controller.stats()["waiting_here"] == 2)
+        release.set()
+
+        diagnostic.result(2)
+        interactive.result(2)
+        self.assertEqual(admitted, ["interactive", "diagnostic"])
+
+    def test_waiters_of_one_priority_are_admitted_in_arrival_order(self):
+        controller = self.controller(max_inflight=1)
+        release = self.hold(controller)
+        admitted = []
+
+        def waiter(name):
+            with controller.acquire(timeout=2):
+                admitted.append(name)
+
+        waiters = []
+        for count, name in enumerate("abc", start=1):
+            waiters.append(self.pool.submit(waiter, name))
+            wait_until(lambda: controller.stats()["waiting_here"] == count)
+        release.set()
+
+        for future in waiters:
+            future.result(2)
+        self.assertEqual(admitted, ["a", "b", "c"])
+
+    def test_new_request_does_not_overtake_a_waiter(self):
+        # A slow poll leaves a wide window between the release and the waiter's next try
+        controller = self.controller(max_inflight=1, poll_interval=0.1)
+        release = self.hold(controller)
+        admitted = []
+
+        def waiter():
+            with controller.acquire(timeout=2):
+                admitted.append("waiter")
+
+        queued = self.pool.submit(waiter)
+        wait_until(lambda: controller.stats()["waiting_here"] == 1)
+        release.set()
+        wait_until(lambda: controller.stats()["inflight_here"] == 0)
+
+        with controller.acquire(timeout=2):
+            admitted.append("newcomer")
+        queued.result(2)
+        self.assertEqual(admitted, ["waiter", "newcomer"])
+
+    def test_unknown_priority(self):
+        with self.assertRaises(ValueError):
+            with self.controller().acquire("batch"):
+                pass
+
+    def test_full_queue_is_rejected_with_429(self):
+        controller = self.controller(max_inflight=1, max_waiting=1)
+        release = self.hold(controller)
+
+        def waiter():
+            with controller.acquire(timeout=2):
+                pass
+
+        waiting = self.pool.submit(waiter)
+        wait_until(lambda: controller.stats()["waiting_here"] == 1)
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            with controller.acquire(timeout=2):
+                pass
+        self.assertEqual(rejected.exception.status, 429)
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+        self.assertEqual(controller.stats()["rejected_queue_full"], 1)
+        release.set()
+        waiting.result(2)
+
+    def test_wait_timeout_is_rejected_with_503(self):
+        controller = self.controller(max_inflight=1)
+        self.hold(controller)
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            with controller.acquire(timeout=0.05):
+                pass
+        self.assertEqual(rejected.exception.status, 503)
+        self.assertIn("no free slot within", str(rejected.exception))
+        self.assertEqual(controller.stats()["rejected_wait"], 1)
+        self.assertEqual(controller.stats()["waiting_here"], 0)
+
+    def test_long_expected_wait_is_rejected_at_once(self):
+        controller = self.controller(max_inflight=1)
+        controller._hold_seconds = 2.4
+        self.hold(controller)
+
+        started = time.monotonic()
+        with self.assertRaises(AdmissionRejected) as rejected:
+            with controller.acquire(timeout=1):
+                pass
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(rejected.exception.status, 503)
+        self.assertIn("expected in", str(rejected.exception))
+        self.assertEqual(rejected.exception.retry_after, 3)
+
+    def test_rejection_response_carries_retry_after(self):
+        for status in (429, 503):
+            error = LLMServiceOverloaded("busy", status=status, retry_after=3)
+            response = overloaded_response(error)
+            self.assertEqual(response.status_code, status)
+            self.assertEqual(response["Retry-After"], "3")
+
+    def test_slot_is_released_when_the_block_raises(self):
+        controller = self.controller(max_inflight=1)
+        with self.assertRaises(RuntimeError):
+            with controller.acquire():
+                raise RuntimeError("generation failed")
+        self.assertEqual(controller.stats()["inflight_here"], 0)
+        with controller.acquire(timeout=0.05):
+            pass
+
+    def test_async_slot_is_released_when_the_block_raises(self):
+        controller = self.controller(max_inflight=1)
+
+        async def scenario():
+            with self.assertRaises(RuntimeError):
+                async with controller.aacquire():
+                    raise RuntimeError("generation failed")
+            async with controller.aacquire(timeout=0.05):
+                return controller.stats()["inflight_here"]
+
+        self.assertEqual(asyncio.run(scenario()), 1)
+        self.assertEqual(controller.stats()["inflight_here"], 0)
+
+    def test_async_waiter_gets_the_released_slot(self):
+        controller = self.controller(max_inflight=1)
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def holder():
+                async with controller.aacquire():
+                    await release.wait()
+
+            task = asyncio.create_task(holder())
+            await asyncio.sleep(0.01)
+            asyncio.get_running_loop().call_later(0.02, release.set)
+            async with controller.aacquire(timeout=1):
+                pass
+            await task
+
+        asyncio.run(scenario())
+        self.assertEqual(controller.stats()["admitted"], 2)
+        self.assertEqual(controller.stats()["queued"], 1)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.batcher = MicroBatcher("test", max_size=3, max_wait=0.01, enabled=True)
+        self.admission = AdmissionController("test", max_inflight=1, poll_interval=0.005)
+
+    def test_requests_arriving_together_form_one_batch(self):
+        started = []
+
+        def run(value):
+            async def generate():
+                started.append(time.monotonic())
+                if value == "bad":
+                    raise ValueError(value)
+                return value.upper()
+            return generate
+
+        async def scenario():
+            return await asyncio.gather(*(self.batcher.submit(run(value)) for value in ("a", "bad", "c")),
+                                        return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertEqual(results[0], "A")
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], "C")
+        self.assertEqual(self.batcher.stats()["sizes"], {3: 1})
+
+    def test_caller_that_gives_up_cancels_its_generation_and_frees_the_slot(self):
+        cancelled = []
+
+        async def generate():
+            async with self.admission.aacquire(timeout=1):
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+
+        async def scenario():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.batcher.submit(generate), 0.05)
+            await asyncio.sleep(0.01)  # let the cancellation reach the task
+            # The slot is free again for the next request
+            async with self.admission.aacquire(timeout=0.05):
+                pass
+
+        asyncio.run(scenario())
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(self.batcher.stats()["cancelled"], 1)
+        self.assertEqual(self.admission.stats()["inflight_here"], 0)
+
+    def test_caller_that_gives_up_before_dispatch_drops_the_batch(self):
+        calls = []
+
+        async def generate():
+            calls.append(True)
+
+        async def scenario():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.batcher.submit(generate), 0.001)
+            await asyncio.sleep(0.02)
+
+        asyncio.run(scenario())
+        self.assertEqual(calls, [])
+        self.assertEqual(self.batcher.stats()["dropped"], 1)
+
+
+class TrackerSequenceTests(SimpleTestCase):
+    def setUp(self):
+        # No FaceMesh graph or screen needed to number frames
+        patcher = mock.patch("MultiModuleApp.modules.tracker_session.pyautogui")
+        patcher.start().size.return_value = (1920, 1080)
+        self.addCleanup(patcher.stop)
+        self.session = TrackerSession(face_detector=mock.Mock(), preprocessor=mock.Mock())
+
+    def test_out_of_order_frames_are_stale(self):
+        self.assertTrue(self.session.accept_sequence(1, epoch=0))
+        self.assertTrue(self.session.accept_sequence(3, epoch=0))
+        self.assertFalse(self.session.accept_sequence(2, epoch=0))
+        self.assertEqual(self.session.frames_stale, 1)
+
+    def test_stop_then_start_restarts_the_numbering(self):
+        for sequence in range(1, 50):
+            self.assertTrue(self.session.accept_sequence(sequence, epoch=1))
+
+        # The client was stopped and started again: numbering restarts at 1 in the next epoch
+        self.assertTrue(self.session.accept_sequence(1, epoch=2))
+        self.assertTrue(self.session.accept_sequence(2, epoch=2))
+        self.assertFalse(self.session.accept_sequence(2, epoch=2))
+        # A late reply from before the restart is stale
+        self.assertFalse(self.session.accept_sequence(49, epoch=1))
+
+    def test_frames_without_numbers_are_always_accepted(self):
+        self.assertTrue(self.session.accept_sequence(5))
+        self.assertTrue(self.session.accept_sequence(None))
+        self.assertFalse(self.session.accept_sequence(5))
+
+
+class FakeTrackerPool:
+    """Records the session keys frames are processed under"""
+
+    def __init__(self):
+        self.keys = []
+
+    @contextmanager
+    def acquire(self, key):
+        self.keys.append(key)
+        session = mock.Mock()
+        session.accept_sequence.return_value = True
+        session.decode_frame.return_value = np.zeros((4, 4, 3), np.uint8)
+        session.process_frame.return_value = {'gaze': None, 'wink': None}
+        yield session
+
+
+class ProcessFrameSessionTests(TestCase):
+    frame = {'image': 'data:image/jpeg;base64,' + base64.b64encode(b'jpeg').decode()}
+
+    def setUp(self):
+        self.pool = FakeTrackerPool()
+        patcher = mock.patch('MultiModuleApp.views.tracker_session_pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, client, **headers):
+        return client.post('/process_frame/', json.dumps(self.frame), content_type='application/json',
+                           headers=headers)
+
+    def test_header_names_the_session(self):
+        response = self.post(Client(), **{'X-Tracker-Session': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.pool.keys, ['abc'])
+        self.assertEqual(response['X-Tracker-Session'], 'abc')
+
+    def test_legacy_client_keeps_one_session_per_cookie(self):
+        first, second = Client(), Client()
+        responses = [self.post(first), self.post(first), self.post(second)]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertEqual(self.pool.keys[0], self.pool.keys[1])
+        self.assertNotEqual(self.pool.keys[0], self.pool.keys[2])
+        self.assertEqual(responses[0]['X-Tracker-Session'], self.pool.keys[0])
+
+    def test_clients_at_one_address_get_separate_sessions(self):
+        self.post(Client(REMOTE_ADDR='10.0.0.1'))
+        self.post(Client(REMOTE_ADDR='10.0.0.1'))
+        self.assertNotEqual(self.pool.keys[0], self.pool.keys[1])
+
+
+class ModelSessionStoreTests(TestCase):
+    def setUp(self):
+        self.store = ModelSessionStore(ttl=60, max_exchanges=10)
+
+    def exchange(self, number):
+        return {"message": f"question {number}", "response": f"answer {number}", "provider": "ollama"}
+
+    def age(self, session_id, seconds):
+        """Move the session and its messages into the past"""
+        past = timezone.now() - datetime.timedelta(seconds=seconds)
+        Conversation.objects.filter(session_id=session_id).update(updated_at=past, context_started_at=past)
+        Message.objects.filter(conversation_id=session_id).update(created_at=past)
+
+    def test_history_of_an_active_session(self):
+        self.store.start("s1", "Isaac Newton")
+        self.store.append("s1", self.exchange(1))
+        self.store.append("s1", self.exchange(2))
+
+        session = self.store.start("s1", "Isaac Newton")
+        self.assertEqual([e["message"] for e in session["exchanges"]], ["question 1", "question 2"])
+
+    def test_expired_session_starts_over_without_deleting_messages(self):
+        self.store.start("s1", "Isaac Newton")
+        self.store.append("s1", self.exchange(1))
+        self.age("s1", 120)
+
+        session = self.store.start("s1", "Isaac Newton")
+        self.assertEqual(session["exchanges"], [])
+        self.store.append("s1", self.exchange(2))
+
+        self.assertEqual([e["message"] for e in self.store.history("s1")], ["question 2"])
+        self.assertEqual(Message.objects.filter(conversation_id="s1").count(), 4)
+
+    def test_persona_change_keeps_earlier_messages(self):
+        self.store.start("s1", "Isaac Newton")
+        self.store.append("s1", self.exchange(1))
+
+        self.store.start("s1", "Marie Curie")
+        self.assertEqual(self.store.history("s1"), [])
+        self.assertEqual(Message.objects.filter(conversation_id="s1").count(), 2)
+
+    def test_delete_removes_the_conversation(self):
+        self.store.start("s1", "Isaac Newton")
+        self.store.append("s1", self.exchange(1))
+        self.store.delete("s1")
+        self.assertFalse(Message.objects.filter(conversation_id="s1").exists())
@@ -0,0 +1,142 @@
+"""
+WebSocket channel for the eye tracker, served directly by the ASGI application.
+
+The browser pushes encoded webcam frames as binary messages: the client's frame number
+(``seq``) as a 4-byte big-endian integer followed by the JPEG/WebP bytes. It receives one JSON
+text message per processed frame with the gaze and wink results. Every connection
+uses its own TrackerSession from the worker's session pool (keyed by the ``session`` query
+parameter, or a per-connection id), so concurrent users never share MediaPipe or wink state.
+
+Only the newest frame is kept while the previous one is being processed: stale frames are
+dropped instead of queued, which keeps frame-to-event latency bounded by a single inference.
+Each result echoes the frame's ``seq``, with the inference time
+(``processing_ms``) and the time since the frame arrived (``server_ms``), which the client
+uses for flow control.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from MultiModuleApp.modules import tracker_pool
+from MultiModuleApp.views import tracker_session_pool
+
+logger = logging.getLogger(__name__)
+
+TRACKER_SOCKET_PATH = '/ws/tracker/'
+SEQ_HEADER_BYTES = 4
+
+
+class TrackerSocket:
+    """ASGI application handling a single tracker websocket connection per call"""
+
+    async def __call__(self, scope, receive, send):
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+        await send({'type': 'websocket.accept'})
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        session_key = query.get('session', [None])[0] or f'ws-{uuid.uuid4()}'
+        connection = _Connection(session_key, send)
+        worker = asyncio.create_task(connection.process_frames())
+        logger.info("Tracker websocket connected")
+
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message['type'] == 'websocket.receive':
+                    payload = message.get('bytes')
+                    if payload is None:
+                        await connection.send_json({'error': 'Frames must be sent as binary messages'})
+                        continue
+                    if len(payload) <= SEQ_HEADER_BYTES:
+                        await connection.send_json({'error': 'Frames must start with a 4-byte sequence number'})
+                        continue
+                    sequence = int.from_bytes(payload[:SEQ_HEADER_BYTES], 'big')
+                    connection.push_frame(sequence, payload[SEQ_HEADER_BYTES:])
+        finally:
+            connection.close()
+            # Let an in-progress inference finish before the session is released
+            await worker
+            tracker_session_pool.discard(session_key)
+            logger.info(
+                f"Tracker websocket closed: {connection.frames_processed} frames processed, "
+                f"{connection.frames_dropped} stale frames dropped"
+            )
+
+
+class _Connection:
+    def __init__(self, session_key, send):
+        self.session_key = session_key
+        self._send = send
+        self._latest = None
+        self._frame_ready = asyncio.Event()
+        self._closed = False
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+
+    def push_frame(self, sequence, payload):
+        # The client's own frame number is echoed back, so frames lost on the way don't shift it
+        self.frames_received += 1
+        if self._latest is not None:
+            self.frames_dropped += 1
+        self._latest = (payload, sequence, time.perf_counter())
+        self._frame_ready.set()
+
+    def close(self):
+        self._closed = True
+        self._frame_ready.set()
+
+    async def send_json(self, data):
+        try:
+            await self._send({'type': 'websocket.send', 'text': json.dumps(data)})
+            return True
+        except Exception as e:
+            logger.debug(f"Tracker websocket send failed: {e}")
+            return False
+
+    async def process_frames(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            if self._closed:
+                return
+
+            payload, sequence, received_at = self._latest
+            self._latest = None
+            try:
+                response = await loop.run_in_executor(None, self._process_payload, payload)
+            except tracker_pool.TrackerPoolFull as e:
+                logger.warning(str(e))
+                response = {'error': 'Tracker is at capacity, please retry shortly'}
+            except Exception as e:
+                logger.error(f"Error processing tracker frame: {e}")
+                response = {'error': str(e)}
+            self.frames_processed += 1
+            # seq lets the client retire this frame and every older one the server skipped
+            response['seq'] = sequence
+            response['server_ms'] = round((time.perf_counter() - received_at) * 1000, 1)
+
+            if self._closed or not await self.send_json(response):
+                return
+
+    def _process_payload(self, payload):
+        # The first frame builds the session's FaceMesh graph in this worker thread
+        with tracker_session_pool.acquire(self.session_key) as session:
+            started = time.perf_counter()
+            frame = session.decode_frame(payload)
+            if frame is None:
+                return {'error': 'Could not decode image'}
+            response = session.process_frame(frame)
+            response['processing_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return response
+
+
+tracker_socket = TrackerSocket()
@@ -10,5 +10,6 @@ urlpatterns = [
     path('process_command/', views.process_command, name='process_command'),
     path('chatbot/', views.chatbot, name='chatbot'),
     path('chat/', views.chat, name='chat'),
+    path('chat/stream/', views.chat_stream, name='chat_stream'),
     path('health/', views.health_check, name='health_check'),
 ]
\ No newline at end of file
@@ -1,19 +1,23 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
+from django.conf import settings
 import json
-import base64
-import cv2
-import numpy as np
-from MultiModuleApp.modules import detector, controller, gaze_tracker, wink_detector
+import logging
+import time
+import uuid
+from MultiModuleApp.modules import frame_decoder, motion_gate, preprocess, tracker_pool, tracker_session
 import pyjokes
 import datetime
-import pyautogui
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-from MultiModuleApp.services.llm_service import llm_service, LLMServiceError
+from MultiModuleApp.services.llm_service import llm_service, LLMServiceError, LLMServiceOverloaded
+from MultiModuleApp.services.persona_registry import get_persona_registry
+from MultiModuleApp.models import Conversation
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -22,17 +26,11 @@ load_dotenv()
 genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
 model = genai.GenerativeModel('gemini-1.5-flash')
 
-# In-memory session store for chat
-chat_sessions = {}
+# Available personas and their system prompts, rendered at startup
+persona_registry = get_persona_registry()
 
-# Available personas
-persona_options = {
-    "Isaac Newton": "Mathematician and physicist",
-    "Marie Curie": "Pioneering scientist in radioactivity",
-    "William Shakespeare": "English playwright and poet",
-    "Adam Smith": "Father of modern economics",
-    "Alan Turing": "Father of computer science"
-}
+# Longest session_id a chat request may send (the Conversation primary key)
+SESSION_ID_MAX_LENGTH = Conversation._meta.get_field('session_id').max_length
 
 # Static state to track if Jarvis is activated (shared across requests)
 class JarvisState:
@@ -48,88 +46,137 @@ def tracker_page(request):
     """
     return render(request, 'MultiModuleApp/tracker.html')
 
-# Global instances to maintain state across requests
-wink_detector_instance = None
-face_detector_instance = None
-
-def get_face_detector():
-    global face_detector_instance
-    if face_detector_instance is None:
-        face_detector_instance = detector.FaceLandmarkDetector()
-    return face_detector_instance
-
-def get_wink_detector():
-    global wink_detector_instance
-    if wink_detector_instance is None:
-        # More sensitive settings for better wink detection
-        wink_detector_instance = wink_detector.WinkDetector(
-            blink_threshold=0.25,  # Increased from 0.2 for easier detection
-            min_wink_duration=0.3  # Reduced from 1.0 seconds for faster response
-        )
-    return wink_detector_instance
+def create_tracker_session():
+    return tracker_session.TrackerSession(
+        preprocessor=preprocess.FramePreprocessor(
+            decode_scale=getattr(settings, 'TRACKER_DECODE_SCALE', 1),
+            roi_crop=getattr(settings, 'TRACKER_ROI_CROP', True)
+        ),
+        motion_gate=motion_gate.MotionGate(
+            threshold=getattr(settings, 'TRACKER_MOTION_THRESHOLD', 3.0),
+            max_skip=getattr(settings, 'TRACKER_MOTION_MAX_SKIP', 5)
+        ) if getattr(settings, 'TRACKER_MOTION_GATE', True) else None
+    )
+
+# Pool of per-user tracker sessions (FaceMesh graph + wink state), shared by the HTTP
+# endpoint and the websocket channel of this worker process
+tracker_session_pool = tracker_pool.TrackerSessionPool(
+    max_sessions=getattr(settings, 'TRACKER_POOL_MAX_SESSIONS', 8),
+    idle_timeout=getattr(settings, 'TRACKER_POOL_IDLE_TIMEOUT', 120),
+    session_factory=create_tracker_session
+)
+
+def get_tracker_session_key(request):
+    """
+    Clients identify their tracker session with the X-Tracker-Session header. Clients that send
+    none (e.g. legacy JSON clients) get a server-issued id kept in their Django session, so it
+    comes back with the session cookie. Never the client address: clients behind one NAT or
+    proxy would share wink state.
+    """
+    key = request.headers.get('X-Tracker-Session')
+    if key:
+        return key
+    key = request.session.get('tracker_session')
+    if key is None:
+        key = request.session['tracker_session'] = f'default-{uuid.uuid4()}'
+        logger.info("Issued a tracker session to a client without X-Tracker-Session")
+    return key
+
+def get_frame_sequence(request, header='X-Frame-Seq'):
+    """
+    Client frame counter from the X-Frame-Seq header (or its numbering epoch from X-Frame-Epoch),
+    used to drop frames that arrive out of order
+    """
+    try:
+        return int(request.headers[header])
+    except (KeyError, ValueError):
+        return None
 
 @csrf_exempt
 def process_frame(request):
+    """
+    Accepts a webcam frame in one of three formats:
+    - raw JPEG/WebP bytes as the request body (application/octet-stream, image/jpeg, image/webp)
+    - multipart/form-data with the encoded image in the 'image' field
+    - JSON {"image": "data:image/jpeg;base64,..."} (legacy, kept for backward compatibility)
+    The binary formats avoid the base64 overhead and decode straight from the request buffer.
+    Clients with several frames in flight send an X-Frame-Seq counter, and an X-Frame-Epoch that
+    they bump when the counter restarts; a frame older than one already processed is answered
+    with {"stale": true} without running detection.
+    Responses carry the server processing time ('processing_ms' and a Server-Timing header)
+    so the client can tell server load from network delay when adapting its frame rate.
+    The X-Tracker-Session header names the client's tracker session; without it the session
+    comes from the Django session cookie, and its id is returned in the same header.
+    """
     if request.method != 'POST':
         return HttpResponseBadRequest('Invalid request method')
 
+    session_key = get_tracker_session_key(request)
+
+    content_type = request.content_type
+    print(f"📸 Frame processing request received ({content_type})")
+
+    if content_type in frame_decoder.BINARY_FRAME_TYPES:
+        image_buffer = request.body
+        data_url = None
+    elif content_type == 'multipart/form-data':
+        if 'image' not in request.FILES:
+            print("❌ No image in multipart upload")
+            return JsonResponse({'error': 'No image received'}, status=400)
+        image_buffer = frame_decoder.read_upload_buffer(request.FILES['image'])
+        data_url = None
+    else:
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON decode error: {e}")
+            return HttpResponseBadRequest('Invalid JSON')
+
+        if 'image' not in data:
+            print("❌ No image in request data")
+            return JsonResponse({'error': 'No image received'}, status=400)
+        image_buffer = None
+        data_url = data['image']
+
+    if image_buffer is None:
+        try:
+            image_buffer = frame_decoder.data_url_bytes(data_url)
+        except (IndexError, ValueError, TypeError, AttributeError) as e:
+            print(f"❌ Malformed image data: {e}")
+            return JsonResponse({'error': 'Malformed image data'}, status=400)
+
+    sequence = get_frame_sequence(request)
+    # Bumped by the client whenever it restarts its numbering
+    epoch = get_frame_sequence(request, 'X-Frame-Epoch')
     try:
-        data = json.loads(request.body)
-        print("📸 Frame processing request received")
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON decode error: {e}")
-        return HttpResponseBadRequest('Invalid JSON')
-
-    if 'image' not in data:
-        print("❌ No image in request data")
-        return JsonResponse({'error': 'No image received'}, status=400)
-
-    try:
-        image_data = data['image'].split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        frame = cv2.flip(frame, 1)
-
-        frame_height, frame_width = frame.shape[:2]
-        print(f'📏 Frame dimensions - Height:{frame_height}, Width: {frame_width}')
-
-        face_landmark_detector_instance = get_face_detector()
-        landmarks = face_landmark_detector_instance.detect_landmarks(frame)
-        print(f"👤 Landmarks detected: {len(landmarks) if landmarks else 0}")
-        
-        response = {
-            'gaze': None,
-            'wink': None
-        }
-        SCREEN_WIDTH, SCREEN_HEIGHT = pyautogui.size()
-        cursor_instance = controller.CursorController(SCREEN_WIDTH, SCREEN_HEIGHT)
-        
-        if landmarks:
-            print("✅ Processing landmarks...")
-            gazeTrackerInstance = gaze_tracker.GazeTracker()
-            gaze, left_iris, right_iris = gazeTrackerInstance.estimate_gaze(landmarks, frame_width, frame_height)
-            if gaze and left_iris and right_iris:
-                iris_x_norm = (left_iris[0] + right_iris[0]) / 2 / frame_width
-                iris_y_norm = (left_iris[1] + right_iris[1]) / 2 / frame_height
-                cursor_instance.move_cursor_to_iris(iris_x_norm, iris_y_norm)
-                response['gaze'] = gaze
-                print(f"👁️ Gaze processed: {gaze}")
-                
-            wink_instance = get_wink_detector()
-            wink = wink_instance.detect_wink(landmarks, frame_width, frame_height)
-            if wink:
-                print(f"😉 Wink detected: {wink}")  # Debug logging
-                cursor_instance.click_if_wink(wink)
-                response['wink'] = wink
+        with tracker_session_pool.acquire(session_key) as session:
+            started = time.perf_counter()
+            if not session.accept_sequence(sequence, epoch):
+                print(f"⏭️ Dropping stale frame {sequence}")
+                response = {'gaze': None, 'wink': None, 'stale': True}
             else:
-                response['wink'] = None
-        else:
-            print("❌ No landmarks detected")
-
+                # Decoded by the session so its preprocessing (e.g. reduced resolution) applies
+                frame = session.decode_frame(image_buffer)
+                if frame is None:
+                    print("❌ Could not decode image")
+                    return JsonResponse({'error': 'Could not decode image'}, status=400)
+                print(f'📏 Frame dimensions - Height:{frame.shape[0]}, Width: {frame.shape[1]}')
+                response = session.process_frame(frame)
+            processing_ms = round((time.perf_counter() - started) * 1000, 1)
+        response['processing_ms'] = processing_ms
+        if sequence is not None:
+            response['seq'] = sequence
         print(f"🔄 Sending response: {response}")
-        return JsonResponse(response)
-        
+        http_response = JsonResponse(response)
+        http_response['Server-Timing'] = f'process;dur={processing_ms}'
+        http_response['X-Tracker-Session'] = session_key
+        return http_response
+
+    except tracker_pool.TrackerPoolFull as e:
+        print(f"🚦 {e}")
+        response = JsonResponse({'error': 'Tracker is at capacity, please retry shortly'}, status=503)
+        response['Retry-After'] = '1'
+        return response
     except Exception as e:
         print(f"💥 Error processing frame: {e}")
         import traceback
@@ -227,98 +274,208 @@ def chatbot(request):
     """
     return render(request, 'MultiModuleApp/chat.html')
 
-@csrf_exempt
-def chat(request):
+def log_prompt(session_id, persona, message):
+    """Append the message to settings.LLM_PROMPT_LOG (JSONL) so traffic can be replayed later"""
+    log_path = getattr(settings, 'LLM_PROMPT_LOG', None)
+    if not log_path:
+        return
+    entry = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'session_id': session_id,
+        'persona': persona,
+        'message': message
+    }
+    try:
+        with open(log_path, 'a', encoding='utf-8') as log_file:
+            log_file.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        print(f"Could not write prompt log: {e}")
+
+async def prepare_chat_request(request):
     """
-    Handles chat requests, integrating with Ollama (primary) and Gemini (fallback).
+    Validate a chat request and build the persona prompt, shared by the plain and streaming
+    chat endpoints. Returns ((session_id, persona, message, persona_instruction), None), or
+    (None, error_response).
     """
-    if request.method != 'POST':
-        return HttpResponseBadRequest('Invalid request method')
-
     try:
         data = json.loads(request.body)
         session_id = data.get('session_id')
         persona = data.get('persona')
         message = data.get('message')
     except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        return None, JsonResponse({'error': 'Invalid JSON'}, status=400)
 
     if not all([session_id, persona, message]):
-        return JsonResponse({'error': 'Missing session_id, persona, or message'}, status=400)
+        return None, JsonResponse({'error': 'Missing session_id, persona, or message'}, status=400)
 
-    if persona not in persona_options:
-        return JsonResponse({'error': 'Invalid persona'}, status=400)
+    # Also the Conversation primary key; a longer one would fail in the database, not here
+    if not isinstance(session_id, str) or len(session_id) > SESSION_ID_MAX_LENGTH:
+        return None, JsonResponse(
+            {'error': f'session_id must be a string of at most {SESSION_ID_MAX_LENGTH} characters'}, status=400
+        )
 
-    # Initialize or update session
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = {
-            "persona": persona,
-            "chat_history": []
-        }
+    if persona not in persona_registry:
+        return None, JsonResponse({'error': 'Invalid persona'}, status=400)
 
-    # Reset session if persona changed
-    if chat_sessions[session_id]["persona"] != persona:
-        chat_sessions[session_id]["persona"] = persona
-        chat_sessions[session_id]["chat_history"] = []
-        # Clear LLM service session as well
-        llm_service.clear_session(session_id)
+    # Initialize session, or start it over if the persona changed
+    session = await llm_service.sessions.astart(session_id, persona)
+
+    log_prompt(session_id, persona, message)
 
     print(f"Session ID: {session_id}")
-    print(f"Chat History: {chat_sessions[session_id]['chat_history']}")
-    print(f"Persona: {chat_sessions[session_id]['persona']}")
+    print(f"Chat History: {len(session['exchanges'])} exchanges")
+    print(f"Persona: {session['persona']}")
 
     try:
-        # Load prompt template
-        with open('prompt_template.txt', 'r', encoding="utf-8") as file:
-            prompt_template = file.read().strip()
+        # Pre-rendered persona prompt (the template is re-read only when it changes)
+        persona_instruction = persona_registry.prompt(persona)
     except FileNotFoundError:
-        return JsonResponse({'error': 'Prompt template not found'}, status=500)
+        return None, JsonResponse({'error': 'Prompt template not found'}, status=500)
 
-    # Build the persona-specific prompt
-    persona_instruction = prompt_template.format(
-        persona_name=persona,
-        persona_description=persona_options[persona]
-    )
-    
-    # Combine persona instruction with user message
-    full_prompt = persona_instruction + "\n\nUser: " + message
+    # The LLM service places the persona instruction before the user message
+    return (session_id, persona, message, persona_instruction), None
+
+@csrf_exempt
+async def chat(request):
+    """
+    Handles chat requests, integrating with Ollama (primary) and Gemini (fallback).
+    Async view: under asgi.py a pending generation only holds a coroutine, not a worker thread.
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest('Invalid request method')
+
+    chat_request, error_response = await prepare_chat_request(request)
+    if error_response is not None:
+        return error_response
+    session_id, persona, message, persona_instruction = chat_request
 
     try:
         # Use the new LLM service with session management
-        response_text = llm_service.generate_response(
-            prompt=full_prompt,
+        response_text = await llm_service.agenerate_response(
+            prompt=message,
+            persona_prompt=persona_instruction,
             session_id=session_id,
             temperature=0.7,
             max_tokens=2000
         )
         
-        # Update chat history
-        chat_sessions[session_id]["chat_history"].append(("User", message))
-        chat_sessions[session_id]["chat_history"].append((persona, response_text))
-        
         # Get provider status for debugging
-        provider_status = llm_service.get_provider_status()
+        provider_status = await llm_service.aget_provider_status()
         print(f"LLM Provider Status: {provider_status}")
         
         return JsonResponse({
             'response': response_text,
             'provider_info': {
                 'providers': provider_status,
-                'primary': 'ollama'
+                'primary': llm_service.primary_provider
             }
         })
         
+    except LLMServiceOverloaded as e:
+        return overloaded_response(e)
     except LLMServiceError as e:
         # Log the error and return user-friendly message
         print(f"LLM Service Error: {str(e)}")
         return JsonResponse({
             'error': f'AI service temporarily unavailable: {str(e)}',
-            'provider_info': llm_service.get_provider_status()
+            'provider_info': await llm_service.aget_provider_status()
         }, status=503)
     except Exception as e:
         print(f"Unexpected error in chat: {str(e)}")
         return JsonResponse({'error': f'Unexpected error: {str(e)}'}, status=500)
 
+def overloaded_response(error):
+    """429 (too many waiting) or 503 (no slot in time) with Retry-After, for a saturated LLM backend"""
+    print(f"🚦 {error}")
+    response = JsonResponse({'error': 'AI service is busy, please retry shortly',
+                             'retry_after': error.retry_after}, status=error.status)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@csrf_exempt
+async def chat_stream(request):
+    """
+    Streaming variant of chat: the reply is relayed as Server-Sent Events while the model
+    generates it, so the first words show up after the time-to-first-token instead of the
+    whole completion. Events:
+    - data: {"token": "..."}                     one per generated chunk
+    - event: done / data: {"response": "..."}    the complete reply, once recorded in history
+    - event: error / data: {"error": "..."}      the provider failed; nothing is recorded
+    When every provider is saturated the request is answered with 429/503 and Retry-After instead.
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest('Invalid request method')
+
+    chat_request, error_response = await prepare_chat_request(request)
+    if error_response is not None:
+        return error_response
+    session_id, persona, message, persona_instruction = chat_request
+
+    # Wait for the first chunk before answering, so a saturated backend gets a proper
+    # 429/503 with Retry-After rather than a 200 followed by an error event
+    started = time.perf_counter()
+    stream = llm_service.astream_response(
+        prompt=message,
+        persona_prompt=persona_instruction,
+        session_id=session_id,
+        temperature=0.7,
+        max_tokens=2000
+    )
+    first_chunk, first_error = None, None
+    try:
+        first_chunk = await anext(stream)
+    except StopAsyncIteration:
+        pass
+    except LLMServiceOverloaded as e:
+        await stream.aclose()
+        return overloaded_response(e)
+    except Exception as e:
+        first_error = e
+
+    async def events():
+        first_token_ms = None
+        chunks = []
+        try:
+            if first_error is not None:
+                raise first_error
+            if first_chunk is not None:
+                first_token_ms = round((time.perf_counter() - started) * 1000)
+                print(f"⏱️ Time to first token: {first_token_ms} ms")
+                chunks.append(first_chunk)
+                yield sse_event({'token': first_chunk})
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield sse_event({'token': chunk})
+        except LLMServiceError as e:
+            print(f"LLM Service Error: {str(e)}")
+            yield sse_event({'error': f'AI service temporarily unavailable: {str(e)}'}, event='error')
+            return
+        except Exception as e:
+            print(f"Unexpected error in chat stream: {str(e)}")
+            yield sse_event({'error': f'Unexpected error: {str(e)}'}, event='error')
+            return
+        finally:
+            await stream.aclose()
+
+        # The LLM service has recorded the exchange in the session history
+        response_text = "".join(chunks).strip()
+        yield sse_event({
+            'response': response_text,
+            'first_token_ms': first_token_ms,
+            'total_ms': round((time.perf_counter() - started) * 1000)
+        }, event='done')
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @csrf_exempt
 def health_check(request):
     """
@@ -333,6 +490,18 @@ def health_check(request):
             'status': 'healthy',
             'timestamp': datetime.datetime.now().isoformat(),
             'providers': provider_status,
+            'tracker_pool': tracker_session_pool.stats(),
+            'llm_cache': llm_service.completion_cache.stats(),
+            'llm_semantic_cache': llm_service.semantic_cache.stats(),
+            'llm_single_flight': llm_service.single_flight.stats(),
+            'llm_circuit_breakers': {name: breaker.stats() for name, breaker in llm_service.breakers.items()},
+            'llm_hedging': llm_service.hedging.stats(),
+            'llm_admission': {name: admission.stats() for name, admission in llm_service.admission.items()},
+            'llm_batching': {name: batcher.stats() for name, batcher in llm_service.batchers.items()},
+            'llm_instances': {name: provider.instance_stats() for name, provider in llm_service.providers.items()
+                              if hasattr(provider, 'instance_stats')},
+            'chat_sessions': llm_service.sessions.stats(),
+            'personas': persona_registry.stats(),
             'services': {
                 'django': True,
                 'ollama': provider_status.get('ollama', {}).get('available', False),
@@ -340,11 +509,15 @@ def health_check(request):
             }
         }
         
-        # Determine overall health
-        if provider_status.get('ollama', {}).get('available', False):
-            health_data['primary_llm'] = 'ollama'
-        elif provider_status.get('gemini', {}).get('available', False):
-            health_data['primary_llm'] = 'gemini'
+        # Determine overall health (a provider with an open circuit is being skipped)
+        def usable(name):
+            status = provider_status.get(name, {})
+            return status.get('available', False) and status.get('circuit') != 'open'
+
+        # The first usable provider by priority (LLM_PROVIDERS)
+        primary_llm = next((name for name in llm_service.router.ranked() if usable(name)), None)
+        if primary_llm is not None:
+            health_data['primary_llm'] = primary_llm
         else:
             health_data['status'] = 'degraded'
             health_data['primary_llm'] = 'none'
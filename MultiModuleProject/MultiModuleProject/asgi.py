@@ -3,6 +3,10 @@ ASGI config for MultiModuleProject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP requests go to Django; websocket connections on /ws/tracker/ go to the
+eye-tracker streaming channel. Serve it with an ASGI server, e.g.
+``gunicorn -k uvicorn.workers.UvicornWorker MultiModuleProject.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +17,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MultiModuleProject.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since the app modules read settings
+from MultiModuleApp.tracker_socket import TRACKER_SOCKET_PATH, tracker_socket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == TRACKER_SOCKET_PATH:
+            await tracker_socket(scope, receive, send)
+        else:
+            # Reject websocket upgrades for any other path
+            await receive()
+            await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await django_application(scope, receive, send)
@@ -81,6 +81,34 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # LLM completions; TIMEOUT is the entry lifetime and MAX_ENTRIES bounds the size
+    'llm': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'llm-completions',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    # Chat sessions when CHAT_SESSION_BACKEND is 'cache' or 'db' (the 'db' backend needs a
+    # DatabaseCache here and `manage.py createcachetable`)
+    'chat_sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chat-sessions',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -120,9 +148,111 @@ STATIC_URL = 'static/'
 # Ollama LLM Configuration
 OLLAMA_BASE_URL = 'http://localhost:11434'
 OLLAMA_MODEL = 'llama3:latest'
+OLLAMA_TIMEOUT = 120  # read timeout in seconds; local generation can be slow
+OLLAMA_CONNECT_TIMEOUT = 5  # seconds to establish a connection
+OLLAMA_MAX_CONNECTIONS = 100  # pooled connections per worker for the async client
+OLLAMA_POOL_SIZE = 10  # keep-alive connections per worker for the blocking client
+OLLAMA_MAX_RETRIES = 2  # connection failures, and GET/HEAD read errors; generations are never re-sent
+OLLAMA_KEEP_ALIVE = '30m'  # keep the model, and its prompt cache, loaded between chat turns
+OLLAMA_USE_CHAT = True  # send context as /api/chat messages instead of one /api/generate prompt
 
 # LLM Service Configuration
-DEFAULT_LLM_PROVIDER = 'ollama'  # Can be 'ollama' or 'gemini'
+DEFAULT_LLM_PROVIDER = 'ollama'  # Can be 'ollama' or 'gemini'; only used when LLM_PROVIDERS is not set
+# Providers a chat request tries, lowest priority first; providers of equal priority share the requests
+# by weight. Backends: 'ollama' (OLLAMA_* settings), 'gemini', 'openai' (any OpenAI-compatible server,
+# e.g. llama.cpp server, vLLM, LM Studio; several base_urls are balanced by outstanding requests), or
+# the dotted path of a BaseLLMProvider subclass. See MultiModuleApp/services/provider_registry.py
+LLM_PROVIDERS = [
+    {'name': 'ollama', 'backend': 'ollama', 'priority': 0},
+    {'name': 'gemini', 'backend': 'gemini', 'priority': 1},
+    # {'name': 'llamacpp', 'backend': 'openai', 'priority': 0, 'weight': 2,
+    #  'options': {'base_urls': ['http://localhost:8080/v1', 'http://localhost:8081/v1'], 'model': 'local'}},
+]
+LLM_HEALTH_TTL = 30  # seconds a provider status is trusted before a background re-check
+LLM_HEALTH_BACKOFF = 2  # seconds before re-checking a failed provider, doubled per consecutive failure
+LLM_HEALTH_MAX_BACKOFF = 60
+# A chat request falls back to the next provider when one fails or does not answer within
+# LLM_ATTEMPT_TIMEOUT, until LLM_REQUEST_DEADLINE has passed
+LLM_REQUEST_DEADLINE = 60
+LLM_ATTEMPT_TIMEOUT = 30
+# Circuit breaker per provider: opened when half of the last calls failed or were slow, then
+# skipped for LLM_BREAKER_OPEN_SECONDS before trial calls are let through
+LLM_BREAKER_WINDOW = 20
+LLM_BREAKER_MIN_CALLS = 5
+LLM_BREAKER_FAILURE_RATE = 0.5
+LLM_BREAKER_SLOW_CALL_SECONDS = 30
+LLM_BREAKER_SLOW_CALL_RATE = 0.5
+LLM_BREAKER_OPEN_SECONDS = 30
+# Hedging (async views): a request the primary has not answered (or, streaming, sent a first
+# chunk for) after its p95 latency is also sent to the next provider; the first answer wins.
+# At most LLM_HEDGE_MAX_RATE of requests are hedged, so a slow provider does not double the load
+LLM_HEDGE_ENABLED = False
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20  # calls measured before the percentile is used
+LLM_HEDGE_DEFAULT_DELAY = 10  # seconds, until then
+LLM_HEDGE_MIN_DELAY = 0.5
+LLM_HEDGE_MAX_RATE = 0.1
+LLM_HEDGE_BURST = 5
+# Admission control for Ollama: at most LLM_ADMISSION_MAX_INFLIGHT generations at once across all
+# workers (lock files in LLM_ADMISSION_LOCK_DIR; per worker if None or on Windows). Others wait up to
+# LLM_ADMISSION_MAX_WAIT seconds, at most LLM_ADMISSION_MAX_WAITING per worker, then get 429/503
+LLM_ADMISSION_ENABLED = True
+LLM_ADMISSION_MAX_INFLIGHT = 2
+LLM_ADMISSION_MAX_WAITING = 16
+LLM_ADMISSION_MAX_WAIT = 20
+LLM_ADMISSION_RESERVED_SLOTS = 1  # slots only chat may use, not diagnostics (manage.py test_llm)
+LLM_ADMISSION_LOCK_DIR = BASE_DIR / 'cache' / 'llm_admission'
+# Micro-batching (async views, non-streamed replies): Ollama requests arriving within LLM_BATCH_MAX_WAIT_MS
+# of each other are sent together, up to LLM_BATCH_MAX_SIZE; each still takes its own admission slot. Start
+# Ollama with OLLAMA_NUM_PARALLEL = LLM_ADMISSION_MAX_INFLIGHT (see `manage.py bench_batching`)
+LLM_BATCH_ENABLED = False
+LLM_BATCH_MAX_SIZE = 4
+LLM_BATCH_MAX_WAIT_MS = 5
+# Completion cache (entries live in the 'llm' cache below)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_ALIAS = 'llm'
+LLM_CACHE_MAX_TEMPERATURE = 0.7  # requests sampled hotter than this are never cached
+# Semantic cache: reuse completions of paraphrased messages (check with `manage.py replay_prompt_log`)
+LLM_SEMANTIC_CACHE_ENABLED = False
+LLM_SEMANTIC_CACHE_THRESHOLD = 0.92  # cosine similarity needed to reuse a completion
+LLM_SEMANTIC_CACHE_MAX_ENTRIES = 2000
+LLM_SEMANTIC_CACHE_PATH = BASE_DIR / 'cache' / 'semantic_cache.npz'  # None keeps it in memory only
+OLLAMA_EMBED_MODEL = 'nomic-embed-text'
+# Append every chat message to this JSONL file, for replaying with `manage.py replay_prompt_log`
+LLM_PROMPT_LOG = None
+# Concurrent identical requests (same cache key) share one generation; waiters give up after the timeout
+LLM_SINGLE_FLIGHT_ENABLED = True
+LLM_SINGLE_FLIGHT_TIMEOUT = 120
+# Chat session history: 'memory' (per worker), 'cache' or 'db' (the 'chat_sessions' cache alias),
+# or 'models' (Conversation/Message tables, shared by all workers; needs `manage.py migrate`)
+CHAT_SESSION_BACKEND = 'memory'
+CHAT_SESSION_CACHE_ALIAS = 'chat_sessions'
+CHAT_SESSION_MAX_SESSIONS = 1000  # memory backend; least recently used sessions are evicted
+CHAT_SESSION_TTL = 60 * 60  # seconds of inactivity before a session expires
+CHAT_SESSION_MAX_EXCHANGES = 50  # exchanges kept per session (the models backend keeps all, loads this many)
+CHAT_SESSION_MAX_BYTES = 64 * 1024  # ... or beyond this much history
+# Conversation context sent with each message: recent exchanges that fit the token budget
+LLM_CONTEXT_MAX_TOKENS = 512
+LLM_CONTEXT_MAX_EXCHANGES = 10  # exchanges loaded from the session to choose from
+LLM_CONTEXT_SUMMARIZE = False  # list the questions of older exchanges in one line instead of dropping them
+LLM_CONTEXT_SUMMARY_TOKENS = 128
+LLM_CONTEXT_PREFIX_STEP = 4  # the window start moves about every this many turns, so the prompt prefix is reused
+# Persona system prompts are rendered from this template at startup and when it changes
+PERSONA_TEMPLATE_PATH = BASE_DIR / 'prompt_template.txt'
+PERSONA_TEMPLATE_CHECK_INTERVAL = 2  # seconds between checks of the template's mtime
+PERSONA_PREWARM = False  # send the persona prompts to Ollama at startup, so the first chats find them cached
+
+# Eye Tracker Configuration
+# Each tracker session owns a MediaPipe FaceMesh graph; cap them per worker process
+TRACKER_POOL_MAX_SESSIONS = 8
+TRACKER_POOL_IDLE_TIMEOUT = 120  # seconds before an unused session is released
+# Frame preprocessing before FaceMesh (check accuracy with `manage.py bench_preprocessing`)
+TRACKER_DECODE_SCALE = 1  # decode frames at 1/1, 1/2, 1/4 or 1/8 resolution
+TRACKER_ROI_CROP = True  # crop to the face region predicted from the previous frame
+# Reuse the previous landmarks while the eye region is unchanged (check with `manage.py bench_motion_gate`)
+TRACKER_MOTION_GATE = True
+TRACKER_MOTION_THRESHOLD = 3.0  # mean grey-level difference (0-255) that counts as movement
+TRACKER_MOTION_MAX_SKIP = 5  # force a FaceMesh inference after this many skipped frames
 
 # Logging Configuration
 LOGGING = {
@@ -41,6 +41,28 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 OLLAMA_BASE_URL = 'http://localhost:11434'
 OLLAMA_MODEL = 'llama3:latest'
 
+# LLM completions are shared by all gunicorn workers and survive restarts
+CACHES['llm'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.getenv('LLM_CACHE_DIR', '/var/tmp/django_cache/llm'),
+    'TIMEOUT': 60 * 60 * 24,
+    'OPTIONS': {
+        'MAX_ENTRIES': 5000,
+    },
+}
+
+# Chat sessions in the Conversation/Message tables: shared by the workers, kept across restarts,
+# and the whole history stays queryable. The DatabaseCache alias below serves CHAT_SESSION_BACKEND = 'db'
+CHAT_SESSION_BACKEND = 'models'
+CACHES['chat_sessions'] = {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'chat_session_cache',
+    'TIMEOUT': CHAT_SESSION_TTL,
+    'OPTIONS': {
+        'MAX_ENTRIES': 20000,
+    },
+}
+
 # Logging
 LOGGING = {
     'version': 1,
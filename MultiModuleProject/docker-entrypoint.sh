@@ -11,9 +11,11 @@ ollama pull llama3:latest
 
 # Run Django migrations
 python manage.py migrate --settings=MultiModuleProject.settings_production
+python manage.py createcachetable --settings=MultiModuleProject.settings_production
 
-# Start Django application
-exec gunicorn MultiModuleProject.wsgi:application \
+# Start Django application (ASGI, so the tracker websocket channel is served too)
+exec gunicorn MultiModuleProject.asgi:application \
+    --worker-class uvicorn.workers.UvicornWorker \
     --bind 0.0.0.0:8000 \
     --workers 3 \
     --timeout 120 \
@@ -1,4 +1,5 @@
 const API_URL = "/chat/"; // Django endpoint
+const STREAM_URL = "/chat/stream/"; // Server-Sent Events variant, renders tokens as they arrive
 
 window.chatAPI = {
     init: function() {
@@ -159,7 +160,7 @@ window.chatAPI = {
             message: message
         };
 
-        fetch(API_URL, {
+        fetch(STREAM_URL, {
             method: "POST",
             headers: {
                 "Content-Type": "application/json",
@@ -171,16 +172,13 @@ window.chatAPI = {
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
             }
-            return response.json();
+            return this.readReplyStream(response, persona);
         })
-        .then(data => {
-            this.hideTypingIndicator();
-            this.appendMessage(persona, data.response, "bot-message");
-            
+        .then(reply => {
             // Text-to-speech if enabled
             const enableSpeech = document.getElementById("enable-speech");
             if (enableSpeech && enableSpeech.checked && window.speechSynthesis) {
-                this.speak(data.response);
+                this.speak(reply);
             }
         })
         .catch(error => {
@@ -191,6 +189,62 @@ window.chatAPI = {
         });
     },
 
+    // Render a Server-Sent Events reply token by token; resolves with the complete reply
+    readReplyStream: async function(response, persona) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const startedAt = performance.now();
+        let buffer = "";
+        let messageText = null;
+        let reply = "";
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventType = "message";
+                let payload = "";
+                rawEvent.split("\n").forEach(line => {
+                    if (line.startsWith("event:")) eventType = line.slice(6).trim();
+                    else if (line.startsWith("data:")) payload += line.slice(5).trim();
+                });
+                const event = JSON.parse(payload);
+
+                if (eventType === "error") {
+                    throw new Error(event.error);
+                }
+                if (eventType === "done") {
+                    reply = event.response;
+                    console.log(`Reply complete: first token ${event.first_token_ms} ms, total ${event.total_ms} ms`);
+                    continue;
+                }
+                if (messageText === null) {
+                    console.log(`First token after ${Math.round(performance.now() - startedAt)} ms`);
+                    this.hideTypingIndicator();
+                    messageText = this.appendMessage(persona, "", "bot-message");
+                }
+                reply += event.token;
+                messageText.textContent = reply;
+                this.scrollToBottom();
+            }
+        }
+
+        this.hideTypingIndicator();
+        if (messageText === null) {
+            this.appendMessage(persona, reply, "bot-message");
+        } else {
+            messageText.textContent = reply;
+        }
+        return reply;
+    },
+
     appendMessage: function(sender, message, className) {
         const chatOutput = document.getElementById("chat-output");
         if (!chatOutput) return;
@@ -215,6 +269,8 @@ window.chatAPI = {
 
         chatOutput.insertAdjacentHTML('beforeend', messageHTML);
         this.scrollToBottom();
+        // The message text element, so streamed replies can be filled in as they arrive
+        return chatOutput.lastElementChild.querySelector("p");
     },
 
     showTypingIndicator: function() {
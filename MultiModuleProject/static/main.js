@@ -1,6 +1,34 @@
 let video = document.getElementById('video');
 let stream = null;
-let captureInterval = null;
+let captureTimer = null;
+let trackerSocket = null;
+
+// Identifies this page's tracker session so the server keeps separate face-mesh and wink state per user
+const TRACKER_SESSION_ID = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+const TRACKER_SOCKET_URL = `${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/ws/tracker/?session=${encodeURIComponent(TRACKER_SESSION_ID)}`;
+
+// Flow control for the capture loop. At most MAX_IN_FLIGHT frames are outstanding; when the
+// server falls behind, frames are skipped at capture time instead of queueing. The frame rate
+// and JPEG quality follow the smoothed round-trip time: if the server's own processing time
+// dominates the round trip, the frame rate drops, otherwise (network-bound) the quality drops.
+const MAX_IN_FLIGHT = 2;
+const MIN_FPS = 5;
+const MAX_FPS = 30;
+const MIN_JPEG_QUALITY = 0.5;
+const MAX_JPEG_QUALITY = 0.92;
+const LATENCY_BUDGET_MS = 150;   // Target round trip for a single frame
+const FRAME_TIMEOUT_MS = 2000;   // Frames unanswered for this long are given up on
+
+const flow = {
+    fps: 15,
+    quality: 0.8,
+    rtt: null,            // Smoothed round-trip time in ms
+    epoch: 0,             // Bumped when numbering restarts, so late replies from before are ignored
+    nextSeq: 1,
+    lastAppliedSeq: 0,
+    pending: new Map(),   // seq -> time the frame was sent
+    encoding: 0           // Captured frames still being encoded, not yet numbered
+};
 
 document.getElementById('startBtn').addEventListener('click', async () => {
     if (!stream) {
@@ -13,8 +41,9 @@ document.getElementById('startBtn').addEventListener('click', async () => {
             video.srcObject = stream;
             console.log("Eye tracking started.");
 
-            // Start capturing and sending frames every 200ms
-            captureInterval = setInterval(sendFrameToBackend, 200);
+            // Stream frames over the websocket channel (falls back to HTTP POST if unavailable)
+            openTrackerSocket();
+            scheduleCapture();
 
         } catch (err) {
             console.error("Error accessing webcam:", err);
@@ -31,8 +60,9 @@ document.getElementById('stopBtn').addEventListener('click', () => {
         console.log("Eye tracking stopped.");
 
         // Stop sending frames
-        clearInterval(captureInterval);
-        captureInterval = null;
+        clearTimeout(captureTimer);
+        captureTimer = null;
+        closeTrackerSocket();
     }
 });
 
@@ -42,41 +72,190 @@ document.addEventListener('keydown', (e) => {
     }
 });
 
+function openTrackerSocket() {
+    if (!('WebSocket' in window)) {
+        return;
+    }
+    const socket = new WebSocket(TRACKER_SOCKET_URL);
+    socket.binaryType = 'arraybuffer';
+    socket.onopen = () => {
+        console.log("Tracker websocket connected.");
+        trackerSocket = socket;
+        // Frames sent over HTTP before the socket opened are not answered here
+        resetFlow();
+    };
+    socket.onmessage = (event) => {
+        handleTrackerResponse(JSON.parse(event.data));
+    };
+    socket.onclose = () => {
+        if (trackerSocket === socket) {
+            console.log("Tracker websocket closed, falling back to HTTP.");
+            trackerSocket = null;
+            resetFlow();
+        }
+    };
+}
+
+function closeTrackerSocket() {
+    if (trackerSocket) {
+        const socket = trackerSocket;
+        trackerSocket = null;
+        socket.close();
+    }
+    resetFlow();
+}
+
+function resetFlow() {
+    flow.epoch++;
+    flow.pending.clear();
+    flow.nextSeq = 1;
+    flow.lastAppliedSeq = 0;
+}
+
+function scheduleCapture() {
+    captureTimer = setTimeout(() => {
+        sendFrameToBackend();
+        if (stream) {
+            scheduleCapture();
+        }
+    }, 1000 / flow.fps);
+}
+
+// Forget frames the server will never answer (dropped, or lost with a failed request)
+function expirePendingFrames(now) {
+    for (const [seq, sentAt] of flow.pending) {
+        if (now - sentAt > FRAME_TIMEOUT_MS) {
+            flow.pending.delete(seq);
+        }
+    }
+}
+
+// Reused for every captured frame instead of allocating a new canvas each time
+const captureCanvas = document.createElement('canvas');
+
 // Function to capture current video frame and send to backend
 function sendFrameToBackend() {
     if (!video || video.readyState < 2) {  // HAVE_CURRENT_DATA
         return;
     }
+    const now = performance.now();
+    expirePendingFrames(now);
+    // Never queue frames behind a slow server; a later tick captures a fresh frame instead
+    if (flow.pending.size + flow.encoding >= MAX_IN_FLIGHT) {
+        return;
+    }
+
+    captureCanvas.width = video.videoWidth;
+    captureCanvas.height = video.videoHeight;
+    const ctx = captureCanvas.getContext('2d');
+    ctx.drawImage(video, 0, 0, captureCanvas.width, captureCanvas.height);
 
-    const canvas = document.createElement('canvas');
-    canvas.width = video.videoWidth;
-    canvas.height = video.videoHeight;
-    const ctx = canvas.getContext('2d');
-    ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+    // Upload the raw JPEG bytes; this is ~25% smaller than a base64 data URL in JSON
+    flow.encoding++;
+    captureCanvas.toBlob(blob => {
+        flow.encoding--;
+        // Only frames actually sent are numbered, so a failed encode leaves no gap
+        if (!blob) {
+            return;
+        }
+        const seq = flow.nextSeq++;
+        flow.pending.set(seq, now);
+        if (trackerSocket && trackerSocket.readyState === WebSocket.OPEN) {
+            sendSocketFrame(blob, seq);
+        } else {
+            postFrame(blob, seq);
+        }
+    }, 'image/jpeg', flow.quality);
+}
 
-    const imageDataURL = canvas.toDataURL('image/jpeg');
+// Websocket frames start with the seq as a 4-byte big-endian integer; the server echoes it back
+function sendSocketFrame(blob, seq) {
+    const header = new DataView(new ArrayBuffer(4));
+    header.setUint32(0, seq);
+    trackerSocket.send(new Blob([header, blob]));
+}
 
+function postFrame(blob, seq) {
+    const epoch = flow.epoch;
     fetch('/process_frame/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ image: imageDataURL })
+        headers: {
+            'Content-Type': 'image/jpeg',
+            'X-Tracker-Session': TRACKER_SESSION_ID,
+            'X-Frame-Seq': String(seq),
+            // The server starts its numbering over when the epoch goes up (stop and start)
+            'X-Frame-Epoch': String(epoch)
+        },
+        body: blob
     })
     .then(response => response.json())
     .then(data => {
-        // Handle wink detection feedback
-        if (data.wink) {
-            console.log('🎯 WINK DETECTED:', data.wink);
-            showWinkFeedback(data.wink);
+        if (epoch !== flow.epoch) {
+            return;
         }
-        
-        // Log all response data for debugging
-        console.log('Backend response:', data);
+        // Error responses carry no seq; retire the frame they belong to
+        if (data.seq === undefined) {
+            flow.pending.delete(seq);
+        }
+        handleTrackerResponse(data);
     })
     .catch(err => {
+        flow.pending.delete(seq);
         console.error('Error sending frame to backend:', err);
     });
 }
 
+function handleTrackerResponse(data) {
+    const seq = data.seq;
+    if (seq !== undefined) {
+        const sentAt = flow.pending.get(seq);
+        // This frame and every older one are settled (older websocket frames were skipped by the server)
+        for (const pendingSeq of flow.pending.keys()) {
+            if (pendingSeq <= seq) {
+                flow.pending.delete(pendingSeq);
+            }
+        }
+        if (sentAt !== undefined) {
+            adaptFlow(performance.now() - sentAt, data.processing_ms);
+        }
+        // A response overtaken by a newer one is out of date
+        if (data.stale || seq <= flow.lastAppliedSeq) {
+            return;
+        }
+        flow.lastAppliedSeq = seq;
+    }
+
+    // Handle wink detection feedback
+    if (data.wink) {
+        console.log('🎯 WINK DETECTED:', data.wink);
+        showWinkFeedback(data.wink);
+    }
+
+    // Log all response data for debugging
+    const latency = flow.rtt === null ? '-' : Math.round(flow.rtt);
+    console.log(`Backend response (rtt ${latency} ms, ${flow.fps.toFixed(1)} fps, q ${flow.quality.toFixed(2)}):`, data);
+}
+
+function adaptFlow(rtt, processingMs) {
+    flow.rtt = flow.rtt === null ? rtt : 0.8 * flow.rtt + 0.2 * rtt;
+
+    if (flow.rtt > LATENCY_BUDGET_MS) {
+        // Smaller JPEGs only help when the time goes into the transfer, not the inference
+        const serverBound = processingMs !== undefined && processingMs > 0.6 * flow.rtt;
+        if (serverBound || flow.quality <= MIN_JPEG_QUALITY) {
+            flow.fps = Math.max(MIN_FPS, flow.fps * 0.8);
+        } else {
+            flow.quality = Math.max(MIN_JPEG_QUALITY, flow.quality - 0.05);
+        }
+    } else if (flow.rtt < LATENCY_BUDGET_MS / 2) {
+        flow.quality = Math.min(MAX_JPEG_QUALITY, flow.quality + 0.02);
+        flow.fps = Math.min(MAX_FPS, flow.fps + 1);
+    }
+
+    // No point capturing faster than the pipeline can return MAX_IN_FLIGHT frames per round trip
+    flow.fps = Math.max(MIN_FPS, Math.min(flow.fps, MAX_IN_FLIGHT * 1000 / flow.rtt));
+}
+
 // Function to show visual feedback when a wink is detected
 function showWinkFeedback(winkType) {
     // Create or update wink indicator